@@ -1,82 +1,57 @@
-import json
-from calculate import *
-from graphs import *
-
-### Load Case 2 ###
-
-loads = [
-    ["reaction", 0],
-    ["point", 0.172, 200 / 3],
-    ["point", 0.348, 200 / 3],
-    ["point", 0.512, 200 / 3],
-    ["point", 0.688, 200 / 3],
-    ["point", 0.852, 90],
-    ["point", 1.028, 90],
-    ["reaction", 1.200],
-]
-
-data = generate_envelop(-0.172, 0.172, 50, loads, 1000)
-
-plot_expr(
-    data[1],
-    data[0],
-    x_axis_label="Length (m)",
-    y_axis_label="Shear Force (N)",
-    save_path="img\\load_case_2\\SFD_envelop.png",
-    show=False,
-    fill = True
-)
-
-plot_expr(
-    data[2],
-    data[0],
-    x_axis_label="Length (m)",
-    y_axis_label="Bending Moment (Nm)",
-    save_path="img\\load_case_2\\BMD_envelop.png",
-    show=False,
-    invert_y = True,
-    fill = True
-)
-
-with open('data.json', 'w', encoding='utf-8') as f:
-    json.dump(data[3], f, ensure_ascii=False, indent=4)
-
-### Load Case 1 ###
-
-loads2 = [
-    ["reaction", 0],
-    ["point", 0.172, 200 / 3],
-    ["point", 0.348, 200 / 3],
-    ["point", 0.512, 200 / 3],
-    ["point", 0.688, 200 / 3],
-    ["point", 0.852, 200 / 3],
-    ["point", 1.028, 200 / 3],
-    ["reaction", 1.200],
-]
-
-data2 = generate_envelop(-0.172, 0.172, 50, loads2, 1000)
-
-plot_expr(
-    data2[1],
-    data2[0],
-    x_axis_label="Length (m)",
-    y_axis_label="Shear Force (N)",
-    save_path="img\\load_case_1\\SFD_envelop.png",
-    show=False,
-    fill = True
-)
-
-plot_expr(
-    data2[2],
-    data2[0],
-    x_axis_label="Length (m)",
-    y_axis_label="Bending Moment (Nm)",
-    save_path="img\\load_case_1\\BMD_envelop.png",
-    show=False,
-    invert_y = True,
-    fill = True
-)
-
-with open('data2.json', 'w', encoding='utf-8') as f:
-    json.dump(data2[3], f, ensure_ascii=False, indent=4)
-
+import os
+
+from envelope import data_directory, exported_envelope_path, load_case_envelope, save_envelope
+
+# Loads, load positions and resolution of each case are in envelope.load_cases. Envelopes are cached, so this only
+# recalculates a load case after it changes.
+
+
+def plot_envelope(load_case, engine="batched"):
+    """
+    Plots the shear force and bending moment envelopes of a load case and exports them to data/load_case_<n>.envelope.
+
+    Args:
+        load_case (int): 1 or 2.
+        engine (str): One of envelope.engines.
+
+    Returns:
+        dict: Envelope in the format returned by envelope.load_envelope.
+    """
+    from graphs import render_plots
+
+    data = load_case_envelope(load_case, engine=engine)
+    folder_name = f"load_case_{load_case}"
+
+    render_plots(
+        [
+            dict(
+                expr=data["shear_force_envelope"],
+                symbol=data["x"],
+                x_axis_label="Length (m)",
+                y_axis_label="Shear Force (N)",
+                save_path=os.path.join("img", folder_name, "SFD_envelop.png"),
+                fill=True,
+            ),
+            dict(
+                expr=data["bending_moment_envelope"],
+                symbol=data["x"],
+                x_axis_label="Length (m)",
+                y_axis_label="Bending Moment (Nm)",
+                save_path=os.path.join("img", folder_name, "BMD_envelop.png"),
+                invert_y=True,
+                fill=True,
+            ),
+        ],
+        workers=1,
+    )
+
+    os.makedirs(data_directory, exist_ok=True)
+    save_envelope(
+        exported_envelope_path(load_case), data, load_case=load_case, **data["metadata"]
+    )
+    return data
+
+
+if __name__ == "__main__":
+    plot_envelope(2)
+    plot_envelope(1)
@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import calculate as calc
+import bridge
+import incremental
+import sweep
+from envelope import load_cases, load_envelope, reference_files
+
+# (load positions, lengths) of each envelope workload. The first is the resolution SFD_BMD.py uses.
+envelope_sizes = ((50, 1000), (100, 2000), (200, 4000))
+
+# Grid of the design sweep workload, 80 * 80 * 3 * 5 = 96000 designs
+sweep_spec = {
+    "top_flange_width": (80, 160),
+    "total_height": (60, 140),
+    "top_flange_layers": [1, 2, 3],
+    "diaphragm_num": [1, 2, 3, 4, 5],
+}
+
+# Number of designs in the batched FOS and section property workloads
+batch_size = 100_000
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def final_design_arguments():
+    return sweep.design_arguments(bridge.final_design)
+
+
+def random_designs(size, seed=0):
+    """
+    Generates random designs around the final design, the same ones on every run.
+
+    Args:
+        size (int): Number of designs.
+        seed (int): Seed of the generator.
+
+    Returns:
+        dict: Arguments for bridge.get_FOS_batch, with one array per design variable.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "top_flange_width": rng.uniform(80, 160, size),
+        "web_height": rng.uniform(50, 120, size),
+        "top_flange_layers": rng.integers(1, 4, size).astype(float),
+        "diaphragm_num": rng.integers(1, 6, size).astype(float),
+    }
+
+
+def section_properties(top_flange_width, web_height, top_flange_layers):
+    cross_section = calc.CrossSection.from_dimensions(
+        top_flange_width, web_height, top_flange_layers
+    )
+    return (
+        cross_section.area,
+        cross_section.centroidal_axis,
+        cross_section.second_moment_area,
+        cross_section.first_moment_area(cross_section.centroidal_axis),
+    )
+
+
+def section_properties_batch(top_flange_width, web_height, top_flange_layers, **kwargs):
+    y, w, h = calc.generate_cross_section_arrays(
+        top_flange_width, web_height, top_flange_layers
+    )
+    axis = calc.centroidal_axis_arrays(y, w, h)
+    return (
+        calc.area_arrays(y, w, h),
+        axis,
+        calc.second_moment_area_arrays(y, w, h, axis),
+        calc.first_moment_area_arrays(y, w, h, axis, axis),
+    )
+
+
+def workloads():
+    """
+    Lists the fixed workloads of the suite. Inputs are built here, so only the calculation itself is measured.
+
+    Returns:
+        dict: Maps workload names to functions taking no arguments.
+    """
+    benchmarks = {}
+    for load_case in load_cases:
+        case = load_cases[load_case]
+        for num_load_positions, num_length_positions in envelope_sizes:
+            benchmarks[
+                f"envelope_batched[case={load_case},{num_load_positions}x{num_length_positions}]"
+            ] = lambda case=case, size=(num_load_positions, num_length_positions): (
+                calc.generate_envelop_batched(
+                    case["start"], case["stop"], size[0], case["loads"], size[1]
+                )
+            )
+        benchmarks[f"envelope_numpy[case={load_case}]"] = lambda case=case: calc.generate_envelop(
+            case["start"],
+            case["stop"],
+            case["num_load_positions"],
+            case["loads"],
+            case["num_length_positions"],
+            engine="numpy",
+        )
+
+    design = final_design_arguments()
+    sections = {
+        name: design[name] for name in ("top_flange_width", "web_height", "top_flange_layers")
+    }
+    benchmarks["section_properties[single]"] = lambda: section_properties(**sections)
+    designs = random_designs(batch_size)
+    benchmarks[f"section_properties[batch={batch_size}]"] = lambda: section_properties_batch(**designs)
+
+    # Applied loads are fixed so get_FOS does not measure the envelope cache.
+    loads = dict(zip(("max_shear_force", "max_bending_moment"), bridge.applied_loads()))
+    benchmarks["get_FOS[single]"] = lambda: bridge.get_FOS(**design, **loads)
+    benchmarks[f"get_FOS_batch[batch={batch_size}]"] = lambda: bridge.get_FOS_batch(
+        **designs, **loads
+    )
+    # Changing the loads of the graph recalculates only the stresses and factors of safety, against every stage in
+    # get_FOS_batch. Coordinate descent changes the section on most trials, so it is timed as a whole and is about as
+    # fast as calling get_FOS for every trial.
+    graph = incremental.FOSGraph(**designs, **loads)
+    graph.factors()
+    changed_loads = {name: value * 1.1 for name, value in loads.items()}
+    benchmarks[f"FOSGraph.what_if[loads,batch={batch_size}]"] = lambda: graph.what_if(
+        incremental.factor_nodes, **changed_loads
+    )
+    benchmarks["coordinate_descent[single]"] = lambda: incremental.coordinate_descent(
+        incremental.FOSGraph(**design, **loads)
+    )
+    benchmarks["sweep[96000 designs]"] = lambda: sweep.sweep(sweep_spec, workers=1, **loads)
+    return benchmarks
+
+
+def measure(function, repeat=5, min_time=0.2):
+    """
+    Times a function and records its peak memory.
+
+    Args:
+        function (function): Workload taking no arguments.
+        repeat (int): Number of timed samples.
+        min_time (float): Each sample runs the function enough times to take at least this long, in s.
+
+    Returns:
+        dict: "best" and "median" seconds per call, "peak_memory" in bytes allocated by one call, and "loops" per
+        sample.
+    """
+    function()
+
+    # Calibrate the loops per sample, so fast workloads are not lost in timer resolution.
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        samples.append((time.perf_counter() - start) / loops)
+
+    # tracemalloc slows allocation down, so memory is measured apart from timing.
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "best": min(samples),
+        "median": statistics.median(samples),
+        "peak_memory": peak_memory,
+        "loops": loops,
+    }
+
+
+def check_agreement(tolerance=1e-9):
+    """
+    Checks the envelopes of both load cases against envelope.reference_files, and the batched and incremental
+    factors of safety against get_FOS.
+
+    Args:
+        tolerance (float): Largest allowed difference, relative to the largest value of each quantity.
+
+    Returns:
+        list: Descriptions of every disagreement.
+    """
+    failures = []
+    for load_case, case in load_cases.items():
+        reference = load_envelope(reference_files[load_case], mmap=False)
+        *_, data = calc.generate_envelop_batched(
+            case["start"],
+            case["stop"],
+            case["num_load_positions"],
+            case["loads"],
+            case["num_length_positions"],
+        )
+        for name in ("x", "shear_force_envelope", "bending_moment_envelope", "shear", "moment"):
+            expected = np.asarray(reference[name], dtype=float)
+            actual = np.asarray(data[name], dtype=float)
+            error = np.max(np.abs(actual - expected)) / max(np.max(np.abs(expected)), 1)
+            if actual.shape != expected.shape or error > tolerance:
+                failures.append(f"load case {load_case} {name}: relative error {error:.3g}")
+
+    design = final_design_arguments()
+    expected = np.array(bridge.get_FOS(**design, return_min=False))
+    actual = bridge.get_FOS_batch(**design)[0][0]
+    error = np.max(np.abs(actual - expected) / expected)
+    if error > tolerance:
+        failures.append(f"get_FOS_batch: relative error {error:.3g}")
+
+    actual = np.array(incremental.FOSGraph(**design).factors())
+    error = np.max(np.abs(actual - expected) / expected)
+    if error > tolerance:
+        failures.append(f"FOSGraph: relative error {error:.3g}")
+    return failures
+
+
+def compare(results, baseline, threshold=0.25, memory_threshold=0.25):
+    """
+    Finds workloads that got slower or used more memory than the baseline.
+
+    Args:
+        results (dict): Maps workload names to the output of measure.
+        baseline (dict): Results of an earlier run.
+        threshold (float): Allowed increase in the best time, as a fraction.
+        memory_threshold (float): Allowed increase in peak memory, as a fraction.
+
+    Returns:
+        list: Descriptions of every regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        best = result["best"] / baseline[name]["best"] - 1
+        if best > threshold:
+            regressions.append(f"{name}: {best:+.0%} time")
+        memory = result["peak_memory"] / max(baseline[name]["peak_memory"], 1) - 1
+        if memory > memory_threshold:
+            regressions.append(f"{name}: {memory:+.0%} peak memory")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the envelope, section property and FOS calculations against a baseline."
+    )
+    parser.add_argument("--baseline", default=default_baseline, help="Path of the JSON baseline")
+    parser.add_argument(
+        "--save", action="store_true", help="Write the results as the new baseline"
+    )
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, as a fraction")
+    parser.add_argument(
+        "--memory-threshold", type=float, default=0.25, help="Allowed increase in peak memory, as a fraction"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Only run workloads whose name contains this")
+    args = parser.parse_args(argv)
+
+    failures = check_agreement()
+    for failure in failures:
+        print("Disagreement:", failure)
+
+    try:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    except FileNotFoundError:
+        # Without a baseline nothing can be checked, which only makes sense when writing one
+        if not args.save:
+            print(f"No baseline at {args.baseline}. Run with --save to create one.")
+            return 1
+        baseline = {}
+
+    results = {}
+    for name, function in workloads().items():
+        if args.filter not in name:
+            continue
+        results[name] = result = measure(function, repeat=args.repeat)
+        change = ""
+        if name in baseline:
+            change = f" ({result['best'] / baseline[name]['best'] - 1:+.0%})"
+        print(
+            f"{name:<48} {result['best'] * 1e3:10.3f} ms{change:<8} "
+            f"{result['peak_memory'] / 2**20:8.2f} MiB"
+        )
+
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    for regression in regressions:
+        print("Regression:", regression)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "machine": platform.machine(),
+                    "results": {**baseline, **results},
+                },
+                f,
+                indent=4,
+            )
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,95 +1,334 @@
+import os
+
+import numpy as np
 import calculate as calc
-from graphs import *
-import json
+import instrument
+from envelope import engines, load_case_envelope
+
+
+# Envelopes are loaded on first use, so importing this module does no work. data is load case 2, data2 is load case 1,
+# and max_shear_force and max_bending_moment are the maxima of load case 2.
+def __getattr__(name):
+    if name == "data":
+        return load_case_envelope(2)
+    if name == "data2":
+        return load_case_envelope(1)
+    if name == "max_shear_force":
+        return load_case_envelope(2)["shear"]
+    if name == "max_bending_moment":
+        return load_case_envelope(2)["moment"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def applied_loads(max_shear_force=None, max_bending_moment=None, load_case=2):
+    """
+    Fills in the maximum shear force and bending moment of a load case where they are not given.
+
+    Args:
+        max_shear_force (float): Maximum shear force, or None to use the load case's.
+        max_bending_moment (float): Maximum bending moment, or None to use the load case's.
+        load_case (int): 1 or 2.
+
+    Returns:
+        tuple: (max_shear_force, max_bending_moment)
+    """
+    if max_shear_force is None or max_bending_moment is None:
+        envelope = load_case_envelope(load_case)
+        if max_shear_force is None:
+            max_shear_force = envelope["shear"]
+        if max_bending_moment is None:
+            max_bending_moment = envelope["moment"]
+    return max_shear_force, max_bending_moment
+
+
+def applied_deflection(deflection_limit=None, unit_deflection=None, load_case=2):
+    """
+    Fills in the deflection of a load case for a flexural rigidity of 1 N mm^2 where it is needed but not given.
+
+    Args:
+        deflection_limit (float): Largest allowed deflection in mm, or None to skip the deflection check.
+        unit_deflection (float): Largest deflection times E * I, or None to use the load case's.
+        load_case (int): 1 or 2.
+
+    Returns:
+        float: unit_deflection, or None when there is no deflection limit.
+    """
+    if deflection_limit is None or unit_deflection is not None:
+        return unit_deflection
+    import deflection
+
+    return deflection.unit_deflection(load_case)["max_deflection"]
+
+
+# Failure modes in the order get_FOS returns their factors of safety. Deflection is only checked when a deflection
+# limit is given.
+failure_modes = (
+    "tension",
+    "compression",
+    "shear",
+    "glue_shear",
+    "buckling_flange_between_webs",
+    "buckling_flange_tips",
+    "buckling_webs",
+    "buckling_shear_webs",
+    "deflection",
+)
 
-f = open("data.json")
-data = json.load(f)
-f2 = open("data2.json")
-data2 = json.load(f2)
 
-max_shear_force = float(data["shear"])
-max_bending_moment = float(data["moment"])
+def get_volume(area, web_height, diaphragm_num, glue_width=None):
+    # Approximate volume of bridge (Not exact)
+    if glue_width is None:
+        glue_width = calc.glue_width
+    diaphragm_thickness = calc.th * (
+        diaphragm_num + 3
+    )  # Must add 3 to include double diaphragms in the middle and on both ends of the bridge
+    cross_section_thickness = (
+        calc.bridge_length + 60
+    )  # Add 60 for both ends of the bridge
+    diaphragm_area = (2 * glue_width + web_height) * (
+        calc.bottom_flange_width - 2 * calc.th + glue_width * 2
+    )
+    return area * cross_section_thickness + diaphragm_area * diaphragm_thickness
 
 
-def get_FOS(
-    top_flange_width,
-    web_height,
-    top_flange_layers=1,
-    diaphragm_num=1,
-    max_shear_force=max_shear_force,
-    max_bending_moment=max_bending_moment,
-    glue_width=calc.glue_width,
-    print_FOS=False,
-    return_min=True,
-):
-    cross_section = calc.generate_cross_section(top_flange_width, web_height, top_flange_layers)
+# Volume of the matboard in mm^3. A design may use less than usable_matboard of it.
+matboard_volume = 1049030.16
+usable_matboard = 0.9
 
-    components = [
-        [rectangle[1], rectangle[2], rectangle[3]] for rectangle in cross_section
-    ]
 
-    axis = calc.centroidal_axis(components)
+def within_volume(volume):
+    """
+    Args:
+        volume (float): Volume of a design, or an array of volumes.
 
-    second_moment_area = calc.second_moment_area(components, axis)
+    Returns:
+        bool: Whether the design uses less than usable_matboard of the matboard.
+    """
+    return volume / matboard_volume < usable_matboard
 
-    bottom = axis
-    top = max([r[0] + r[2] / 2 for r in components]) - axis
 
-    flexural_stress_at = lambda y: y * max_bending_moment / second_moment_area * 1e3
+def section_terms(top_flange_width, web_height, top_flange_layers, glue_width, th=None):
+    """
+    Calculates the section properties the failure modes depend on. A single design at the nominal thickness is summed
+    over plain floats, which is several times faster than array operations on six rectangles. Arrays of designs, other
+    thicknesses and array-likes such as sensitivity.Dual use the array functions of calculate.
 
-    max_compression = flexural_stress_at(top)
-    max_tension = flexural_stress_at(bottom)
+    Args:
+        th (float): Matboard thickness. Defaults to calc.th. The bottom flange follows it, see its definition in
+            calculate.
 
-    FOS_wall_tension = calc.matboard_tensile_strength / max_tension
-    FOS_wall_compression = calc.matboard_compressive_strength / max_compression
+    Returns:
+        tuple: (area, centroidal axis, second moment of area, distance from the centroid to the top, first moment of
+        area at the centroid, first moment of area at the glue)
+    """
+    if th is None:
+        th = calc.th
+    scalars = (top_flange_width, web_height, top_flange_layers, glue_width, th)
+    if all(isinstance(value, (int, float)) for value in scalars) and th == calc.th:
+        components = calc.generate_cross_section(
+            top_flange_width, web_height, top_flange_layers, glue_width=glue_width
+        )
+        area, axis, second_moment_area, top = calc.section_sums(components)
+        Q_centroid, Q_glue = calc.first_moment_sums(components, axis, (axis, th + web_height))
+        return area, axis, second_moment_area, top - axis, Q_centroid, Q_glue
+
+    # The bottom flange spans the centre lines of the webs plus one thickness, so it follows a th other than calc.th
+    bottom_flange_width = calc.bottom_flange_width + (th - calc.th)
+    y, w, h = calc.generate_cross_section_arrays(
+        top_flange_width, web_height, top_flange_layers, th, glue_width, bottom_flange_width
+    )
+    axis = calc.centroidal_axis_arrays(y, w, h)
+    return (
+        calc.area_arrays(y, w, h),
+        axis,
+        calc.second_moment_area_arrays(y, w, h, axis),
+        (y + h / 2).max(axis=-1) - axis,
+        calc.first_moment_area_arrays(y, w, h, axis, axis),
+        calc.first_moment_area_arrays(y, w, h, axis, calc.float_array(th + web_height)),
+    )
+
+
+def stress_terms(section, max_shear_force, max_bending_moment, glue_width, th=None):
+    """
+    Calculates the largest stresses the loads cause in a section.
+
+    Args:
+        section (tuple): Section properties from section_terms.
 
-    shear_at = (
-        lambda y, b: max_shear_force
-        * calc.first_moment_area(components, axis, y)
-        / (second_moment_area * b)
+    Returns:
+        tuple: (max tension, max compression, max shear, glue shear) in MPa
+    """
+    if th is None:
+        th = calc.th
+    _, axis, second_moment_area, top, Q_centroid, Q_glue = section
+    return (
+        axis * max_bending_moment / second_moment_area * 1e3,
+        top * max_bending_moment / second_moment_area * 1e3,
+        max_shear_force * Q_centroid / (second_moment_area * 2 * th),
+        max_shear_force * Q_glue / (second_moment_area * 2 * glue_width),
     )
 
-    max_shear = shear_at(axis, 2 * calc.th)
-    glue_shear = shear_at(calc.th + web_height, 2 * glue_width)
 
-    FOS_wall_shear = calc.matboard_shear_strength / max_shear
-    FOS_glue_shear = calc.cement_shear_strength / glue_shear
+def plate_buckling_terms(top_flange_width, web_height, top_flange_layers, section, th=None, youngs_modulus=None):
+    """
+    Calculates the compressive stresses that buckle the flanges and webs of a section.
+
+    Args:
+        section (tuple): Section properties from section_terms.
+        th (float): Matboard thickness. Defaults to calc.th.
+        youngs_modulus (float): Defaults to calc.matboard_youngs_modulus.
 
-    buckling_flange_between_webs = calc.thin_plate_buckling(
-        4, calc.th * top_flange_layers, calc.bottom_flange_width - calc.th
+    Returns:
+        tuple: (flange between webs, flange tips, webs) buckling stresses in MPa
+    """
+    if th is None:
+        th = calc.th
+    bottom_flange_width = calc.bottom_flange_width + (th - calc.th)
+    return (
+        calc.thin_plate_buckling(4, th * top_flange_layers, bottom_flange_width - th, youngs_modulus),
+        calc.thin_plate_buckling(
+            0.425, th * top_flange_layers, (top_flange_width - bottom_flange_width + th) / 2, youngs_modulus
+        ),
+        calc.thin_plate_buckling(6, th, th + web_height - section[1], youngs_modulus),
     )
-    
-    buckling_flange_tips = calc.thin_plate_buckling(
-        0.425,
-        calc.th * top_flange_layers,
-        (top_flange_width - calc.bottom_flange_width + calc.th) / 2,
+
+
+def shear_buckling_term(web_height, diaphragm_num, th=None, youngs_modulus=None):
+    """
+    Returns:
+        float: Shear stress in MPa that buckles the webs between diaphragms.
+    """
+    if th is None:
+        th = calc.th
+    return calc.thin_plate_buckling_shear(
+        th * 2, web_height - th, calc.bridge_length / (diaphragm_num + 1), youngs_modulus
     )
 
-    buckling_webs = calc.thin_plate_buckling(6, calc.th, calc.th + web_height - axis)
-    
-    buckling_shear = calc.thin_plate_buckling_shear(
-        calc.th * 2, web_height - calc.th, calc.bridge_length / (diaphragm_num + 1)
+
+def buckling_terms(
+    top_flange_width, web_height, top_flange_layers, diaphragm_num, section, th=None, youngs_modulus=None
+):
+    """
+    Calculates the stresses that buckle the plates of a section, see plate_buckling_terms and shear_buckling_term.
+
+    Returns:
+        tuple: (flange between webs, flange tips, webs, shear in webs) buckling stresses in MPa
+    """
+    return plate_buckling_terms(top_flange_width, web_height, top_flange_layers, section, th, youngs_modulus) + (
+        shear_buckling_term(web_height, diaphragm_num, th, youngs_modulus),
     )
 
-    FOS_buckling_flange_between_webs = buckling_flange_between_webs / max_compression
-    FOS_buckling_flange_tips = buckling_flange_tips / max_compression
-    FOS_buckling_webs = buckling_webs / max_compression
-    FOS_buckling_shear = buckling_shear / max_shear
 
-    # Approximate volume of bridge (Not exact)
-    area = calc.area(components)
-    diaphragm_thickness = calc.th * (
-        diaphragm_num + 3
-    )  # Must add 3 to include double diaphragms in the middle and on both ends of the bridge
-    cross_section_thickness = (
-        calc.bridge_length + 60
-    )  # Add 60 for both ends of the bridge
-    diaphragm_area = (2 * calc.glue_width + web_height) * (
-        calc.bottom_flange_width - 2 * calc.th + calc.glue_width * 2
+def strength_factor_terms(stresses, tensile_strength, compressive_strength, shear_strength, cement_shear_strength):
+    """
+    Args:
+        stresses (tuple): Stresses from stress_terms.
+
+    Returns:
+        tuple: Factors of safety against tension, compression and shear in the walls, and shear in the glue.
+    """
+    max_tension, max_compression, max_shear, glue_shear = stresses
+    return (
+        tensile_strength / max_tension,
+        compressive_strength / max_compression,
+        shear_strength / max_shear,
+        cement_shear_strength / glue_shear,
+    )
+
+
+def plate_buckling_factor_terms(stresses, plate_buckling):
+    """
+    Args:
+        stresses (tuple): Stresses from stress_terms.
+        plate_buckling (tuple): Buckling stresses from plate_buckling_terms.
+
+    Returns:
+        tuple: Factors of safety against buckling of the flange between the webs, the flange tips and the webs.
+    """
+    max_compression = stresses[1]
+    return tuple(stress / max_compression for stress in plate_buckling)
+
+
+def shear_buckling_factor(stresses, shear_buckling):
+    """
+    Args:
+        stresses (tuple): Stresses from stress_terms.
+        shear_buckling (float): Buckling stress from shear_buckling_term.
+
+    Returns:
+        float: Factor of safety against shear buckling of the webs.
+    """
+    return shear_buckling / stresses[2]
+
+
+def factor_terms(stresses, buckling, properties):
+    """
+    Args:
+        stresses (tuple): Stresses from stress_terms.
+        buckling (tuple): Buckling stresses from buckling_terms.
+        properties (dict): Strengths by their names in calc.material_names.
+
+    Returns:
+        tuple: The eight factors of safety in the order of failure_modes.
+    """
+    return (
+        strength_factor_terms(
+            stresses,
+            properties["matboard_tensile_strength"],
+            properties["matboard_compressive_strength"],
+            properties["matboard_shear_strength"],
+            properties["cement_shear_strength"],
+        )
+        + plate_buckling_factor_terms(stresses, buckling[:3])
+        + (shear_buckling_factor(stresses, buckling[3]),)
+    )
+
+
+def max_deflection(unit_deflection, second_moment_area, youngs_modulus=None):
+    """
+    Args:
+        unit_deflection (float): Largest deflection times E * I, see applied_deflection.
+        second_moment_area (float): Second moment of area of the section.
+        youngs_modulus (float): Defaults to calc.matboard_youngs_modulus.
+
+    Returns:
+        float: The largest deflection in mm.
+    """
+    if youngs_modulus is None:
+        youngs_modulus = calc.matboard_youngs_modulus
+    return unit_deflection / (youngs_modulus * second_moment_area)
+
+
+@instrument.traced()
+def get_FOS(
+    top_flange_width,
+    web_height,
+    top_flange_layers=1,
+    diaphragm_num=1,
+    max_shear_force=None,
+    max_bending_moment=None,
+    glue_width=None,
+    print_FOS=False,
+    return_min=True,
+    deflection_limit=None,
+    unit_deflection=None,
+):
+    max_shear_force, max_bending_moment = applied_loads(max_shear_force, max_bending_moment)
+    unit_deflection = applied_deflection(deflection_limit, unit_deflection)
+    # Read when called, since calc.design0 changes the glue width
+    if glue_width is None:
+        glue_width = calc.glue_width
+
+    section = section_terms(top_flange_width, web_height, top_flange_layers, glue_width)
+    area, axis, second_moment_area = section[:3]
+    stresses = max_tension, max_compression, max_shear, glue_shear = stress_terms(
+        section, max_shear_force, max_bending_moment, glue_width
     )
-    volume = area * cross_section_thickness + diaphragm_area * diaphragm_thickness
+    buckling = buckling_terms(top_flange_width, web_height, top_flange_layers, diaphragm_num, section)
+    buckling_flange_between_webs, buckling_flange_tips, buckling_webs, buckling_shear = buckling
 
-    final_FOS = min(
+    factors = factor_terms(stresses, buckling, vars(calc))
+    (
         FOS_wall_tension,
         FOS_wall_compression,
         FOS_wall_shear,
@@ -98,7 +337,16 @@ def get_FOS(
         FOS_buckling_flange_tips,
         FOS_buckling_webs,
         FOS_buckling_shear,
-    )
+    ) = factors
+
+    volume = get_volume(area, web_height, diaphragm_num, glue_width)
+
+    if deflection_limit is not None:
+        deflection = max_deflection(unit_deflection, second_moment_area)
+        FOS_deflection = deflection_limit / deflection
+        factors += (FOS_deflection,)
+
+    final_FOS = min(factors)
 
     if print_FOS:
         print("Dimensions: ")
@@ -120,6 +368,8 @@ def get_FOS(
         print(f"Buckling Flange Tips Stress: {buckling_flange_tips}")
         print(f"Buckling Webs Stress: {buckling_webs}")
         print(f"Buckling Shear Webs Stress: {buckling_shear}")
+        if deflection_limit is not None:
+            print(f"Max Deflection: {deflection}")
 
         print("\nFOS:")
         print(f"Tension Safety Factor: {FOS_wall_tension}")
@@ -132,115 +382,140 @@ def get_FOS(
         print(f"Buckling Flange Tips Safety Factor: {FOS_buckling_flange_tips}")
         print(f"Buckling Webs Safety Factor: {FOS_buckling_webs}")
         print(f"Buckling Shear Safety Factor: {FOS_buckling_shear}")
+        if deflection_limit is not None:
+            print(f"Deflection Safety Factor: {FOS_deflection}")
 
         print(f"\nVolume: {volume}")
-        print(f"Percent of Matboard: {volume/1049030.16*100}")
+        print(f"Percent of Matboard: {volume / matboard_volume * 100}")
 
         print(f"\nMaximum Load: {final_FOS * 446.66}")
 
     if return_min:
         # Volume must be less than 90% of total matboard
-        if volume / 1049030.16 < 0.9:
+        if within_volume(volume):
             return final_FOS
         return -1
 
-    return (
-        FOS_wall_tension,
-        FOS_wall_compression,
-        FOS_wall_shear,
-        FOS_glue_shear,
-        FOS_buckling_flange_between_webs,
-        FOS_buckling_flange_tips,
-        FOS_buckling_webs,
-        FOS_buckling_shear,
-    )
+    return factors
 
 
-### Code For Optimization ###
-
-fos = 0
-oheight = None
-othickness = None
-owidth = None
-odiaphragm = None
-
-# Loop through range of values to try to find the optimal dimensions
-# for height in range(20, 121, 20):
-#     for thickness in range(1, 6):
-#         for width in range(100, 150):
-#             for diaphragm in range(1,4):
-#                 new_fos =  get_FOS(width, height - calc.th-thickness*calc.th, thickness, diaphragm, print_FOS=False)
-
-#                 if new_fos > fos:
-#                     oheight = height
-#                     fos = new_fos
-#                     othickness = thickness
-#                     odiaphragm = diaphragm
-#                     owidth = width
-
-# Changed width to 125, so we can fit it on matboard
-
-### Final Bridge Dimensions ###
-
-owidth = 125
-othickness = 2
-odiaphragm = 3
-oheight = 100
-
-print("Load Case 1:")
-factors_1 = get_FOS(
-    owidth,
-    oheight - calc.th - othickness * calc.th,
-    othickness,
-    odiaphragm,
-    print_FOS=True,
-    return_min=False,
-    max_shear_force=float(data2["shear"]),
-    max_bending_moment=float(data2["moment"]),
-)
+@instrument.traced()
+def get_FOS_terms(
+    top_flange_width,
+    web_height,
+    top_flange_layers,
+    diaphragm_num,
+    max_shear_force,
+    max_bending_moment,
+    glue_width,
+    deflection_limit=None,
+    unit_deflection=None,
+    materials=None,
+):
+    """Calculates every factor of safety of many designs with array arithmetic, mirroring get_FOS.
+
+    Args:
+        materials (dict): Overrides the material constants named in calc.material_names, with a value or one value per
+            design.
+
+    Returns:
+        tuple: The eight factors of safety, and a ninth for deflection if deflection_limit is given, in the same order
+        as get_FOS, and the volume of each design.
+    """
+    max_shear_force, max_bending_moment = applied_loads(max_shear_force, max_bending_moment)
+    unit_deflection = applied_deflection(deflection_limit, unit_deflection)
+    properties = calc.material_properties(materials)
+    th = properties["th"]
+    youngs_modulus = properties["matboard_youngs_modulus"]
+
+    section = section_terms(top_flange_width, web_height, top_flange_layers, glue_width, th)
+    stresses = stress_terms(section, max_shear_force, max_bending_moment, glue_width, th)
+    buckling = buckling_terms(
+        top_flange_width, web_height, top_flange_layers, diaphragm_num, section, th, youngs_modulus
+    )
+    factors = factor_terms(stresses, buckling, properties)
 
+    if deflection_limit is not None:
+        factors += (deflection_limit / max_deflection(unit_deflection, section[2], youngs_modulus),)
 
+    volume = get_volume(section[0], web_height, diaphragm_num, glue_width)
+    return factors, volume
 
-print("\nLoad Case 2:")
-factors_2 = get_FOS(
-    owidth,
-    oheight - calc.th - othickness * calc.th,
-    othickness,
-    odiaphragm,
-    print_FOS=True,
-    return_min=False,
-)
 
-calc.design0()
-print("\nDesign 0 Case 1:")
-get_FOS(
-    100,
-    75-calc.th,
-    1,
-    2,
-    print_FOS=True,
-    glue_width=calc.glue_width,
-    max_shear_force=float(data2["shear"]),
-    max_bending_moment=float(data2["moment"]),
-)
+@instrument.traced()
+def get_FOS_batch(
+    top_flange_width,
+    web_height,
+    top_flange_layers=1,
+    diaphragm_num=1,
+    max_shear_force=None,
+    max_bending_moment=None,
+    glue_width=None,
+    deflection_limit=None,
+    unit_deflection=None,
+    materials=None,
+):
+    """Evaluates get_FOS for many designs in one call. Every design argument may be a scalar or an array, and
+    materials is passed to get_FOS_terms.
+
+    Returns:
+        np.ndarray: (N x 8) factors of safety, in the same order as get_FOS with return_min=False, or (N x 9) with a
+        deflection limit.
+        np.ndarray: Index of the governing failure mode of each design.
+        np.ndarray: Whether each design uses less than 90% of the matboard.
+    """
+    if glue_width is None:
+        glue_width = calc.glue_width
+    arguments = np.broadcast_arrays(
+        *(
+            np.atleast_1d(np.asarray(value, dtype=float))
+            for value in (
+                top_flange_width,
+                web_height,
+                top_flange_layers,
+                diaphragm_num,
+                glue_width,
+            )
+        )
+    )
+    top_flange_width, web_height, top_flange_layers, diaphragm_num, glue_width = (
+        argument.ravel() for argument in arguments
+    )
+
+    factors, volume = get_FOS_terms(
+        top_flange_width,
+        web_height,
+        top_flange_layers,
+        diaphragm_num,
+        max_shear_force,
+        max_bending_moment,
+        glue_width,
+        deflection_limit,
+        unit_deflection,
+        materials,
+    )
+    factors = np.stack(factors, axis=-1)
+    return factors, np.argmin(factors, axis=-1), within_volume(volume)
 
-print("\nDesign 0 Load Case 2:")
-get_FOS(
-    100,
-    75-calc.th,
-    1,
-    2,
-    glue_width=calc.glue_width,
-    print_FOS=True,
-)
 
 ### Generate Graphs ###
-def generate_graphs(data, factors, folder_name):
-    max_shear_force = float(data["shear"])
-    max_bending_moment = float(data["moment"])
-    x_vals = [float(d) for d in data["x"]]
-    shear_force_envelope = [float(d) for d in data["shear_force_envelope"]]
-    bending_moment_envelop = [float(d) for d in data["bending_moment_envelope"]]
+def graph_plots(data, factors, folder_name):
+    """
+    Lists the plots comparing the applied shear force and bending moment to the capacity of each failure mode.
+
+    Args:
+        data (dict): Envelope in the format returned by envelope.load_envelope.
+        factors (tuple): Factors of safety, as returned by get_FOS with return_min=False.
+        folder_name (str): Folder within img to save the images to.
+
+    Returns:
+        list: Keyword arguments for graphs.plot_expr of each plot.
+    """
+    max_shear_force = data["shear"]
+    max_bending_moment = data["moment"]
+    x_vals = np.asarray(data["x"])
+    shear_force_envelope = np.asarray(data["shear_force_envelope"])
+    bending_moment_envelop = np.asarray(data["bending_moment_envelope"])
 
     names = (
         "tension_failiure",
@@ -254,33 +529,264 @@ def generate_graphs(data, factors, folder_name):
     )
     is_shear = (False, False, True, True, False, False, False, True)
 
-    for i in range(len(factors)):
+    plots = []
+    for i in range(len(names)):
         formatted_name = names[i].replace("_", " ").title()
+        save_path = os.path.join("img", folder_name, names[i] + ".png")
         if is_shear[i]:
-            values = [factors[i] * max_shear_force] * len(x_vals)
-            plot_expr(
-                [shear_force_envelope, values, np.array(values) * -1],
-                x_vals,
-                x_axis_label="Length (m)",
-                y_axis_label="Shear Force (N)",
-                save_path="img\\" + folder_name +"\\" + names[i] + ".png",
-                show=False,
-                multiple_graphs=True,
-                labels=("Applied Shear Force", formatted_name, ""),
+            values = np.full(len(x_vals), factors[i] * max_shear_force)
+            plots.append(
+                dict(
+                    expr=[shear_force_envelope, values, values * -1],
+                    symbol=x_vals,
+                    x_axis_label="Length (m)",
+                    y_axis_label="Shear Force (N)",
+                    save_path=save_path,
+                    multiple_graphs=True,
+                    labels=("Applied Shear Force", formatted_name, ""),
+                )
             )
         else:
-            values = [factors[i] * max_bending_moment] * len(x_vals)
-            plot_expr(
-                [bending_moment_envelop, values],
-                x_vals,
-                x_axis_label="Length (m)",
-                y_axis_label="Bending Moment (Nm)",
-                save_path="img\\" + folder_name +"\\" + names[i] + ".png",
-                show=False,
-                invert_y=True,
-                multiple_graphs=True,
-                labels=("Applied Bending Moment", formatted_name),
+            values = np.full(len(x_vals), factors[i] * max_bending_moment)
+            plots.append(
+                dict(
+                    expr=[bending_moment_envelop, values],
+                    symbol=x_vals,
+                    x_axis_label="Length (m)",
+                    y_axis_label="Bending Moment (Nm)",
+                    save_path=save_path,
+                    invert_y=True,
+                    multiple_graphs=True,
+                    labels=("Applied Bending Moment", formatted_name),
+                )
             )
+    return plots
+
+
+def generate_graphs(data, factors, folder_name, workers=None, force=False):
+    """
+    Renders the plots from graph_plots, skipping images whose inputs have not changed.
+
+    Returns:
+        tuple: (number of images rendered, number of images skipped)
+    """
+    from graphs import render_plots
+
+    return render_plots(
+        graph_plots(data, factors, folder_name), workers=workers, force=force
+    )
+
+
+### Command Line ###
+
+# Final bridge dimensions. The width was changed to 125, so we can fit it on matboard.
+final_design = {
+    "top_flange_width": 125,
+    "total_height": 100,
+    "top_flange_layers": 2,
+    "diaphragm_num": 3,
+}
+
+# Design 0 dimensions, used with calc.design0()
+design0 = {
+    "top_flange_width": 100,
+    "total_height": 75 + calc.th,
+    "top_flange_layers": 1,
+    "diaphragm_num": 2,
+}
+
+
+def add_design_arguments(parser):
+    parser.add_argument("--top-flange-width", type=float, default=None)
+    parser.add_argument("--total-height", type=float, default=None)
+    parser.add_argument(
+        "--web-height", type=float, default=None, help="Used instead of --total-height"
+    )
+    parser.add_argument("--top-flange-layers", type=int, default=None)
+    parser.add_argument("--diaphragm-num", type=int, default=None)
+    parser.add_argument("--glue-width", type=float, default=None)
+    parser.add_argument(
+        "--design0", action="store_true", help="Use design 0 and its dimensions"
+    )
+    parser.add_argument(
+        "--load-case", type=int, choices=(1, 2), action="append", default=None
+    )
+
 
-generate_graphs(data2, factors_1, "load_case_1")
-generate_graphs(data, factors_2, "load_case_2")
\ No newline at end of file
+def design_from_arguments(args):
+    """
+    Finds the design given on the command line, filling in the final or design 0 dimensions.
+
+    Args:
+        args (argparse.Namespace): Parsed arguments of add_design_arguments.
+
+    Returns:
+        dict: Arguments for get_FOS.
+    """
+    if args.design0:
+        calc.design0()
+    design = dict(design0 if args.design0 else final_design)
+    for name in design:
+        if getattr(args, name) is not None:
+            design[name] = getattr(args, name)
+
+    web_height = args.web_height
+    if web_height is None:
+        web_height = (
+            design.pop("total_height") - calc.th - design["top_flange_layers"] * calc.th
+        )
+    else:
+        design.pop("total_height")
+    glue_width = calc.glue_width if args.glue_width is None else args.glue_width
+    return {**design, "web_height": web_height, "glue_width": glue_width}
+
+
+def run_envelope(args):
+    for load_case in args.load_case or (1, 2):
+        if args.plot:
+            from SFD_BMD import plot_envelope
+
+            envelope = plot_envelope(load_case, engine=args.engine)
+        else:
+            envelope = load_case_envelope(load_case, engine=args.engine)
+        print(
+            f"Load Case {load_case}: Maximum Shear Force: {envelope['shear']}, "
+            f"Maximum Bending Moment: {envelope['moment']}"
+        )
+    from envelope import default_cache
+
+    print(f"Cache: {default_cache.stats()}")
+
+
+def run_fos(args):
+    design = design_from_arguments(args)
+    for i, load_case in enumerate(args.load_case or (1, 2)):
+        print(("\n" if i else "") + f"Load Case {load_case}:")
+        max_shear_force, max_bending_moment = applied_loads(load_case=load_case)
+        get_FOS(
+            **design,
+            max_shear_force=max_shear_force,
+            max_bending_moment=max_bending_moment,
+            print_FOS=True,
+            deflection_limit=args.deflection_limit,
+            unit_deflection=applied_deflection(
+                args.deflection_limit, load_case=load_case
+            ),
+        )
+
+
+def run_graphs(args):
+    from graphs import render_plots
+
+    design = design_from_arguments(args)
+    plots = []
+    for load_case in args.load_case or (1, 2):
+        max_shear_force, max_bending_moment = applied_loads(load_case=load_case)
+        factors = get_FOS(
+            **design,
+            max_shear_force=max_shear_force,
+            max_bending_moment=max_bending_moment,
+            return_min=False,
+        )
+        plots += graph_plots(load_case_envelope(load_case), factors, f"load_case_{load_case}")
+
+    # Every image of every load case is rendered in one pool
+    rendered, skipped = render_plots(plots, workers=args.workers, force=args.force)
+    print(f"Rendered {rendered} images, skipped {skipped} unchanged")
+
+
+def run_sweep(args):
+    # Loop through range of values to try to find the optimal dimensions, for example:
+    # python bridge.py sweep --total-height 20:121:20 --top-flange-layers 1:6 \
+    #     --top-flange-width 100:150 --diaphragm-num 1:4
+    import sweep
+
+    sweep.main(args.arguments)
+
+
+def main(argv=None):
+    # Imported here since it is slow to import and only needed on the command line
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Design and check the bridge.")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        default=None,
+        help="Run the command under cProfile, writing the statistics to a file or printing them if no file is given",
+    )
+    parser.add_argument(
+        "--timings", action="store_true", help="Print the time spent in each pipeline stage"
+    )
+    parser.add_argument(
+        "--trace", default=None, help="Write the pipeline stages to a Chrome trace JSON file"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    envelope_parser = subparsers.add_parser(
+        "envelope", help="Calculate the shear force and bending moment envelopes"
+    )
+    envelope_parser.add_argument(
+        "--load-case", type=int, choices=(1, 2), action="append", default=None
+    )
+    envelope_parser.add_argument(
+        "--engine", choices=engines, default="batched"
+    )
+    envelope_parser.add_argument(
+        "--plot", action="store_true", help="Plot the envelopes and export them"
+    )
+    envelope_parser.set_defaults(function=run_envelope)
+
+    fos_parser = subparsers.add_parser("fos", help="Print the factors of safety of a design")
+    add_design_arguments(fos_parser)
+    fos_parser.add_argument(
+        "--deflection-limit", type=float, default=None, help="Largest allowed deflection in mm"
+    )
+    fos_parser.set_defaults(function=run_fos)
+
+    graphs_parser = subparsers.add_parser(
+        "graphs", help="Plot the envelopes against the capacity of each failure mode"
+    )
+    add_design_arguments(graphs_parser)
+    graphs_parser.add_argument("--workers", type=int, default=None)
+    graphs_parser.add_argument(
+        "--force", action="store_true", help="Render every image even if it is unchanged"
+    )
+    graphs_parser.set_defaults(function=run_graphs)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Sweep dimensions for the highest factor of safety",
+        description="Takes the same arguments as sweep.py.",
+        add_help=False,
+    )
+    sweep_parser.set_defaults(function=run_sweep)
+
+    # Everything after sweep is passed on to sweep.py
+    args, arguments = parser.parse_known_args(argv)
+    if arguments and args.command != "sweep":
+        parser.error(f"unrecognized arguments: {' '.join(arguments)}")
+    args.arguments = arguments
+
+    # Stages are only recorded in this process, so sweeps should run with --workers 1 when timed.
+    if args.timings or args.trace:
+        instrument.reset()
+        instrument.enable()
+    try:
+        if args.profile:
+            with instrument.profile(None if args.profile == "-" else args.profile):
+                args.function(args)
+        else:
+            args.function(args)
+    finally:
+        # Stages recorded before a failure are still reported, which is often when they are most useful
+        instrument.disable()
+        if args.timings:
+            print(instrument.summary_table())
+        if args.trace:
+            instrument.write_chrome_trace(args.trace)
+
+
+if __name__ == "__main__":
+    main()
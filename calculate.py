@@ -1,7 +1,43 @@
+import functools
+import sys
+import warnings
+
 import numpy as np
-import sympy as sy
+import instrument
+
+# sympy takes most of a second to import, so it is only imported by the symbolic functions that use it. The symbol x
+# is still available as calculate.x.
+
+
+@functools.cache
+def symbol():
+    """
+    Returns:
+        sympy.Symbol: The length along the bridge used by the symbolic functions.
+    """
+    import sympy as sy
+
+    return sy.Symbol("x", real=True)
+
+
+def __getattr__(name):
+    if name == "x":
+        return symbol()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def is_symbolic(expr):
+    """
+    Checks whether an expression is a sympy expression, without importing sympy.
+
+    Args:
+        expr (Any): The expression.
+
+    Returns:
+        bool: Whether expr is a sympy expression.
+    """
+    return "sympy" in sys.modules and isinstance(expr, sys.modules["sympy"].Basic)
 
-x = sy.Symbol("x", real=True)
 
 matboard_tensile_strength = 30  # MPa
 matboard_compressive_strength = 6  # MPa
@@ -15,6 +51,39 @@ th = 1.27  # mm
 glue_width = 10  # mm
 bottom_flange_width = th + 65
 
+# Material constants that reliability analysis samples, by the names of the module constants above
+material_names = (
+    "matboard_tensile_strength",
+    "matboard_compressive_strength",
+    "matboard_shear_strength",
+    "cement_shear_strength",
+    "matboard_youngs_modulus",
+    "th",
+)
+
+
+def material_properties(overrides=None):
+    """
+    Reads the current material constants, replacing any that are overridden.
+
+    Args:
+        overrides (dict): Maps names in material_names to values or arrays of values, one per design.
+
+    Returns:
+        dict: Maps every name in material_names to its value.
+    """
+    properties = {name: globals()[name] for name in material_names}
+    if overrides:
+        unknown = set(overrides) - set(material_names)
+        if unknown:
+            raise ValueError(f"Unknown material properties: {sorted(unknown)}")
+        properties.update(overrides)
+    return properties
+
+
+# Bump when a change to the envelope engines changes their results, so cached envelopes are recomputed
+engine_version = 1
+
 # Call this function if using design 0
 def design0():
     global glue_width, bottom_flange_width
@@ -22,8 +91,20 @@ def design0():
     bottom_flange_width = 80
 
 
-def generate_cross_section(top_flange_width, web_height, top_flange_layers):
+def generate_cross_section(
+    top_flange_width, web_height, top_flange_layers, split_layers=False, glue_width=None
+):
     # (x, y, w ,h)
+    if glue_width is None:
+        glue_width = globals()["glue_width"]
+    if split_layers:
+        # One component per top flange layer, so the glue lines between layers show up as joints
+        layers = [
+            (0, th + th * (layer + 0.5) + web_height, top_flange_width, th)
+            for layer in range(int(top_flange_layers))
+        ]
+        return generate_cross_section(top_flange_width, web_height, 0, glue_width=glue_width)[:-1] + layers
+
     return [
         (0, th / 2, bottom_flange_width, th),  # bottom flange
         (
@@ -68,10 +149,7 @@ def area(components):
     Returns:
         float: The area.
     """
-    sum1 = 0
-    for component in components:
-        sum1 += component[1] * component[2]
-    return sum1
+    return float(cross_section_of(components).area)
 
 
 def centroidal_axis(components):
@@ -83,12 +161,7 @@ def centroidal_axis(components):
     Returns:
         float: The location of the centroidal axis.
     """
-    sum1 = sum2 = 0
-    for component in components:
-        component_area = component[1] * component[2]
-        sum1 += component[0] * component_area
-        sum2 += component_area
-    return sum1 / sum2
+    return float(cross_section_of(components).centroidal_axis)
 
 
 def second_moment_area(components, axis):
@@ -101,10 +174,7 @@ def second_moment_area(components, axis):
     Returns:
         float: The second moment of area.
     """
-    sum1 = 0
-    for c in components:
-        sum1 += (c[1] * c[2] ** 3) / 12 + c[1] * c[2] * (axis - c[0]) ** 2
-    return sum1
+    return float(cross_section_of(components).second_moment_area_about(axis))
 
 
 def first_moment_area(components, axis, y):
@@ -118,21 +188,399 @@ def first_moment_area(components, axis, y):
     Returns:
         float: The first moment of area.
     """
-    cropped_components = []
-    for c in components:
-        if c[0] - c[2] / 2 > y:
-            continue
-        elif c[0] + c[2] / 2 < y:
-            cropped_components.append(c)
-        else:
-            top = y
-            bottom = c[0] - c[2] / 2
-            cropped_components.append([(top + bottom) / 2, c[1], top - bottom])
+    return cross_section_of(components).first_moment_area(y, axis)
+
+
+def section_sums(components):
+    """Calculates the area, centroidal axis, second moment of area and top of a few rectangles with plain sums, which
+    is faster than building a CrossSection for a single cross section.
+
+    Args:
+        components (list): Contains rectangles with position, width, and height, like generate_cross_section.
+
+    Returns:
+        tuple: (area, centroidal axis, second moment of area, top)
+    """
+    area = first_moment = own_second_moment = 0.0
+    top = -np.inf
+    for _, y, w, h in components:
+        a = w * h
+        area += a
+        first_moment += a * y
+        own_second_moment += a * (h * h / 12 + y * y)
+        if y + h / 2 > top:
+            top = y + h / 2
+    axis = first_moment / area
+    # Parallel axis theorem about the centroid
+    return area, axis, own_second_moment - area * axis * axis, top
+
+
+def first_moment_sums(components, axis, cuts):
+    """Calculates the first moment of area below each cut of a few rectangles with plain sums, like
+    first_moment_area_arrays.
+
+    Args:
+        components (list): Contains rectangles with position, width, and height, like generate_cross_section.
+        axis (float): Location of the axis relative to the lowest point.
+        cuts (tuple): Heights of the cuts.
+
+    Returns:
+        list: The first moment of area at each cut.
+    """
+    totals = [0.0] * len(cuts)
+    for _, y, w, h in components:
+        bottom = y - h / 2
+        for i, cut in enumerate(cuts):
+            cropped = cut - bottom
+            if cropped > 0:
+                if cropped > h:
+                    cropped = h
+                totals[i] += (axis - bottom - cropped / 2) * w * cropped
+    return totals
+
+
+def float_array(value):
+    """Converts a value to a float array, keeping array-likes that implement NumPy's __array_function__ protocol, such
+    as sensitivity.Dual, so they flow through the array functions below."""
+    if hasattr(value, "__array_function__") and not isinstance(value, np.ndarray):
+        return value
+    return np.asarray(value, dtype=float)
+
+
+def generate_cross_section_arrays(
+    top_flange_width, web_height, top_flange_layers, th=None, glue_width=None, bottom_flange_width=None
+):
+    """Builds the components of many cross sections at once, in the same order as generate_cross_section.
+
+    Args:
+        top_flange_width (np.ndarray): Width of each top flange.
+        web_height (np.ndarray): Height of each web.
+        top_flange_layers (np.ndarray): Number of layers in each top flange.
+        th (np.ndarray): Matboard thickness of each cross section. Defaults to the th constant.
+        glue_width (np.ndarray): Width of the glue tabs of each cross section. Defaults to the glue_width constant.
+        bottom_flange_width (np.ndarray): Width of each bottom flange. Defaults to the bottom_flange_width constant.
+
+    Returns:
+        tuple: (y, w, h) arrays with one row per cross section and one column per component.
+    """
+    if th is None:
+        th = globals()["th"]
+    if glue_width is None:
+        glue_width = globals()["glue_width"]
+    if bottom_flange_width is None:
+        bottom_flange_width = globals()["bottom_flange_width"]
+    top_flange_width, web_height, top_flange_layers, th, glue_width, bottom_flange_width = np.broadcast_arrays(
+        *(
+            float_array(value)
+            for value in (top_flange_width, web_height, top_flange_layers, th, glue_width, bottom_flange_width)
+        )
+    )
+
+    y = np.stack(
+        (
+            th / 2,
+            th + web_height / 2,
+            th + web_height / 2,
+            th / 2 + web_height,
+            th / 2 + web_height,
+            th + (th * top_flange_layers) / 2 + web_height,
+        ),
+        axis=-1,
+    )
+    w = np.stack(
+        (
+            bottom_flange_width,
+            th,
+            th,
+            glue_width - th,
+            glue_width - th,
+            top_flange_width,
+        ),
+        axis=-1,
+    )
+    h = np.stack(
+        (
+            th,
+            web_height,
+            web_height,
+            th,
+            th,
+            th * top_flange_layers,
+        ),
+        axis=-1,
+    )
+    return y, w, h
+
+
+def area_arrays(y, w, h):
+    """Calculates the cross-sectional area of many cross sections, with components along the last axis."""
+    return (w * h).sum(axis=-1)
+
 
-    sum1 = 0
-    for c in cropped_components:
-        sum1 += (axis - c[0]) * c[1] * c[2]
-    return sum1
+def centroidal_axis_arrays(y, w, h):
+    """Calculates the centroidal axis of many cross sections, with components along the last axis."""
+    return (y * w * h).sum(axis=-1) / (w * h).sum(axis=-1)
+
+
+def second_moment_area_arrays(y, w, h, axis):
+    """Calculates the second moment of area of many cross sections, with components along the last axis."""
+    axis = axis[..., None]
+    return (w * h**3 / 12 + w * h * (axis - y) ** 2).sum(axis=-1)
+
+
+def first_moment_area_arrays(y, w, h, axis, cut):
+    """Calculates the first moment of area below a cut of many cross sections, with components along the last axis."""
+    bottom = y - h / 2
+    cropped = np.clip(cut[..., None] - bottom, 0, h)
+    return ((axis[..., None] - (bottom + cropped / 2)) * w * cropped).sum(axis=-1)
+
+
+# Layout of every component: centre (x, y) relative to the middle of the lowest point, width and height.
+component_dtype = np.dtype([("x", "f8"), ("y", "f8"), ("w", "f8"), ("h", "f8")])
+
+
+class CrossSection:
+    """
+    A cross section made of rectangles, stored as a structured array with component_dtype. Section properties are
+    computed with array operations and cached until the geometry changes.
+    """
+
+    def __init__(self, components):
+        """
+        Args:
+            components (np.ndarray): Structured array with component_dtype.
+        """
+        self.components = components
+
+    @classmethod
+    def from_components(cls, components):
+        """Builds a cross section from rectangles given as (x, y, w, h) like generate_cross_section, or (y, w, h)."""
+        if isinstance(components, cls):
+            return components
+        if isinstance(components, np.ndarray) and components.dtype == component_dtype:
+            return cls(components)
+
+        rows = [tuple(component) for component in components]
+        if rows and len(rows[0]) == 3:
+            rows = [(0, *row) for row in rows]
+        return cls(np.array(rows, dtype=component_dtype))
+
+    @classmethod
+    def from_dimensions(
+        cls, top_flange_width, web_height, top_flange_layers, split_layers=False, glue_width=None
+    ):
+        """Builds the cross section described by generate_cross_section."""
+        return cls.from_components(
+            generate_cross_section(
+                top_flange_width, web_height, top_flange_layers, split_layers, glue_width
+            )
+        )
+
+    @property
+    def components(self):
+        return self._components
+
+    @components.setter
+    def components(self, components):
+        self._components = np.asarray(components, dtype=component_dtype)
+        if self._components.flags.writeable:
+            self._components = self._components.copy()
+            self._components.flags.writeable = False
+        self._cache = {}
+
+    def __len__(self):
+        return len(self._components)
+
+    def __setitem__(self, index, component):
+        components = self._components.copy()
+        components[index] = component
+        self.components = components
+
+    def _cached(self, name, calculate):
+        if name not in self._cache:
+            self._cache[name] = calculate()
+        return self._cache[name]
+
+    @property
+    def area(self):
+        c = self._components
+        return self._cached("area", lambda: area_arrays(c["y"], c["w"], c["h"]))
+
+    @property
+    def centroidal_axis(self):
+        c = self._components
+        return self._cached(
+            "centroidal_axis", lambda: centroidal_axis_arrays(c["y"], c["w"], c["h"])
+        )
+
+    @property
+    def second_moment_area(self):
+        return self._cached(
+            "second_moment_area",
+            lambda: self.second_moment_area_about(self.centroidal_axis),
+        )
+
+    @property
+    def top(self):
+        c = self._components
+        return self._cached("top", lambda: np.max(c["y"] + c["h"] / 2))
+
+    def second_moment_area_about(self, axis):
+        """Calculates the second moment of area about any horizontal axis."""
+        c = self._components
+        return second_moment_area_arrays(c["y"], c["w"], c["h"], np.asarray(axis))
+
+    def first_moment_area(self, y, axis=None):
+        """
+        Calculates the first moment of area below each cut.
+
+        Args:
+            y (np.ndarray): Heights of the cuts.
+            axis (float): Location of the axis. Defaults to the centroidal axis.
+
+        Returns:
+            np.ndarray: The first moment of area at each cut.
+        """
+        c = self._components
+        axis = self.centroidal_axis if axis is None else axis
+        return first_moment_area_arrays(
+            c["y"], c["w"], c["h"], np.asarray(axis), np.asarray(y, dtype=float)
+        )
+
+    def shear_flow_profile(self, shear_force, resolution=100):
+        """
+        Calculates the first moment of area Q(y) and shear stress VQ / (I b(y)) over the whole height in one pass. The
+        width b(y) and Q(y) are accumulated over the sorted component edges, so every edge is evaluated exactly along
+        with evenly spaced heights. At an edge the narrower of the widths just below and above it is used.
+
+        Args:
+            shear_force (float): Shear force applied to the cross section.
+            resolution (int): Number of evenly spaced heights evaluated between the lowest and highest points.
+
+        Returns:
+            dict: "y", "Q", "b" and "shear_stress" at each height, "critical_y" and "max_shear_stress" of the most
+            stressed plane, and "glue_joints", a list of dicts with the "y", contact width "b", "Q" and
+            "shear_stress" of every horizontal joint between components.
+        """
+        c = self._components
+        axis = self.centroidal_axis
+        bottoms = c["y"] - c["h"] / 2
+        tops = c["y"] + c["h"] / 2
+
+        # Width of the section above each edge, from the widths entering and leaving at every edge.
+        edges, inverse = np.unique(np.concatenate((bottoms, tops)), return_inverse=True)
+        changes = np.bincount(
+            inverse, weights=np.concatenate((c["w"], -c["w"])), minlength=len(edges)
+        )
+        widths = np.cumsum(changes)
+
+        # Q at each edge, integrating b(s) (axis - s) over each segment between edges.
+        lengths = np.diff(edges)
+        segment_Q = widths[:-1] * (axis * lengths - (edges[1:] ** 2 - edges[:-1] ** 2) / 2)
+        edge_Q = np.concatenate(([0], np.cumsum(segment_Q)))
+
+        # The centroidal axis is always included since Q peaks there.
+        y = np.union1d(edges, np.append(np.linspace(edges[0], edges[-1], resolution), axis))
+        segment = np.clip(np.searchsorted(edges, y, side="right") - 1, 0, len(edges) - 1)
+        start = edges[segment]
+        Q = edge_Q[segment] + widths[segment] * (axis * (y - start) - (y**2 - start**2) / 2)
+
+        below = np.concatenate(([0], widths[:-1]))
+        at_edge = np.isin(y, edges)
+        edge_width = np.where(
+            (below[segment] > 0) & (widths[segment] > 0),
+            np.minimum(below[segment], widths[segment]),
+            np.maximum(below[segment], widths[segment]),
+        )
+        b = np.where(at_edge, edge_width, widths[segment])
+
+        I = self.second_moment_area
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shear_stress = np.where(b > 0, shear_force * Q / (I * b), 0)
+        critical = np.argmax(np.abs(shear_stress))
+
+        # Joints are where the top of one component meets the bottom of another that overlaps it.
+        lefts = c["x"] - c["w"] / 2
+        rights = c["x"] + c["w"] / 2
+        overlap = np.maximum(
+            np.minimum(rights[:, None], rights) - np.maximum(lefts[:, None], lefts), 0
+        )
+        touching = np.isclose(tops[:, None], bottoms) & (overlap > 0)
+        lower, upper = np.nonzero(touching)
+        joint_y, joint_inverse = np.unique(tops[lower], return_inverse=True)
+        joint_b = np.bincount(
+            joint_inverse, weights=overlap[lower, upper], minlength=len(joint_y)
+        )
+        joint_Q = Q[np.searchsorted(y, joint_y)]
+        joint_shear_stress = shear_force * joint_Q / (I * joint_b)
+
+        return {
+            "y": y,
+            "Q": Q,
+            "b": b,
+            "shear_stress": shear_stress,
+            "critical_y": y[critical],
+            "max_shear_stress": shear_stress[critical],
+            "glue_joints": [
+                {
+                    "y": joint_y[i],
+                    "b": joint_b[i],
+                    "Q": joint_Q[i],
+                    "shear_stress": joint_shear_stress[i],
+                }
+                for i in range(len(joint_y))
+            ],
+        }
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_cross_section(components):
+    return CrossSection.from_components(components)
+
+
+def cross_section_of(components):
+    """Finds the cross section of a list of rectangles, reusing it for repeated calls with the same rectangles."""
+    if isinstance(components, CrossSection):
+        return components
+    return _cached_cross_section(tuple(tuple(component) for component in components))
+
+
+def extrema(critical_values, expr):
+    """
+    Finds the highest and lowest points of a function given the critical values, evaluating every critical value in
+    one array operation.
+
+    Args:
+        critical_values (np.ndarray): Critical values to be checked. A 2D array is checked row by row.
+        expr (Any): a sympy expression, or a vectorised function of x such as the one returned by piecewise_function.
+
+    Returns:
+        tuple: (max_value_position, max_value, min_value_position, min_value)
+    """
+    critical_values = np.asarray(critical_values, dtype=float)
+    if critical_values.ndim == 1:
+        critical_values = np.unique(critical_values)
+    if critical_values.shape[-1] == 0:
+        raise ValueError("No critical values to check.")
+
+    if is_symbolic(expr):
+        import sympy as sy
+
+        values = sy.lambdify(symbol(), expr, "numpy")(critical_values)
+    else:
+        values = expr(critical_values)
+    # A constant expression evaluates to a single value
+    values = np.broadcast_to(np.asarray(values, dtype=float), critical_values.shape)
+
+    max_index = np.argmax(values, axis=-1)[..., None]
+    min_index = np.argmin(values, axis=-1)[..., None]
+    take = lambda array, index: np.take_along_axis(array, index, axis=-1)[..., 0][()]
+    return (
+        take(critical_values, max_index),
+        take(values, max_index),
+        take(critical_values, min_index),
+        take(values, min_index),
+    )
 
 
 def max_expression(critical_values, expr):
@@ -141,23 +589,16 @@ def max_expression(critical_values, expr):
 
     Args:
         critical_values (list): a list containing all critical values to be checked.
-        expr (Any): a sympy expression.
+        expr (Any): a sympy expression, or a vectorised function of x such as the one returned by piecewise_function.
 
     Returns:
         tuple: (value, max_value)
     """
-    critical_values = list(set(critical_values))
-    max_value = 0
-    max_index = None
-    for i in range(len(critical_values)):
-        moment = expr.subs(x, critical_values[i])
-
-        if moment > max_value:
-            max_value = moment
-            max_index = i
-    return critical_values[max_index], max_value
+    max_value_position, max_value, _, _ = extrema(critical_values, expr)
+    return max_value_position, max_value
 
 
+@instrument.traced()
 def calc_reaction_forces(loads):
     """
     Calculates reaction forces and appends it to the reaction force array within loads. Works only with point loads and distributed loads.
@@ -166,38 +607,13 @@ def calc_reaction_forces(loads):
         loads: (list)
         A list containing all external forces applied to the member.
     """
-
-    # Separate the different types of forces
-    point_loads = [load for load in loads if load[0] == "point"]
-    distributed_loads = [load for load in loads if load[0] == "distributed"]
     reaction_forces = [load for load in loads if load[0] == "reaction"]
-
-    if len(reaction_forces) != 2:
-        print("Invalid Reaction Forces.")
-
-    # Loop twice to calculate each reaction force.
-    for j in range(2):
-        reaction_length = reaction_forces[j % 2][1]
-        pivot_length = reaction_forces[(j + 1) % 2][1]
-
-        # Sum up the moments of the point loads.
-        point_sum = sum([(load[2] * (load[1] - pivot_length)) for load in point_loads])
-
-        # Sum up moments of the distributed loads
-        distributed_sum = 0
-        for i in range(0, len(distributed_loads) - 1):
-            length = distributed_loads[i + 1][1] - distributed_loads[i][1]
-            radius = (
-                distributed_loads[i][1] + distributed_loads[i + 1][1]
-            ) / 2 - pivot_length
-            distributed_sum += length * radius * distributed_loads[i][2]
-
-        # Divide sum of moments by distance to get reaction force.
-        reaction_forces[j % 2].append(
-            -(distributed_sum + point_sum) / (reaction_length - pivot_length)
-        )
+    forces = load_matrices(loads, [0])[1][0, -len(reaction_forces) :]
+    for reaction, force in zip(reaction_forces, forces):
+        reaction.append(force.item())
 
 
+@instrument.traced()
 def merge_forces(loads):
     """
     Converts the provided loads, and solves for the coefficients for the shear force piecewise equation.
@@ -228,20 +644,24 @@ def merge_forces(loads):
             )
 
     previous_length = None
+    previous_distributed_force = 0
     distributed_force_sum = 0
 
-    # Add distributed force sum to point force sum to get the starting value.
+    # Add distributed force sum to point force sum to get the starting value. The distributed force over a segment is
+    # the one in effect from the start of the segment, not the one starting at its end.
     for load in merged_loads:
         if previous_length != None:
-            distributed_force_sum += load[2] * (load[0] - previous_length)
+            distributed_force_sum += previous_distributed_force * (load[0] - previous_length)
 
             load[1] -= distributed_force_sum
 
         previous_length = load[0]
+        previous_distributed_force = load[2]
 
     return merged_loads
 
 
+@instrument.traced()
 def get_shear_force_func(loads):
     """
     Creates a function for shear force.
@@ -254,6 +674,9 @@ def get_shear_force_func(loads):
         sympy.Piecewise: A piecewise function representing shear force.
         list: A list containing critical values of the function.
     """
+    import sympy as sy
+
+    x = symbol()
 
     calc_reaction_forces(loads)
 
@@ -278,7 +701,122 @@ def get_shear_force_func(loads):
     return sy.Piecewise(*shear_forces), critical_lengths
 
 
-def generate_envelop(start, stop, num_load_positions, loads, num_length_positions):
+@instrument.traced()
+def get_shear_force_coefficients(loads):
+    """
+    Creates the numeric piecewise polynomial for shear force. Segment 0 covers every x up to the first breakpoint and is
+    always zero, segment k covers (breakpoints[k - 1], breakpoints[k]] and the last segment extends to infinity.
+
+    Args:
+        loads: (list)
+        A list containing all external forces applied to the member, sorted by length.
+
+    Returns:
+        np.ndarray: The breakpoints of the piecewise function.
+        np.ndarray: Coefficients of each segment in ascending powers of (x - start of segment).
+        list: A list containing critical values of the function.
+    """
+
+    calc_reaction_forces(loads)
+
+    loads = merge_forces(loads)
+
+    critical_lengths = [load[0] for load in loads]
+
+    breakpoints = np.array(critical_lengths, dtype=float)
+    coefficients = np.zeros((len(loads) + 1, 2))
+
+    for i, load in enumerate(loads):
+        coefficients[i + 1] = (load[1], -load[2])
+
+        if load[2] != 0:
+            critical_lengths.append(load[1] / load[2] + load[0])
+
+    return breakpoints, coefficients, critical_lengths
+
+
+def integrate_piecewise(breakpoints, coefficients):
+    """
+    Integrates a numeric piecewise polynomial. The result is continuous and zero before the first breakpoint.
+
+    Args:
+        breakpoints (np.ndarray): The breakpoints of the piecewise function.
+        coefficients (np.ndarray): Coefficients of each segment in ascending powers of (x - start of segment).
+
+    Returns:
+        np.ndarray: Coefficients of the integral, with the same breakpoints.
+    """
+    degree = coefficients.shape[1]
+    integral = np.zeros((coefficients.shape[0], degree + 1))
+    integral[:, 1:] = coefficients / np.arange(1, degree + 1)
+
+    # Value of each segment's antiderivative at the end of the segment, accumulated into the starting values.
+    lengths = np.diff(breakpoints)[:, None] ** np.arange(1, degree + 1)
+    integral[2:, 0] = np.cumsum(np.sum(integral[1:-1, 1:] * lengths, axis=1))
+    return integral
+
+
+def evaluate_piecewise(breakpoints, coefficients, x_vals):
+    """
+    Evaluates a numeric piecewise polynomial using Horner's rule.
+
+    Args:
+        breakpoints (np.ndarray): The breakpoints of the piecewise function.
+        coefficients (np.ndarray): Coefficients of each segment in ascending powers of (x - start of segment).
+        x_vals (np.ndarray): The lengths to evaluate the function at.
+
+    Returns:
+        np.ndarray: The value of the function at each length.
+    """
+    x_vals = np.asarray(x_vals, dtype=float)
+    segments = np.searchsorted(breakpoints, x_vals, side="left")
+    origins = np.concatenate((breakpoints[:1], breakpoints))[segments]
+    t = x_vals - origins
+
+    values = np.zeros_like(x_vals)
+    for power in range(coefficients.shape[1] - 1, -1, -1):
+        values = values * t + coefficients[segments, power]
+    return values
+
+
+def piecewise_function(breakpoints, coefficients):
+    """
+    Wraps a numeric piecewise polynomial as a vectorised function of x.
+
+    Args:
+        breakpoints (np.ndarray): The breakpoints of the piecewise function.
+        coefficients (np.ndarray): Coefficients of each segment in ascending powers of (x - start of segment).
+
+    Returns:
+        function: Evaluates the piecewise polynomial at an array of lengths.
+    """
+    return lambda x_vals: evaluate_piecewise(breakpoints, coefficients, x_vals)
+
+
+@instrument.traced()
+def generate_envelop(
+    start, stop, num_load_positions, loads, num_length_positions, engine="batched"
+):
+    """
+    Moves the loads across the bridge and records the largest shear force and bending moment at each length.
+
+    Args:
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop.
+        loads (list): A list containing all external forces applied to the member.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+        engine (str): "batched" for generate_envelop_batched, the default of every entry point, "numpy" for the numeric
+            piecewise engine, or "sympy" for the symbolic reference.
+
+    Returns:
+        tuple: (x_vals, shear_force_envelop, bending_moment_envelop, data)
+    """
+    if engine == "batched":
+        return generate_envelop_batched(start, stop, num_load_positions, loads, num_length_positions)
+    if engine not in ("numpy", "sympy"):
+        raise ValueError(f"Unknown engine: {engine}")
+
     load_positions = np.linspace(start, stop, num_load_positions)
     shear_force_envelop = np.zeros(num_length_positions)
     bending_moment_envelop = np.zeros(num_length_positions)
@@ -286,60 +824,516 @@ def generate_envelop(start, stop, num_load_positions, loads, num_length_position
     max_bending_moment = 0
     x_vals = np.linspace(0, bridge_length / 1000, num_length_positions)
 
-    for load_position in load_positions:
-        # shift positions of loads
-        new_loads = [[param for param in load] for load in loads]
-        for load in new_loads:
-            if load[0] == "point" or load[0] == "distributed":
-                load[1] += load_position
+    # Shift the moving loads to every load position at once, and keep forces in order along the bridge, since loads can
+    # move past a support between the ends
+    moving = np.array([load[0] in ("point", "distributed") for load in loads])
+    positions = np.array([load[1] for load in loads], dtype=float) + np.outer(load_positions, moving)
+    orders = np.argsort(positions, axis=1, kind="stable")
+
+    for shifted, order in zip(positions.tolist(), orders.tolist()):
+        new_loads = [[loads[i][0], shifted[i], *loads[i][2:]] for i in order]
 
         # calculate bending moment and shear force expressions
-        shear_force_expr, critical_lengths = get_shear_force_func(new_loads)
-        bending_moment_expr = sy.integrate(shear_force_expr)
+        if engine == "sympy":
+            import sympy as sy
+
+            shear_force_expr, critical_lengths = get_shear_force_func(new_loads)
+            with instrument.span("sy.integrate"):
+                bending_moment_expr = sy.integrate(shear_force_expr)
+
+            with instrument.span("sy.lambdify"):
+                shear_force_func = sy.lambdify(symbol(), shear_force_expr)
+                bending_moment_func = sy.lambdify(symbol(), bending_moment_expr)
+        else:
+            breakpoints, shear_coefficients, critical_lengths = (
+                get_shear_force_coefficients(new_loads)
+            )
+            moment_coefficients = integrate_piecewise(breakpoints, shear_coefficients)
 
-        shear_force_func = sy.lambdify(x, shear_force_expr)
-        bending_moment_func = sy.lambdify(x, bending_moment_expr)
+            shear_force_func = piecewise_function(breakpoints, shear_coefficients)
+            bending_moment_func = piecewise_function(breakpoints, moment_coefficients)
 
-        shear_forces = shear_force_func(x_vals)
-        bending_moments = bending_moment_func(x_vals)
+        with instrument.span("calculate.generate_envelop.evaluate"):
+            shear_forces = shear_force_func(x_vals)
+            bending_moments = bending_moment_func(x_vals)
 
         # Compare bending moment and shear forces and find maximum values
-        for i in range(len(x_vals)):
-            if abs(shear_forces[i]) > abs(shear_force_envelop[i]):
-                shear_force_envelop[i] = shear_forces[i]
-            if bending_moments[i] > bending_moment_envelop[i]:
-                bending_moment_envelop[i] = bending_moments[i]
-
-        max_shear_force = max(
-            max_expression(critical_lengths, abs(shear_force_expr))[1], max_shear_force
+        with instrument.span("calculate.generate_envelop.update"):
+            shear_force_envelop = np.where(
+                np.abs(shear_forces) > np.abs(shear_force_envelop), shear_forces, shear_force_envelop
+            )
+            np.maximum(bending_moment_envelop, bending_moments, out=bending_moment_envelop)
+
+        # The largest shear force in either direction comes from the same evaluation
+        with instrument.span("calculate.generate_envelop.extrema"):
+            _, highest_shear_force, _, lowest_shear_force = extrema(
+                critical_lengths, shear_force_func
+            )
+            max_shear_force = max(highest_shear_force, -lowest_shear_force, max_shear_force)
+            max_bending_moment = max(
+                max_expression(critical_lengths, bending_moment_func)[1], max_bending_moment
+            )
+        instrument.count("calculate.generate_envelop.load_positions")
+
+    return (
+        x_vals,
+        shear_force_envelop,
+        bending_moment_envelop,
+        {"x": list(map(str,x_vals)), "shear_force_envelope": list(map(str,shear_force_envelop)), "bending_moment_envelope":list(map(str,bending_moment_envelop)), "shear": str(max_shear_force), "moment": str(max_bending_moment)},
+    )
+
+
+def reaction_matrix(reactions):
+    """
+    Builds the equations for the reaction forces as a matrix: vertical and moment equilibrium, and zero deflection at
+    every support. Deflection uses Macaulay's method with a constant flexural rigidity, so the unknowns are the reaction
+    forces followed by the two constants of integration. With two supports the deflection equations only decide the
+    constants, and with more they make a continuous beam solvable.
+
+    Args:
+        reactions (np.ndarray): Lengths of the reactions.
+
+    Returns:
+        np.ndarray: Square matrix with one row per equation and one column per unknown.
+    """
+    num_reactions = len(reactions)
+    matrix = np.zeros((num_reactions + 2, num_reactions + 2))
+    matrix[0, :num_reactions] = 1
+    matrix[1, :num_reactions] = reactions
+    matrix[2:, :num_reactions] = (
+        -np.maximum(reactions[:, None] - reactions[None, :], 0) ** 3 / 6
+    )
+    matrix[2:, num_reactions] = 1
+    matrix[2:, num_reactions + 1] = reactions
+    return matrix
+
+
+def reaction_loads(reactions, point_positions, point_forces, starts, ends, intensities):
+    """
+    Builds the right-hand sides of the equations from reaction_matrix, one row per load position.
+
+    Args:
+        reactions (np.ndarray): Lengths of the reactions.
+        point_positions (np.ndarray): Positions of the point loads, one row per load position.
+        point_forces (np.ndarray): Forces of the point loads, one row per load position.
+        starts (np.ndarray): Start of each distributed load segment, one row per load position.
+        ends (np.ndarray): End of each distributed load segment, one row per load position.
+        intensities (np.ndarray): Uniform load of each distributed load segment.
+
+    Returns:
+        np.ndarray: One row per load position and one column per equation.
+    """
+    lengths = ends - starts
+    vertical = -np.sum(point_forces, axis=1) - np.sum(lengths * intensities, axis=1)
+    moment = -np.sum(point_forces * point_positions, axis=1) - np.sum(
+        lengths * intensities * (starts + ends) / 2, axis=1
+    )
+
+    # Deflection of the applied loads at each support
+    at_supports = reactions[:, None]
+    deflection = np.sum(
+        point_forces[:, None, :]
+        * np.maximum(at_supports - point_positions[:, None, :], 0) ** 3
+        / 6,
+        axis=2,
+    ) + np.sum(
+        intensities
+        * (
+            np.maximum(at_supports - starts[:, None, :], 0) ** 4
+            - np.maximum(at_supports - ends[:, None, :], 0) ** 4
         )
-        max_bending_moment = max(
-            max_expression(critical_lengths, bending_moment_expr)[1], max_bending_moment
+        / 24,
+        axis=2,
+    )
+    return np.concatenate((vertical[:, None], moment[:, None], deflection), axis=1)
+
+
+@instrument.traced()
+def solve_reactions(reactions, point_positions, point_forces, starts, ends, intensities):
+    """
+    Solves the reaction forces of every load position with one factorization of reaction_matrix.
+
+    Args:
+        reactions (np.ndarray): Lengths of the reactions.
+        point_positions (np.ndarray): Positions of the point loads, one row per load position.
+        point_forces (np.ndarray): Forces of the point loads, one row per load position.
+        starts (np.ndarray): Start of each distributed load segment, one row per load position.
+        ends (np.ndarray): End of each distributed load segment, one row per load position.
+        intensities (np.ndarray): Uniform load of each distributed load segment.
+
+    Returns:
+        np.ndarray: Reaction forces, one row per load position.
+    """
+    if len(reactions) < 2 or len(np.unique(reactions)) != len(reactions):
+        raise ValueError("Invalid Reaction Forces.")
+
+    right_hand_sides = reaction_loads(
+        reactions, point_positions, point_forces, starts, ends, intensities
+    )
+    solution = np.linalg.solve(reaction_matrix(reactions), right_hand_sides.T)
+    return solution[: len(reactions)].T
+
+
+@instrument.traced()
+def load_matrices(loads, load_positions):
+    """
+    Shifts the loads to every load position at once and solves the reaction forces for each position.
+
+    Args:
+        loads (list): A list containing all external forces applied to the member, with at least two reactions.
+        load_positions (np.ndarray): Offsets of the moving loads.
+
+    Returns:
+        np.ndarray: Positions of the point loads and reactions, one row per load position.
+        np.ndarray: Forces of the point loads and reactions, one row per load position.
+        np.ndarray: Start of each distributed load segment, one row per load position.
+        np.ndarray: End of each distributed load segment, one row per load position.
+        np.ndarray: Uniform load of each distributed load segment.
+    """
+    load_positions = np.asarray(load_positions, dtype=float)[:, None]
+    point_loads = np.array(
+        [load[1:3] for load in loads if load[0] == "point"], dtype=float
+    ).reshape(-1, 2)
+    distributed_loads = np.array(
+        [load[1:3] for load in loads if load[0] == "distributed"], dtype=float
+    ).reshape(-1, 2)
+    reactions = np.array(
+        [load[1] for load in loads if load[0] == "reaction"], dtype=float
+    )
+
+    point_positions = point_loads[:, 0] + load_positions
+    point_forces = np.broadcast_to(point_loads[:, 1], point_positions.shape)
+    starts = distributed_loads[:-1, 0] + load_positions
+    ends = distributed_loads[1:, 0] + load_positions
+    intensities = distributed_loads[:-1, 1]
+
+    reaction_forces = solve_reactions(
+        reactions, point_positions, point_forces, starts, ends, intensities
+    )
+
+    positions = np.concatenate(
+        (
+            point_positions,
+            np.broadcast_to(reactions, (len(load_positions), len(reactions))),
+        ),
+        axis=1,
+    )
+    forces = np.concatenate((point_forces, reaction_forces), axis=1)
+    return positions, forces, starts, ends, intensities
+
+
+@instrument.traced()
+def evaluate_loads(positions, forces, starts, ends, intensities, x_vals):
+    """
+    Evaluates shear force and bending moment for every load position by superposition.
+
+    Args:
+        positions (np.ndarray): Positions of the point loads and reactions, one row per load position.
+        forces (np.ndarray): Forces of the point loads and reactions, one row per load position.
+        starts (np.ndarray): Start of each distributed load segment, one row per load position.
+        ends (np.ndarray): End of each distributed load segment, one row per load position.
+        intensities (np.ndarray): Uniform load of each distributed load segment.
+        x_vals (np.ndarray): Lengths to evaluate, either shared by every row or one row per load position.
+
+    Returns:
+        np.ndarray: Shear force, one row per load position.
+        np.ndarray: Bending moment, one row per load position.
+    """
+    x_vals = np.asarray(x_vals, dtype=float)[..., None]
+
+    distance = x_vals - positions[:, None, :]
+    shear_forces = -np.sum(forces[:, None, :] * (distance > 0), axis=2)
+    bending_moments = -np.sum(forces[:, None, :] * np.maximum(distance, 0), axis=2)
+
+    if intensities.size:
+        from_start = np.maximum(x_vals - starts[:, None, :], 0)
+        from_end = np.maximum(x_vals - ends[:, None, :], 0)
+        shear_forces -= np.sum(intensities * (from_start - from_end), axis=2)
+        bending_moments -= np.sum(intensities * (from_start**2 - from_end**2), axis=2) / 2
+
+    return shear_forces, bending_moments
+
+
+def critical_lengths_matrix(positions, starts, ends, intensities, forces):
+    """
+    Finds the lengths where shear force or bending moment can peak, one row per load position.
+
+    Args:
+        positions (np.ndarray): Positions of the point loads and reactions, one row per load position.
+        starts (np.ndarray): Start of each distributed load segment, one row per load position.
+        ends (np.ndarray): End of each distributed load segment, one row per load position.
+        intensities (np.ndarray): Uniform load of each distributed load segment.
+        forces (np.ndarray): Forces of the point loads and reactions, one row per load position.
+
+    Returns:
+        np.ndarray: The critical lengths.
+    """
+    breakpoints = np.sort(np.concatenate((positions, starts, ends), axis=1), axis=1)
+    if not intensities.size:
+        return breakpoints
+
+    # Bending moment also peaks where the shear force crosses zero under a distributed load.
+    shear_forces, _ = evaluate_loads(
+        positions, forces, starts, ends, intensities, breakpoints
+    )
+    slopes = -np.sum(
+        intensities
+        * ((starts[:, None, :] < breakpoints[..., None]) & (breakpoints[..., None] <= ends[:, None, :])),
+        axis=2,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zeros = breakpoints - shear_forces / slopes
+    segment_starts = np.concatenate((breakpoints[:, :1], breakpoints[:, :-1]), axis=1)
+    zeros = np.where(slopes != 0, np.clip(zeros, segment_starts, breakpoints), breakpoints)
+    return np.concatenate((breakpoints, zeros), axis=1)
+
+
+@instrument.traced()
+def generate_envelop_batched(
+    start, stop, num_load_positions, loads, num_length_positions
+):
+    """
+    Builds the shear force and bending moment envelopes for every load position in one pass of array operations.
+
+    Args:
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop.
+        loads (list): A list containing all external forces applied to the member.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+
+    Returns:
+        tuple: (x_vals, shear_force_envelop, bending_moment_envelop, data), where data also holds the load position
+        that governs each length.
+    """
+    load_positions = np.linspace(start, stop, num_load_positions)
+    x_vals = np.linspace(0, bridge_length / 1000, num_length_positions)
+    matrices = load_matrices(loads, load_positions)
+    positions, forces, starts, ends, intensities = matrices
+
+    # (positions x lengths) matrices reduced along the load position axis
+    shear_forces, bending_moments = evaluate_loads(*matrices, x_vals)
+    stations = np.arange(num_length_positions)
+
+    shear_force_index = np.argmax(np.abs(shear_forces), axis=0)
+    shear_force_envelop = shear_forces[shear_force_index, stations]
+    bending_moment_index = np.argmax(bending_moments, axis=0)
+    bending_moment_envelop = np.maximum(bending_moments[bending_moment_index, stations], 0)
+
+    critical_lengths = critical_lengths_matrix(positions, starts, ends, intensities, forces)
+    critical_shear_forces, critical_bending_moments = evaluate_loads(
+        *matrices, critical_lengths
+    )
+    max_shear_force = max(np.max(np.abs(critical_shear_forces)), 0)
+    max_bending_moment = max(np.max(critical_bending_moments), 0)
+
+    return (
+        x_vals,
+        shear_force_envelop,
+        bending_moment_envelop,
+        {
+            "x": list(map(str, x_vals)),
+            "shear_force_envelope": list(map(str, shear_force_envelop)),
+            "bending_moment_envelope": list(map(str, bending_moment_envelop)),
+            "shear": str(max_shear_force),
+            "moment": str(max_bending_moment),
+            "shear_force_position": list(map(str, load_positions[shear_force_index])),
+            "bending_moment_position": list(map(str, load_positions[bending_moment_index])),
+        },
+    )
+
+
+@instrument.traced()
+def generate_envelop_adaptive(
+    start,
+    stop,
+    num_load_positions,
+    loads,
+    num_length_positions,
+    tolerance=1e-3,
+    envelope_tolerance=None,
+    max_evaluations=10000,
+):
+    """
+    Builds the shear force and bending moment envelopes from a coarse set of load positions, then repeatedly halves
+    only the intervals that could still hold a larger maximum shear force or bending moment than found so far.
+
+    With a train of point loads on two supports, the positions where a load crosses a support split the sweep into
+    intervals where the order of forces is fixed. On each of them the shear force at every critical length is linear in
+    the load position, with slope at most the total force over the span, and the bending moment is quadratic with
+    curvature at most four times that. An interval of width h therefore cannot beat its ends by more than slope * h
+    for shear force or curvature * h^2 / 8 for bending moment, which bounds the error of the maxima.
+
+    At a fixed length the responses are linear in the load position until a load crosses that length, where shear force
+    jumps and bending moment changes slope by at most the total force. Intervals without a crossing are exact, and
+    intervals with one are refined until they are within envelope_tolerance of the envelope at that length, relative to
+    the largest value of the envelope. Refinement stops with a RuntimeWarning if max_evaluations is reached first.
+
+    Args:
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop to start from.
+        loads (list): A list containing the point loads and two reactions applied to the member.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+        tolerance (float): Largest allowed error in the maximum shear force and bending moment.
+        envelope_tolerance (float): Largest allowed error in the envelopes at each length, as a fraction of the largest
+            value of each envelope, or None to only refine for the maxima.
+        max_evaluations (int): Largest number of load positions to evaluate.
+
+    Returns:
+        tuple: (x_vals, shear_force_envelop, bending_moment_envelop, data), where data also holds the load position
+        that governs each length, the number of "evaluations", the "error_bound" of the maxima and the
+        "envelope_error_bound" of the envelopes as a fraction of their largest values.
+    """
+    reactions = np.array([load[1] for load in loads if load[0] == "reaction"], dtype=float)
+    tiny = np.finfo(float).tiny
+    if any(load[0] == "distributed" for load in loads) or len(reactions) != 2:
+        raise ValueError(
+            "Adaptive refinement only supports trains of point loads on two supports."
         )
+    offsets = np.sort([load[1] for load in loads if load[0] == "point"])
+    total_force = np.sum(np.abs([load[2] for load in loads if load[0] == "point"]))
+
+    span = abs(reactions[1] - reactions[0])
+    shear_slope = total_force / span
+    moment_curvature = 4 * shear_slope
+
+    x_vals = np.linspace(0, bridge_length / 1000, num_length_positions)
+
+    def evaluate(load_positions):
+        matrices = load_matrices(loads, load_positions)
+        positions, forces, starts, ends, intensities = matrices
+        shear_forces, bending_moments = evaluate_loads(*matrices, x_vals)
+
+        critical_lengths = critical_lengths_matrix(positions, starts, ends, intensities, forces)
+        critical_shear_forces, critical_bending_moments = evaluate_loads(
+            *matrices, critical_lengths
+        )
+        return (
+            shear_forces,
+            bending_moments,
+            np.max(np.abs(critical_shear_forces), axis=1),
+            np.max(critical_bending_moments, axis=1),
+        )
+
+    crossings = (reactions[:, None] - offsets).ravel()
+    crossings = crossings[(crossings > start) & (crossings < stop)]
+    load_positions = np.unique(
+        np.concatenate((np.linspace(start, stop, num_load_positions), crossings))
+    )
+    results = evaluate(load_positions)
+
+    while True:
+        shear_forces, bending_moments, max_shear_forces, max_bending_moments = results
+        max_shear_force = max(np.max(max_shear_forces), 0)
+        max_bending_moment = max(np.max(max_bending_moments), 0)
+        widths = np.diff(load_positions)
+
+        shear_force_bounds = (
+            np.maximum(max_shear_forces[:-1], max_shear_forces[1:]) + shear_slope * widths
+        )
+        bending_moment_bounds = (
+            np.maximum(max_bending_moments[:-1], max_bending_moments[1:])
+            + moment_curvature * widths**2 / 8
+        )
+        error_bound = max(
+            np.max(shear_force_bounds, initial=max_shear_force) - max_shear_force,
+            np.max(bending_moment_bounds, initial=max_bending_moment) - max_bending_moment,
+        )
+        live = (shear_force_bounds > max_shear_force + tolerance) | (
+            bending_moment_bounds > max_bending_moment + tolerance
+        )
+
+        # Count the loads crossing each length within each interval, one row per interval
+        num_crossings = np.searchsorted(
+            offsets, x_vals - load_positions[:-1, None], side="left"
+        ) - np.searchsorted(offsets, x_vals - load_positions[1:, None], side="right")
+        abs_shear_forces = np.abs(shear_forces)
+        station_shear_force_bounds = np.maximum(
+            abs_shear_forces[:-1], abs_shear_forces[1:]
+        ) + np.where(num_crossings > 0, shear_slope * widths[:, None], 0)
+        station_bending_moment_bounds = np.where(
+            num_crossings > 0,
+            (bending_moments[:-1] + bending_moments[1:]) / 2
+            + total_force * widths[:, None] / 2,
+            np.maximum(bending_moments[:-1], bending_moments[1:]),
+        )
+        # Errors at each length relative to the largest value of each envelope, so shear force and bending moment
+        # are held to the same tolerance whatever their units and the size of the loads
+        station_errors = np.maximum(
+            (station_shear_force_bounds - np.max(abs_shear_forces, axis=0)) / max(max_shear_force, tiny),
+            (station_bending_moment_bounds - np.max(bending_moments, axis=0)) / max(max_bending_moment, tiny),
+        )
+        # The bounds only hold for one crossing, so intervals with more are always refined.
+        station_errors = np.where(num_crossings > 1, np.inf, station_errors)
+        envelope_error_bound = max(np.max(station_errors, initial=0), 0)
+        if envelope_tolerance is not None:
+            live |= np.any(station_errors > envelope_tolerance, axis=1)
+
+        remaining = max_evaluations - len(load_positions)
+        if not np.any(live):
+            break
+        if remaining <= 0:
+            warnings.warn(
+                f"Adaptive refinement reached max_evaluations={max_evaluations} before converging, with an error "
+                f"bound of {error_bound:.3g} in the maxima and {envelope_error_bound:.3g} in the envelopes.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+            break
+
+        midpoints = ((load_positions[:-1] + load_positions[1:]) / 2)[live][:remaining]
+        order = np.argsort(np.concatenate((load_positions, midpoints)), kind="stable")
+        load_positions = np.concatenate((load_positions, midpoints))[order]
+        results = tuple(
+            np.concatenate((old, new))[order]
+            for old, new in zip(results, evaluate(midpoints))
+        )
+
+    stations = np.arange(num_length_positions)
+    shear_force_index = np.argmax(np.abs(shear_forces), axis=0)
+    shear_force_envelop = shear_forces[shear_force_index, stations]
+    bending_moment_index = np.argmax(bending_moments, axis=0)
+    bending_moment_envelop = np.maximum(bending_moments[bending_moment_index, stations], 0)
 
     return (
         x_vals,
         shear_force_envelop,
         bending_moment_envelop,
-        {"x": list(map(str,x_vals)), "shear_force_envelope": list(map(str,shear_force_envelop)), "bending_moment_envelope":list(map(str,bending_moment_envelop)), "shear": str(max_shear_force), "moment": str(max_bending_moment)},
+        {
+            "x": list(map(str, x_vals)),
+            "shear_force_envelope": list(map(str, shear_force_envelop)),
+            "bending_moment_envelope": list(map(str, bending_moment_envelop)),
+            "shear": str(max_shear_force),
+            "moment": str(max_bending_moment),
+            "shear_force_position": list(map(str, load_positions[shear_force_index])),
+            "bending_moment_position": list(map(str, load_positions[bending_moment_index])),
+            "evaluations": str(len(load_positions)),
+            "error_bound": str(error_bound),
+            "envelope_error_bound": str(envelope_error_bound),
+        },
     )
 
 
-def thin_plate_buckling(k, t, b):
+def thin_plate_buckling(k, t, b, youngs_modulus=None):
+    if youngs_modulus is None:
+        youngs_modulus = matboard_youngs_modulus
     return (
         k
         * (np.pi**2)
-        * matboard_youngs_modulus
+        * youngs_modulus
         / (12 * (1 - matboard_poissons_ratio**2))
         * (t / b) ** 2
     )
 
 
-def thin_plate_buckling_shear(t, h, a):
+def thin_plate_buckling_shear(t, h, a, youngs_modulus=None):
+    if youngs_modulus is None:
+        youngs_modulus = matboard_youngs_modulus
     return (
         5
         * (np.pi**2)
-        * matboard_youngs_modulus
+        * youngs_modulus
         / (12 * (1 - matboard_poissons_ratio**2))
         * ((t / h) ** 2 + (t / a) ** 2)
     )
\ No newline at end of file
@@ -0,0 +1,140 @@
+import functools
+
+import numpy as np
+import calculate as calc
+
+
+def cumulative_trapezoid(values, x_vals):
+    """
+    Integrates along the last axis with the trapezoid rule, starting from zero at the first length.
+
+    Args:
+        values (np.ndarray): Values to integrate, one row per load position.
+        x_vals (np.ndarray): Lengths of the values.
+
+    Returns:
+        np.ndarray: Integral up to each length.
+    """
+    steps = np.diff(x_vals) * (values[..., 1:] + values[..., :-1]) / 2
+    return np.concatenate(
+        (np.zeros(values.shape[:-1] + (1,)), np.cumsum(steps, axis=-1)), axis=-1
+    )
+
+
+def deflection_profiles(bending_moments, x_vals, reactions, flexural_rigidity=1.0):
+    """
+    Integrates M / EI twice along the bridge for every load position, then adds the rotation and offset that put zero
+    deflection at the supports. Rotation is the cumulative trapezoid of the curvature, and deflection integrates the
+    piecewise quadratic rotation. Both are exact for point loads that fall on lengths in x_vals, where the moment is
+    linear between lengths, and converge with the spacing of x_vals otherwise.
+
+    Args:
+        bending_moments (np.ndarray): Bending moment in Nm at each length, one row per load position.
+        x_vals (np.ndarray): Lengths in m, which must include every support.
+        reactions (np.ndarray): Lengths of the reactions in m.
+        flexural_rigidity (float): E * I in N mm^2.
+
+    Returns:
+        np.ndarray: Rotation in radians, one row per load position.
+        np.ndarray: Deflection in mm, positive downwards, one row per load position.
+    """
+    lengths = x_vals * 1e3
+    curvature = bending_moments * 1e3 / flexural_rigidity
+    rotation = cumulative_trapezoid(curvature, lengths)
+
+    step = np.diff(lengths)
+    steps = (
+        step * rotation[..., :-1]
+        + step**2 * (2 * curvature[..., :-1] + curvature[..., 1:]) / 6
+    )
+    deflection = np.concatenate(
+        (np.zeros(curvature.shape[:-1] + (1,)), np.cumsum(steps, axis=-1)), axis=-1
+    )
+
+    # Least squares fit of deflection = c0 + c1 x through the supports, which is exact for two supports and for
+    # moments from compatible reactions. Every load position shares the one pseudo-inverse.
+    supports = np.searchsorted(x_vals, reactions)
+    if not np.allclose(x_vals[supports], reactions):
+        raise ValueError("Lengths must include every support.")
+    support_matrix = np.stack((np.ones(len(reactions)), reactions * 1e3), axis=1)
+    offset, slope = np.linalg.pinv(support_matrix) @ -deflection[..., supports].T
+
+    rotation = rotation + slope[:, None]
+    deflection = deflection + offset[:, None] + slope[:, None] * lengths
+    return rotation, -deflection
+
+
+def deflection_envelope(
+    loads,
+    start,
+    stop,
+    num_load_positions,
+    num_length_positions,
+    flexural_rigidity=1.0,
+):
+    """
+    Moves the loads across the bridge and records the largest deflection and rotation at each length, evaluating every
+    load position in one pass of array operations.
+
+    Args:
+        loads (list): A list containing all external forces applied to the member.
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop.
+        num_length_positions (int): Number of lengths along the bridge to evaluate. The supports and the middle of the
+            span are added to them.
+        flexural_rigidity (float): E * I in N mm^2. Deflection and rotation are inversely proportional to it.
+
+    Returns:
+        dict: "x", "deflection_envelope" and "rotation_envelope" at each length, "deflection_position" with the load
+        position that governs each length, and the scalars "max_deflection", "max_midspan_deflection" and
+        "max_rotation".
+    """
+    load_positions = np.linspace(start, stop, num_load_positions)
+    reactions = np.array([load[1] for load in loads if load[0] == "reaction"], dtype=float)
+    midspan = (reactions.min() + reactions.max()) / 2
+    x_vals = np.union1d(
+        np.linspace(0, calc.bridge_length / 1000, num_length_positions),
+        np.append(reactions, midspan),
+    )
+
+    matrices = calc.load_matrices(loads, load_positions)
+    _, bending_moments = calc.evaluate_loads(*matrices, x_vals)
+    rotation, deflection = deflection_profiles(
+        bending_moments, x_vals, reactions, flexural_rigidity
+    )
+
+    stations = np.arange(len(x_vals))
+    deflection_index = np.argmax(deflection, axis=0)
+    rotation_index = np.argmax(np.abs(rotation), axis=0)
+    deflection_envelope = deflection[deflection_index, stations]
+    rotation_envelope = rotation[rotation_index, stations]
+
+    return {
+        "x": x_vals,
+        "deflection_envelope": deflection_envelope,
+        "rotation_envelope": rotation_envelope,
+        "deflection_position": load_positions[deflection_index],
+        "max_deflection": float(np.max(deflection_envelope)),
+        "max_midspan_deflection": float(
+            deflection_envelope[np.searchsorted(x_vals, midspan)]
+        ),
+        "max_rotation": float(np.max(np.abs(rotation_envelope))),
+    }
+
+
+@functools.cache
+def unit_deflection(load_case):
+    """
+    Finds the deflection envelope of a load case for a flexural rigidity of 1 N mm^2. Dividing by a design's E * I
+    gives its deflections, so sweeps only integrate each load case once.
+
+    Args:
+        load_case (int): 1 or 2.
+
+    Returns:
+        dict: See deflection_envelope.
+    """
+    from envelope import load_cases
+
+    return deflection_envelope(**load_cases[load_case])
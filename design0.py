@@ -1,3 +1,5 @@
+import os
+
 import calculate
 import graphs
 import sympy as sy
@@ -39,7 +41,7 @@ graphs.plot_expr(
     x_axis_label="Length (m)",
     y_axis_label="Shear Force (N)",
     fill=True,
-    save_path="img\\design0_SFD.png",
+    save_path=os.path.join(graphs.default_output_directory, "img", "design0_SFD.png"),
     show=False,
 )
 
@@ -52,7 +54,7 @@ graphs.plot_expr(
     x_axis_label="Length (m)",
     y_axis_label="Bending Moment (Nm)",
     fill=True,
-    save_path="img\\design0_BMD.png",
+    save_path=os.path.join(graphs.default_output_directory, "img", "design0_BMD.png"),
     invert_y=True,
     show=False,
 )
@@ -0,0 +1,513 @@
+import argparse
+import collections
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+import calculate as calc
+import instrument
+
+# Every envelope file starts with this, followed by the header length as a little-endian uint32
+magic = b"ENVELOPE"
+format_version = 1
+
+# Per station arrays, in the order they are stored. The governing load positions are optional.
+columns = (
+    "x",
+    "shear_force_envelope",
+    "bending_moment_envelope",
+    "shear_force_position",
+    "bending_moment_position",
+)
+
+# Data is aligned so the memory map can be viewed as float64 without copying
+alignment = 64
+
+# Directory of this module, so files are found wherever the scripts are run from
+root = os.path.dirname(os.path.abspath(__file__))
+
+# Envelopes of the load cases from the original SFD_BMD.py, which the envelope engines are checked against
+reference_files = {1: os.path.join(root, "data2.json"), 2: os.path.join(root, "data.json")}
+
+# Envelopes exported by SFD_BMD.py. They are regenerated from the load cases, so the directory is not tracked.
+data_directory = os.path.join(root, "data")
+
+
+def exported_envelope_path(load_case):
+    """
+    Args:
+        load_case (int): 1 or 2.
+
+    Returns:
+        str: Path SFD_BMD.py exports the envelope of the load case to.
+    """
+    return os.path.join(data_directory, f"load_case_{load_case}.envelope")
+
+
+def save_envelope(path, data, **metadata):
+    """
+    Writes an envelope to a binary file. The file is a JSON header holding the scalar maxima and metadata, followed
+    by one float64 row per stored column.
+
+    Args:
+        path (str): Path of the file.
+        data (dict): Envelope in the format returned by generate_envelop, with values as numbers or strings.
+        **metadata: Stored with the envelope, such as load_case, num_load_positions and engine.
+
+    Returns:
+        dict: The header that was written.
+    """
+    stored = [name for name in columns if name in data]
+    values = np.array([np.asarray(data[name], dtype=float) for name in stored])
+
+    header = {
+        "format_version": format_version,
+        "columns": stored,
+        "num_length_positions": values.shape[1],
+        "shear": float(data["shear"]),
+        "moment": float(data["moment"]),
+        "metadata": metadata,
+    }
+    encoded = json.dumps(header).encode("utf-8")
+    prefix_length = len(magic) + 4
+    padding = -(prefix_length + len(encoded)) % alignment
+    encoded += b" " * padding
+
+    with open(path, "wb") as f:
+        f.write(magic)
+        f.write(np.uint32(len(encoded)).tobytes())
+        f.write(encoded)
+        f.write(np.ascontiguousarray(values, dtype="<f8").tobytes())
+    return header
+
+
+def read_header(path):
+    """
+    Reads the header of an envelope file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        dict: The header, with "offset" set to where the float data starts.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not an envelope file.")
+        length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+        header = json.loads(f.read(length))
+
+    if header["format_version"] > format_version:
+        raise ValueError(f"{path} was written by a newer version of the envelope format.")
+    header["offset"] = len(magic) + 4 + length
+    return header
+
+
+def load_envelope(path, mmap=True):
+    """
+    Reads an envelope written by save_envelope, or a data.json file written by an older version of SFD_BMD.py.
+
+    Args:
+        path (str): Path of the file.
+        mmap (bool): Whether to memory map the arrays instead of reading them into memory.
+
+    Returns:
+        dict: The same keys as generate_envelop's data, with arrays for the per station values, floats for "shear"
+        and "moment", and the stored "metadata".
+    """
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return load_envelope_data(json.load(f), {})
+
+    header = read_header(path)
+    shape = (len(header["columns"]), header["num_length_positions"])
+    if mmap:
+        values = np.memmap(path, dtype="<f8", mode="r", offset=header["offset"], shape=shape)
+    else:
+        with open(path, "rb") as f:
+            f.seek(header["offset"])
+            values = np.fromfile(f, dtype="<f8", count=shape[0] * shape[1]).reshape(shape)
+
+    envelope = dict(zip(header["columns"], values))
+    envelope["shear"] = header["shear"]
+    envelope["moment"] = header["moment"]
+    envelope["metadata"] = header["metadata"]
+    return envelope
+
+
+# Train loads of the two load cases, with the load positions and resolution SFD_BMD.py uses for them
+load_cases = {
+    1: {
+        "loads": [
+            ["reaction", 0],
+            ["point", 0.172, 200 / 3],
+            ["point", 0.348, 200 / 3],
+            ["point", 0.512, 200 / 3],
+            ["point", 0.688, 200 / 3],
+            ["point", 0.852, 200 / 3],
+            ["point", 1.028, 200 / 3],
+            ["reaction", 1.200],
+        ],
+        "start": -0.172,
+        "stop": 0.172,
+        "num_load_positions": 50,
+        "num_length_positions": 1000,
+    },
+    2: {
+        "loads": [
+            ["reaction", 0],
+            ["point", 0.172, 200 / 3],
+            ["point", 0.348, 200 / 3],
+            ["point", 0.512, 200 / 3],
+            ["point", 0.688, 200 / 3],
+            ["point", 0.852, 90],
+            ["point", 1.028, 90],
+            ["reaction", 1.200],
+        ],
+        "start": -0.172,
+        "stop": 0.172,
+        "num_load_positions": 50,
+        "num_length_positions": 1000,
+    },
+}
+
+engines = ("batched", "adaptive", "numpy", "sympy", "influence")
+
+
+def engine_options(engine, options=None):
+    """
+    Fills in the settings of an engine that change its output, so equal settings are equal however they are given.
+
+    Args:
+        engine (str): One of engines.
+        options (dict): Settings given for the engine. Only the adaptive engine has any, which are the keyword arguments
+            of calc.generate_envelop_adaptive after num_length_positions.
+
+    Returns:
+        dict: Every setting of the engine, with the engine's default for those not given.
+    """
+    options = options or {}
+    defaults = {}
+    if engine == "adaptive":
+        parameters = inspect.signature(calc.generate_envelop_adaptive).parameters.values()
+        defaults = {
+            parameter.name: parameter.default for parameter in parameters if parameter.default is not parameter.empty
+        }
+    unknown = set(options) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown options for the {engine} engine: {sorted(unknown)}")
+    return {**defaults, **options}
+
+
+@instrument.traced()
+def compute_envelope(loads, start, stop, num_load_positions, num_length_positions, engine, **options):
+    """
+    Calculates an envelope with one of the envelope engines.
+
+    Args:
+        loads (list): A list containing all external forces applied to the member.
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+        engine (str): One of engines.
+        **options: Settings of the engine, see engine_options.
+
+    Returns:
+        dict: Envelope in the format returned by generate_envelop.
+    """
+    options = engine_options(engine, options)
+    if engine == "batched":
+        return calc.generate_envelop_batched(
+            start, stop, num_load_positions, loads, num_length_positions
+        )[3]
+    if engine == "adaptive":
+        return calc.generate_envelop_adaptive(
+            start, stop, num_load_positions, loads, num_length_positions, **options
+        )[3]
+    if engine == "influence":
+        import influence_lines
+
+        return influence_lines.generate_envelop(
+            start, stop, num_load_positions, loads, num_length_positions
+        )[3]
+    return calc.generate_envelop(
+        start, stop, num_load_positions, loads, num_length_positions, engine=engine
+    )[3]
+
+
+def envelope_key(loads, start, stop, num_load_positions, num_length_positions, engine, **options):
+    """
+    Hashes everything an envelope depends on, so equal load cases share a key however their numbers are written.
+
+    Args:
+        loads (list): A list containing all external forces applied to the member.
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Number of load positions between start and stop.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+        engine (str): One of engines.
+        **options: Settings of the engine, see engine_options.
+
+    Returns:
+        str: Hex digest of the load case.
+    """
+    canonical = {
+        "loads": [[load[0]] + [float(value) for value in load[1:]] for load in loads],
+        "start": float(start),
+        "stop": float(stop),
+        "num_load_positions": int(num_load_positions),
+        "num_length_positions": int(num_length_positions),
+        "bridge_length": float(calc.bridge_length),
+        "engine": engine,
+        "engine_options": engine_options(engine, options),
+        "engine_version": calc.engine_version,
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def default_cache_directory():
+    """
+    Returns:
+        str: $ENVELOPE_CACHE_DIR if it is set, and otherwise a directory in the user's cache directory,
+        $XDG_CACHE_HOME or ~/.cache, so envelopes are never written into the source tree.
+    """
+    if os.environ.get("ENVELOPE_CACHE_DIR"):
+        return os.environ["ENVELOPE_CACHE_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "bridge", "envelopes")
+
+
+class EnvelopeCache:
+    """
+    Envelopes keyed by a hash of their load case, kept in an in-process LRU in front of a directory of envelope files.
+    The directory is trimmed to a size limit by removing the least recently used files.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        max_entries=32,
+        max_bytes=256 * 2**20,
+    ):
+        """
+        Args:
+            directory (str): Directory of the on-disk store, such as default_cache_directory, or None to only cache in
+                memory.
+            max_entries (int): Number of envelopes kept in memory.
+            max_bytes (int): Largest total size of the envelope files on disk.
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: "hits" from memory, "disk_hits", "misses", "hit_rate", and the number of "entries" in memory.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".envelope")
+
+    def get(
+        self,
+        loads,
+        start,
+        stop,
+        num_load_positions,
+        num_length_positions,
+        engine="batched",
+        **options,
+    ):
+        """
+        Finds the envelope of a load case, calculating and storing it if it is not cached.
+
+        Args:
+            loads (list): A list containing all external forces applied to the member.
+            start (float): Offset of the first load position.
+            stop (float): Offset of the last load position.
+            num_load_positions (int): Number of load positions between start and stop.
+            num_length_positions (int): Number of lengths along the bridge to evaluate.
+            engine (str): One of engines.
+            **options: Settings of the engine, see engine_options.
+
+        Returns:
+            dict: Envelope in the format returned by load_envelope.
+        """
+        if engine not in engines:
+            raise ValueError(f"Unknown engine: {engine}")
+        arguments = (loads, start, stop, num_load_positions, num_length_positions, engine)
+        key = envelope_key(*arguments, **options)
+
+        if key in self.memory:
+            instrument.count("envelope.cache.hits")
+            self.hits += 1
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        if self.directory is not None and os.path.exists(self.path(key)):
+            instrument.count("envelope.cache.disk_hits")
+            self.disk_hits += 1
+            os.utime(self.path(key))
+            return self.remember(key, load_envelope(self.path(key)))
+
+        instrument.count("envelope.cache.misses")
+        self.misses += 1
+        data = compute_envelope(*arguments, **options)
+        metadata = {
+            "key": key,
+            "num_load_positions": int(num_load_positions),
+            "engine": engine,
+            "engine_version": calc.engine_version,
+        }
+        if self.directory is None:
+            envelope = load_envelope_data(data, metadata)
+        else:
+            # Write to a temporary name first so other processes never read a partial file.
+            os.makedirs(self.directory, exist_ok=True)
+            temporary_path = f"{self.path(key)}.{os.getpid()}.tmp"
+            save_envelope(temporary_path, data, **metadata)
+            os.replace(temporary_path, self.path(key))
+            envelope = load_envelope(self.path(key))
+            self.evict(keep=key)
+        return self.remember(key, envelope)
+
+    def remember(self, key, envelope):
+        self.memory[key] = envelope
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+        return envelope
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used envelope files until the store fits in max_bytes.
+
+        Args:
+            keep (str): Key of a file that is never removed, such as the one just written.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".envelope"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == f"{keep}.envelope":
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Still memory mapped by this process on Windows, so leave it for a later eviction.
+                continue
+            total -= size
+
+    def clear(self):
+        """
+        Empties the in-process LRU and the on-disk store.
+        """
+        self.memory.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".envelope"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def load_envelope_data(data, metadata):
+    """
+    Converts an envelope returned by generate_envelop into the format returned by load_envelope.
+
+    Args:
+        data (dict): Envelope in the format returned by generate_envelop.
+        metadata (dict): Stored as the envelope's "metadata".
+
+    Returns:
+        dict: Envelope in the format returned by load_envelope.
+    """
+    envelope = {name: np.asarray(data[name], dtype=float) for name in columns if name in data}
+    envelope["shear"] = float(data["shear"])
+    envelope["moment"] = float(data["moment"])
+    envelope["metadata"] = metadata
+    return envelope
+
+
+default_cache = EnvelopeCache(default_cache_directory())
+
+
+def get_envelope(
+    loads,
+    start,
+    stop,
+    num_load_positions,
+    num_length_positions,
+    engine="batched",
+    cache=None,
+    **options,
+):
+    """
+    Finds the envelope of a load case through a cache. See EnvelopeCache.get.
+
+    Args:
+        cache (EnvelopeCache): Cache to use. Defaults to default_cache.
+        **options: Settings of the engine, see engine_options.
+
+    Returns:
+        dict: Envelope in the format returned by load_envelope.
+    """
+    return (cache or default_cache).get(
+        loads, start, stop, num_load_positions, num_length_positions, engine, **options
+    )
+
+
+def load_case_envelope(load_case, engine="batched", cache=None):
+    """
+    Finds the envelope of one of the load cases in load_cases through a cache.
+
+    Args:
+        load_case (int): 1 or 2.
+        engine (str): One of engines.
+        cache (EnvelopeCache): Cache to use. Defaults to default_cache.
+
+    Returns:
+        dict: Envelope in the format returned by load_envelope.
+    """
+    return get_envelope(engine=engine, cache=cache, **load_cases[load_case])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert a data.json envelope into the binary envelope format."
+    )
+    parser.add_argument("input", help="Path of the data.json file")
+    parser.add_argument("output", help="Path of the envelope file")
+    parser.add_argument("--load-case", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with open(args.input, encoding="utf-8") as f:
+        data = json.load(f)
+    metadata = {"source": args.input}
+    if args.load_case is not None:
+        metadata["load_case"] = args.load_case
+    save_envelope(args.output, data, **metadata)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,35 @@
+import functools
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import matplotlib.pyplot as plt
-import sympy as sy
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from calculate import is_symbolic
+
+color_wheel = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"]
+
+# Directory that render_plots resolves relative image paths against, so images land in the same place from any
+# working directory
+default_output_directory = os.path.dirname(os.path.abspath(__file__))
+
+# Records the inputs of every image rendered by render_plots, so unchanged images are skipped. It is kept in the output
+# directory under a folder that is not tracked, rather than among the images.
+manifest_name = os.path.join(".render_cache", "manifest.json")
 
-color_wheel = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+
+@functools.cache
+def get_figure():
+    """
+    Returns:
+        matplotlib.figure.Figure: A figure drawn with the Agg backend, reused by every plot in this process.
+    """
+    figure = Figure(figsize=matplotlib.rcParams["figure.figsize"])
+    FigureCanvasAgg(figure)
+    return figure
 
 
 def plot_expr(
@@ -21,29 +48,135 @@ def plot_expr(
     color_2=color_wheel[1],
     labels = None
 ):
+    if show:
+        import matplotlib.pyplot as plt
+
+        figure = plt.figure()
+    else:
+        figure = get_figure()
+        figure.clear()
+    ax = figure.add_subplot()
+
     if multiple_graphs:
         for i in range(len(expr)):
-            plt.plot(symbol, expr[i], color=(color_1 if i == 0 else color_2),label=labels[i])
+            ax.plot(symbol, expr[i], color=(color_1 if i == 0 else color_2),label=labels[i])
     else:
-        if type(expr) == np.ndarray:
+        if isinstance(expr, np.ndarray):
             y_axis = expr
             x_axis = symbol
         else:
             x_axis = np.linspace(interval[0], interval[1], spacing)
-            y_axis = sy.lambdify(symbol, expr)(x_axis)
-        plt.plot(x_axis, y_axis, color=color_1)
-    plt.xlabel(x_axis_label)
-    plt.ylabel(y_axis_label)
+            if is_symbolic(expr):
+                import sympy as sy
+
+                y_axis = sy.lambdify(symbol, expr)(x_axis)
+            else:
+                y_axis = expr(x_axis)
+        ax.plot(x_axis, y_axis, color=color_1)
+    ax.set_xlabel(x_axis_label)
+    ax.set_ylabel(y_axis_label)
     if labels != None:
-        plt.legend(loc="upper right")
-    ax = plt.gca()
+        ax.legend(loc="upper right")
     ax.set_xlim(left=interval[0], right=interval[1])
     if invert_y:
         ax.invert_yaxis()
     if fill:
         ax.fill_between(x_axis, y_axis, facecolor=color_1)
-    plt.savefig(save_path)
+
+    directory = os.path.dirname(save_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(save_path)
     if show:
         plt.show()
-    else:
-        plt.clf()
+        plt.close(figure)
+
+
+def plot_hash(plot):
+    """
+    Hashes the arguments of a plot, so an image only needs rendering again when they change.
+
+    Args:
+        plot (dict): Keyword arguments for plot_expr, with arrays or lists of arrays as data.
+
+    Returns:
+        str: Hex digest of the arguments.
+    """
+    digest = hashlib.sha256(matplotlib.__version__.encode("utf-8"))
+    for name in sorted(plot):
+        value = plot[name]
+        digest.update(name.encode("utf-8"))
+        if name in ("expr", "symbol"):
+            for array in value if isinstance(value, (list, tuple)) else (value,):
+                array = np.ascontiguousarray(array, dtype=float)
+                digest.update(str(array.shape).encode("utf-8"))
+                digest.update(array.tobytes())
+        else:
+            digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_chunk(plots):
+    """
+    Renders plots one after another on this process's reused figure.
+
+    Args:
+        plots (list): Keyword arguments for plot_expr of each plot.
+    """
+    for plot in plots:
+        plot_expr(**plot, show=False)
+
+
+def render_plots(plots, workers=None, output_directory=None, force=False):
+    """
+    Renders a set of plots on a process pool, skipping images whose file exists and whose inputs have not changed since
+    they were last rendered.
+
+    Args:
+        plots (list): Keyword arguments for plot_expr of each plot, with arrays as data.
+        workers (int): Number of processes. Renders in this process if 1, and on every core if None.
+        output_directory (str): Directory that relative save paths and the manifest are resolved against. Defaults to
+            default_output_directory.
+        force (bool): Whether to render every image even if it is unchanged.
+
+    Returns:
+        tuple: (number of images rendered, number of images skipped)
+    """
+    if not plots:
+        return 0, 0
+    output_directory = os.path.abspath(output_directory or default_output_directory)
+    manifest_path = os.path.join(output_directory, manifest_name)
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    # Images are recorded relative to the output directory, so the manifest stays valid if the directory moves
+    pending = []
+    for plot in plots:
+        digest = plot_hash(plot)
+        plot = {**plot, "save_path": os.path.join(output_directory, plot["save_path"])}
+        key = os.path.relpath(plot["save_path"], output_directory).replace(os.sep, "/")
+        if force or manifest.get(key) != digest or not os.path.exists(plot["save_path"]):
+            pending.append((plot, key, digest))
+
+    workers = min(workers or os.cpu_count(), len(pending))
+    if workers <= 1:
+        render_chunk([plot for plot, _, _ in pending])
+    elif pending:
+        # One task per worker, so each process sets up its figure once
+        chunks = [[plot for plot, _, _ in pending[i::workers]] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(render_chunk, chunk) for chunk in chunks]:
+                future.result()
+
+    for _, key, digest in pending:
+        manifest[key] = digest
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    # Write to a temporary name first so another run never reads a partial manifest
+    temporary_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
+    return len(pending), len(plots) - len(pending)
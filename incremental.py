@@ -0,0 +1,411 @@
+import argparse
+import collections
+import operator
+
+import numpy as np
+import calculate as calc
+import bridge
+
+# Inputs of the FOS graph. Every material constant is an input too, so overriding th or a strength is also incremental.
+design_inputs = (
+    "top_flange_width",
+    "web_height",
+    "top_flange_layers",
+    "diaphragm_num",
+    "glue_width",
+    "max_shear_force",
+    "max_bending_moment",
+    "deflection_limit",
+    "unit_deflection",
+)
+inputs = design_inputs + calc.material_names
+
+# Strengths in the order bridge.strength_factor_terms takes them
+strength_names = (
+    "matboard_tensile_strength",
+    "matboard_compressive_strength",
+    "matboard_shear_strength",
+    "cement_shear_strength",
+)
+
+# Stages of get_FOS as name: (function, names of the values it is calculated from). Each function takes its
+# dependencies' values in order and is one of the helpers get_FOS and get_FOS_terms are built from, so the graph cannot
+# drift from them. Buckling and the factors of safety are split by what they depend on, so changing the diaphragms only
+# recalculates shear buckling, its factor of safety and the volume.
+nodes = {
+    "section": (bridge.section_terms, ("top_flange_width", "web_height", "top_flange_layers", "glue_width", "th")),
+    "stresses": (
+        bridge.stress_terms,
+        ("section", "max_shear_force", "max_bending_moment", "glue_width", "th"),
+    ),
+    "plate_buckling": (
+        bridge.plate_buckling_terms,
+        ("top_flange_width", "web_height", "top_flange_layers", "section", "th", "matboard_youngs_modulus"),
+    ),
+    "shear_buckling": (
+        bridge.shear_buckling_term,
+        ("web_height", "diaphragm_num", "th", "matboard_youngs_modulus"),
+    ),
+    "strength_factors": (bridge.strength_factor_terms, ("stresses",) + strength_names),
+    "plate_buckling_factors": (bridge.plate_buckling_factor_terms, ("stresses", "plate_buckling")),
+    "shear_buckling_factor": (bridge.shear_buckling_factor, ("stresses", "shear_buckling")),
+    "volume": (
+        lambda section, web_height, diaphragm_num, glue_width: bridge.get_volume(
+            section[0], web_height, diaphragm_num, glue_width
+        ),
+        ("section", "web_height", "diaphragm_num", "glue_width"),
+    ),
+    # None without a deflection limit, like get_FOS leaving deflection out
+    "FOS_deflection": (
+        lambda limit, unit_deflection, E, section: None
+        if limit is None
+        else limit / bridge.max_deflection(unit_deflection, section[2], E),
+        ("deflection_limit", "unit_deflection", "matboard_youngs_modulus", "section"),
+    ),
+}
+
+# Plans of what_if shared by every FOSGraph
+fos_plans = {}
+
+# Nodes FOSGraph.FOS reads, without and with a deflection limit
+factor_nodes = ("strength_factors", "plate_buckling_factors", "shear_buckling_factor", "volume")
+deflection_nodes = factor_nodes + ("FOS_deflection",)
+
+# Steps and smallest values of the design variables changed by coordinate_descent
+descent_steps = {"top_flange_width": 1, "web_height": 1, "top_flange_layers": 1, "diaphragm_num": 1}
+descent_minimums = {
+    "top_flange_width": calc.bottom_flange_width,
+    "web_height": 10,
+    "top_flange_layers": 1,
+    "diaphragm_num": 0,
+}
+
+
+def getter(names):
+    """
+    Returns:
+        function: Takes a dict and returns a tuple of its values for names.
+    """
+    if len(names) == 1:
+        return lambda values: (values[names[0]],)
+    return operator.itemgetter(*names)
+
+
+def same_value(a, b):
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+
+
+class Graph:
+    """
+    Caches the value of every node of a dependency graph. Nodes are calculated on first use, and changing an input
+    discards only the nodes downstream of it, so the next lookup recalculates just those.
+    """
+
+    def __init__(self, nodes, values, plans=None):
+        """
+        Args:
+            nodes (dict): Maps node names to (function, names of dependencies), see nodes.
+            values (dict): Value of every input.
+            plans (dict): Where the plans of what_if are kept. Graphs with the same nodes can share one, so each plan
+                is only found once.
+        """
+        self.nodes = nodes
+        self.inputs = set(values)
+        self.values = dict(values)
+        self.dependents = collections.defaultdict(set)
+        for name, (_, dependencies) in nodes.items():
+            for dependency in dependencies:
+                self.dependents[dependency].add(name)
+        self._downstream = {}
+        self._plans = {} if plans is None else plans
+        # (changes, values, steps) of the last what_if, whose stale nodes update reuses
+        self._last_what_if = None
+        # Number of times each node was calculated by a lookup, and each plan was run by what_if
+        self._calculated = collections.Counter()
+        self._runs = collections.Counter()
+
+    @property
+    def evaluations(self):
+        """
+        Returns:
+            collections.Counter: Number of times each node has been calculated.
+        """
+        evaluations = collections.Counter(self._calculated)
+        for key, runs in self._runs.items():
+            for name, _, _ in self._plans[key][0]:
+                evaluations[name] += runs
+        return evaluations
+
+    def downstream(self, name):
+        """
+        Returns:
+            set: Every node that depends on name, directly or through other nodes.
+        """
+        if name not in self._downstream:
+            found = set()
+            stack = [name]
+            while stack:
+                for dependent in self.dependents[stack.pop()]:
+                    if dependent not in found:
+                        found.add(dependent)
+                        stack.append(dependent)
+            self._downstream[name] = found
+        return self._downstream[name]
+
+    def __getitem__(self, name):
+        if name not in self.values:
+            function, dependencies = self.nodes[name]
+            self.values[name] = function(*(self[dependency] for dependency in dependencies))
+            self._calculated[name] += 1
+        return self.values[name]
+
+    def _check(self, changes):
+        unknown = set(changes) - self.inputs
+        if unknown:
+            raise ValueError(f"Unknown inputs: {sorted(unknown)}")
+
+    def update(self, **changes):
+        """
+        Changes inputs, discarding the cached nodes downstream of each input that actually changed. Nodes calculated by
+        a what_if with the same changes are kept instead of being calculated again.
+
+        Args:
+            **changes: New values of inputs.
+        """
+        self._check(changes)
+        last, self._last_what_if = self._last_what_if, None
+        for name, value in changes.items():
+            if same_value(self.values[name], value):
+                continue
+            self.values[name] = value
+            for node in self.downstream(name):
+                self.values.pop(node, None)
+
+        if last is not None and last[0].keys() == changes.keys():
+            last_changes, scratch, steps = last
+            if all(same_value(last_changes[name], value) for name, value in changes.items()):
+                self.values.update((name, scratch[name]) for name, _, _ in steps)
+
+    def what_if(self, names, **changes):
+        """
+        Calculates nodes as if inputs were changed, without changing the graph. Nodes that the changes do not affect
+        come from the cache.
+
+        Args:
+            names (tuple): Nodes to calculate.
+            **changes: Values of inputs to use instead.
+
+        Returns:
+            dict: Maps each name to its value.
+        """
+        names = tuple(names)
+        return dict(zip(names, self._what_if(names, changes)))
+
+    def _what_if(self, names, changes):
+        # what_if with a tuple of names and a dict of changes, returning a tuple of values
+        plan = self._plans.get((names, tuple(changes)))
+        if plan is None:
+            self._check(changes)
+            plan = self.plan(names, tuple(changes))
+        steps, fresh, result, key = plan
+
+        values = self.values
+        for name in fresh:
+            if name not in values:
+                self[name]
+
+        scratch = {**values, **changes}
+        for name, function, arguments in steps:
+            scratch[name] = function(*arguments(scratch))
+        self._last_what_if = (changes, scratch, steps)
+        self._runs[key] += 1
+        return result(scratch)
+
+    def plan(self, names, changed):
+        """
+        Orders the work of what_if for some names and changed inputs. Plans are kept in self._plans.
+
+        Args:
+            names (tuple): Nodes to calculate.
+            changed (tuple): Inputs that are changed.
+
+        Returns:
+            tuple: ((name, function, dependencies) of each stale node, in an order where each comes after its
+            dependencies, other nodes they read, the changed inputs and stale nodes, and the key of the plan)
+        """
+        key = (names, changed)
+        downstream = set().union(*(self.downstream(name) for name in changed))
+        stale, fresh = [], []
+
+        def visit(name):
+            if name in changed or name in stale or name in fresh:
+                return
+            if name not in downstream:
+                if name in self.nodes:
+                    fresh.append(name)
+                return
+            for dependency in self.nodes[name][1]:
+                visit(dependency)
+            stale.append(name)
+
+        for name in names:
+            visit(name)
+        # Fetching arguments with itemgetter is much faster than looking each one up
+        steps = tuple((name, self.nodes[name][0], getter(self.nodes[name][1])) for name in stale)
+        self._plans[key] = (steps, tuple(fresh), getter(names), key)
+        return self._plans[key]
+
+
+class FOSGraph(Graph):
+    """
+    Incremental version of bridge.get_FOS. Takes the same arguments, plus materials like bridge.get_FOS_terms and the
+    load case used to fill in missing loads.
+    """
+
+    def __init__(
+        self,
+        top_flange_width,
+        web_height,
+        top_flange_layers=1,
+        diaphragm_num=1,
+        max_shear_force=None,
+        max_bending_moment=None,
+        glue_width=None,
+        deflection_limit=None,
+        unit_deflection=None,
+        materials=None,
+        load_case=2,
+    ):
+        self.load_case = load_case
+        if glue_width is None:
+            glue_width = calc.glue_width
+        max_shear_force, max_bending_moment = bridge.applied_loads(max_shear_force, max_bending_moment, load_case)
+        super().__init__(
+            nodes,
+            {
+                "top_flange_width": top_flange_width,
+                "web_height": web_height,
+                "top_flange_layers": top_flange_layers,
+                "diaphragm_num": diaphragm_num,
+                "glue_width": glue_width,
+                "max_shear_force": max_shear_force,
+                "max_bending_moment": max_bending_moment,
+                "deflection_limit": deflection_limit,
+                "unit_deflection": bridge.applied_deflection(deflection_limit, unit_deflection, load_case),
+                **calc.material_properties(materials),
+            },
+            fos_plans,
+        )
+
+    def _fill(self, changes):
+        # A new deflection limit needs the load case's deflection if there is none yet
+        if changes.get("deflection_limit") is not None:
+            if changes.get("unit_deflection", self.values["unit_deflection"]) is None:
+                changes["unit_deflection"] = bridge.applied_deflection(
+                    changes["deflection_limit"], load_case=self.load_case
+                )
+        return changes
+
+    def update(self, **changes):
+        super().update(**self._fill(changes))
+
+    def what_if(self, names, **changes):
+        return super().what_if(names, **self._fill(changes))
+
+    def modes(self):
+        return bridge.failure_modes[: 9 if self.values["deflection_limit"] is not None else 8]
+
+    def factors(self):
+        """
+        Returns:
+            tuple: Factors of safety in the order of get_FOS with return_min=False.
+        """
+        factors = self["strength_factors"] + self["plate_buckling_factors"] + (self["shear_buckling_factor"],)
+        if self.values["deflection_limit"] is not None:
+            factors += (self["FOS_deflection"],)
+        return factors
+
+    def FOS(self, **changes):
+        """
+        Finds the factor of safety like get_FOS, optionally as if inputs were changed.
+
+        Args:
+            **changes: Values of inputs to use instead, see what_if.
+
+        Returns:
+            float: The lowest factor of safety, or -1 if the design uses 90% of the matboard or more.
+        """
+        limit = changes["deflection_limit"] if "deflection_limit" in changes else self.values["deflection_limit"]
+        names = factor_nodes if limit is None else deflection_nodes
+        if changes:
+            values = self._what_if(names, self._fill(changes))
+        else:
+            values = tuple(self[name] for name in names)
+        strength_factors, plate_buckling_factors, shear_buckling_factor, volume, *deflection = values
+        if not bridge.within_volume(volume):
+            return -1
+        return min(min(strength_factors), min(plate_buckling_factors), shear_buckling_factor, *deflection)
+
+
+def coordinate_descent(graph, steps=None, max_rounds=1000):
+    """
+    Improves a design one variable at a time, trying a step up and down in each variable and keeping the best. Each
+    trial only recalculates the nodes downstream of the variable it changes, but any change to the flange or webs
+    changes the section and so nearly every node, which makes those trials cost about as much as a get_FOS call. Only
+    the diaphragm trials are cheaper; the graph pays off for what-ifs on the loads, materials and diaphragms.
+
+    Args:
+        graph (FOSGraph): The starting design. It is updated to the best design found.
+        steps (dict): Maps design inputs to step sizes. Defaults to descent_steps.
+        max_rounds (int): Largest number of passes over the variables.
+
+    Returns:
+        tuple: (best FOS, number of trials)
+    """
+    steps = steps or descent_steps
+    best = graph.FOS()
+    trials = 0
+    for _ in range(max_rounds):
+        improved = False
+        for name, step in steps.items():
+            for candidate in (graph.values[name] + step, graph.values[name] - step):
+                if candidate < descent_minimums.get(name, -np.inf):
+                    continue
+                trials += 1
+                fos = graph.FOS(**{name: candidate})
+                if fos > best:
+                    best = fos
+                    graph.update(**{name: candidate})
+                    improved = True
+                    break
+        if not improved:
+            break
+    return best, trials
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Improve a design by coordinate descent."
+    )
+    bridge.add_design_arguments(parser)
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    graph = FOSGraph(**bridge.design_from_arguments(args))
+    start = graph.FOS()
+    best, trials = coordinate_descent(graph, max_rounds=args.max_rounds)
+
+    print(f"FOS: {start:.4f} -> {best:.4f} after {trials} trials")
+    for name in descent_steps:
+        print(f"{name}: {graph.values[name]}")
+    # Without caching, every trial calculates each node the FOS needs
+    evaluated = sum(graph.evaluations.values())
+    print(f"Nodes calculated: {evaluated}, against {(trials + 1) * len(graph.evaluations)} without caching")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import numpy as np
+import calculate as calc
+
+
+def split_loads(loads):
+    """
+    Separates a train of point loads from the two reactions of a simply supported span.
+
+    Args:
+        loads (list): A list containing the point loads and two reactions applied to the member.
+
+    Returns:
+        np.ndarray: Offsets of the point loads.
+        np.ndarray: Forces of the point loads.
+        tuple: Lengths of the two reactions.
+    """
+    if any(load[0] == "distributed" for load in loads):
+        raise ValueError("Influence lines only support trains of point loads.")
+
+    reactions = [load[1] for load in loads if load[0] == "reaction"]
+    if len(reactions) != 2:
+        raise ValueError("Invalid Reaction Forces.")
+
+    point_loads = np.array(
+        [load[1:3] for load in loads if load[0] == "point"], dtype=float
+    ).reshape(-1, 2)
+    return point_loads[:, 0], point_loads[:, 1], tuple(reactions)
+
+
+def unit_load_response(reactions, station, position, ordered_station, ordered_position):
+    """
+    Calculates shear force and bending moment at a station caused by a unit point load. Which forces are to the left of
+    the station is decided by the ordered lengths, so a piece of the influence line can be evaluated up to its ends.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        station (np.ndarray): Length where shear force and bending moment are measured.
+        position (np.ndarray): Length of the unit load.
+        ordered_station (np.ndarray): Station used to decide which forces are to its left.
+        ordered_position (np.ndarray): Unit load length used to decide which forces are to the left of the station.
+
+    Returns:
+        np.ndarray: Shear force.
+        np.ndarray: Bending moment.
+    """
+    reaction_a, reaction_b = reactions
+    span = reaction_b - reaction_a
+
+    # Reaction forces follow the same sign convention as calc_reaction_forces.
+    force_a = -(reaction_b - position) / span
+    force_b = -(position - reaction_a) / span
+
+    left_a = reaction_a < ordered_station
+    left_b = reaction_b < ordered_station
+    left_load = ordered_position < ordered_station
+
+    shear_force = -(force_a * left_a + force_b * left_b + 1.0 * left_load)
+    bending_moment = -(
+        force_a * (station - reaction_a) * left_a
+        + force_b * (station - reaction_b) * left_b
+        + (station - position) * left_load
+    )
+    return shear_force, bending_moment
+
+
+def shear_influence_line(reactions, station, positions):
+    """
+    Calculates the shear force influence line of a station.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        station (float): Length where shear force is measured.
+        positions (np.ndarray): Lengths of the unit load.
+
+    Returns:
+        np.ndarray: Shear force at the station for each unit load length.
+    """
+    return unit_load_response(reactions, station, positions, station, positions)[0]
+
+
+def moment_influence_line(reactions, station, positions):
+    """
+    Calculates the bending moment influence line of a station.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        station (float): Length where bending moment is measured.
+        positions (np.ndarray): Lengths of the unit load.
+
+    Returns:
+        np.ndarray: Bending moment at the station for each unit load length.
+    """
+    return unit_load_response(reactions, station, positions, station, positions)[1]
+
+
+def train_response(
+    reactions, offsets, forces, load_position, station, ordered_load_position, ordered_station
+):
+    """
+    Superimposes the influence lines of every load in the train.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        offsets (np.ndarray): Offsets of the point loads.
+        forces (np.ndarray): Forces of the point loads.
+        load_position (np.ndarray): Offset of the train.
+        station (np.ndarray): Length where shear force and bending moment are measured.
+        ordered_load_position (np.ndarray): Train offset used to decide which forces are to the left of the station.
+        ordered_station (np.ndarray): Station used to decide which forces are to its left.
+
+    Returns:
+        np.ndarray: Shear force.
+        np.ndarray: Bending moment.
+    """
+    shear_force, bending_moment = unit_load_response(
+        reactions,
+        station[..., None],
+        offsets + load_position[..., None],
+        ordered_station[..., None],
+        offsets + ordered_load_position[..., None],
+    )
+    return np.sum(forces * shear_force, axis=-1), np.sum(forces * bending_moment, axis=-1)
+
+
+def governing_pieces(candidates):
+    """
+    Splits sorted candidate train offsets into pieces where shear force and bending moment are smooth.
+
+    Args:
+        candidates (np.ndarray): Sorted train offsets where the influence lines change slope or jump.
+
+    Returns:
+        np.ndarray: Start, middle and end offset of each piece.
+    """
+    lower = candidates[..., :-1]
+    upper = candidates[..., 1:]
+    return np.stack((lower, (lower + upper) / 2, upper), axis=-1)
+
+
+def max_quadratic(pieces, values):
+    """
+    Finds the largest value of a quadratic through the start, middle and end of each piece.
+
+    Args:
+        pieces (np.ndarray): Start, middle and end offset of each piece.
+        values (np.ndarray): Value at the start, middle and end of each piece.
+
+    Returns:
+        np.ndarray: Largest value of each piece.
+        np.ndarray: Offset where the largest value occurs.
+    """
+    f0, f1, f2 = values[..., 0], values[..., 1], values[..., 2]
+    curvature = f0 - 2 * f1 + f2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vertex = -(f2 - f0) / (2 * curvature)
+    interior = (curvature < 0) & (np.abs(vertex) < 1)
+    vertex = np.where(interior, vertex, 0)
+
+    vertex_values = np.where(interior, f1 + (f2 - f0) / 2 * vertex + curvature / 2 * vertex**2, -np.inf)
+    vertex_positions = pieces[..., 1] + vertex * (pieces[..., 2] - pieces[..., 0]) / 2
+
+    all_values = np.stack((f0, f2, vertex_values), axis=-1)
+    all_positions = np.stack((pieces[..., 0], pieces[..., 2], vertex_positions), axis=-1)
+    index = np.argmax(all_values, axis=-1)[..., None]
+    return (
+        np.take_along_axis(all_values, index, axis=-1)[..., 0],
+        np.take_along_axis(all_positions, index, axis=-1)[..., 0],
+    )
+
+
+def station_envelop(reactions, offsets, forces, start, stop, x_vals):
+    """
+    Finds the exact shear force and bending moment envelopes at each station. A station's influence lines only change
+    slope or jump where a load sits over it, so those train offsets and the ends of the sweep are the only candidates.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        offsets (np.ndarray): Offsets of the point loads.
+        forces (np.ndarray): Forces of the point loads.
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        x_vals (np.ndarray): Stations to evaluate.
+
+    Returns:
+        tuple: (shear_force_envelop, bending_moment_envelop, shear_force_position, bending_moment_position)
+    """
+    candidates = np.clip(x_vals[:, None] - offsets, start, stop)
+    bounds = np.broadcast_to([start, stop], (len(x_vals), 2))
+    candidates = np.sort(np.concatenate((candidates, bounds), axis=1), axis=1)
+    pieces = governing_pieces(candidates)
+
+    stations = np.broadcast_to(x_vals[:, None, None], pieces.shape)
+    middles = np.broadcast_to(pieces[..., 1:2], pieces.shape)
+    shear_forces, bending_moments = train_response(
+        reactions, offsets, forces, pieces, stations, middles, stations
+    )
+
+    # Both responses are linear on each piece, so the extremes are at its ends.
+    shear_forces = shear_forces.reshape(len(x_vals), -1)
+    bending_moments = bending_moments.reshape(len(x_vals), -1)
+    positions = pieces.reshape(len(x_vals), -1)
+    rows = np.arange(len(x_vals))
+
+    shear_force_index = np.argmax(np.abs(shear_forces), axis=1)
+    bending_moment_index = np.argmax(bending_moments, axis=1)
+    return (
+        shear_forces[rows, shear_force_index],
+        np.maximum(bending_moments[rows, bending_moment_index], 0),
+        positions[rows, shear_force_index],
+        positions[rows, bending_moment_index],
+    )
+
+
+def max_response(reactions, offsets, forces, start, stop):
+    """
+    Finds the exact largest shear force and bending moment anywhere on the member for any train offset. The order of
+    forces along the member only changes when a load crosses a reaction, and between those offsets shear force is
+    linear and bending moment is quadratic in the train offset.
+
+    Args:
+        reactions (tuple): Lengths of the two reactions.
+        offsets (np.ndarray): Offsets of the point loads.
+        forces (np.ndarray): Forces of the point loads.
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+
+    Returns:
+        tuple: (max_shear_force, max_bending_moment)
+    """
+    crossings = (np.array(reactions)[:, None] - offsets).ravel()
+    crossings = crossings[(crossings > start) & (crossings < stop)]
+    candidates = np.unique(np.concatenate(([start, stop], crossings)))
+    pieces = governing_pieces(np.concatenate((candidates, candidates[-1:])))
+
+    # Shear force and bending moment can only peak just left of a load or a reaction.
+    critical_lengths = np.concatenate(
+        (
+            offsets + pieces[..., None],
+            np.broadcast_to(reactions, pieces.shape + (2,)),
+        ),
+        axis=-1,
+    )
+    ordered_lengths = np.broadcast_to(critical_lengths[:, 1:2], critical_lengths.shape)
+    load_positions = np.broadcast_to(pieces[..., None], critical_lengths.shape)
+    middles = np.broadcast_to(pieces[:, 1:2, None], critical_lengths.shape)
+
+    shear_forces, bending_moments = train_response(
+        reactions,
+        offsets,
+        forces,
+        load_positions,
+        critical_lengths,
+        middles,
+        ordered_lengths,
+    )
+
+    max_bending_moment, _ = max_quadratic(
+        np.broadcast_to(pieces[:, None, :], (len(pieces), critical_lengths.shape[-1], 3)),
+        np.moveaxis(bending_moments, 1, -1),
+    )
+    return max(np.max(np.abs(shear_forces)), 0), max(np.max(max_bending_moment), 0)
+
+
+def generate_envelop(start, stop, num_load_positions, loads, num_length_positions):
+    """
+    Calculates the exact shear force and bending moment envelopes of a train of point loads crossing a simply supported
+    span, using influence lines instead of sampled load positions.
+
+    Args:
+        start (float): Offset of the first load position.
+        stop (float): Offset of the last load position.
+        num_load_positions (int): Unused, kept so this can replace calculate.generate_envelop.
+        loads (list): A list containing the point loads and two reactions applied to the member.
+        num_length_positions (int): Number of lengths along the bridge to evaluate.
+
+    Returns:
+        tuple: (x_vals, shear_force_envelop, bending_moment_envelop, data), where data also holds the load position
+        that governs each length.
+    """
+    offsets, forces, reactions = split_loads(loads)
+    x_vals = np.linspace(0, calc.bridge_length / 1000, num_length_positions)
+
+    (
+        shear_force_envelop,
+        bending_moment_envelop,
+        shear_force_position,
+        bending_moment_position,
+    ) = station_envelop(reactions, offsets, forces, start, stop, x_vals)
+    max_shear_force, max_bending_moment = max_response(
+        reactions, offsets, forces, start, stop
+    )
+
+    return (
+        x_vals,
+        shear_force_envelop,
+        bending_moment_envelop,
+        {
+            "x": list(map(str, x_vals)),
+            "shear_force_envelope": list(map(str, shear_force_envelop)),
+            "bending_moment_envelope": list(map(str, bending_moment_envelop)),
+            "shear": str(max_shear_force),
+            "moment": str(max_bending_moment),
+            "shear_force_position": list(map(str, shear_force_position)),
+            "bending_moment_position": list(map(str, bending_moment_position)),
+        },
+    )
@@ -0,0 +1,221 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# Spans and counters are only recorded while this is True. Disabled spans cost one global lookup and a branch.
+enabled = False
+
+# Finished spans as (name, start ns, duration ns, self duration ns, thread id), in the order they end
+events = []
+counters = collections.Counter()
+
+_local = threading.local()
+_null_span = contextlib.nullcontext()
+
+
+class Span:
+    """
+    Times a block of code. Time spent in spans opened inside it is subtracted from its self time.
+    """
+
+    __slots__ = ("name", "start", "children")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault("stack", [])
+        stack.append(self)
+        self.children = 0
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        events.append((self.name, self.start, duration, duration - self.children, threading.get_ident()))
+        return False
+
+
+def span(name):
+    """
+    Opens a named timing span, for use in a with statement.
+
+    Args:
+        name (str): Name of the pipeline stage.
+
+    Returns:
+        Span: The span, or a shared context that does nothing while instrumentation is disabled.
+    """
+    if not enabled:
+        return _null_span
+    return Span(name)
+
+
+def count(name, amount=1):
+    """
+    Adds to a named counter while instrumentation is enabled.
+
+    Args:
+        name (str): Name of the counter.
+        amount (int): Amount to add.
+    """
+    if enabled:
+        counters[name] += amount
+
+
+def traced(name=None):
+    """
+    Decorates a function so every call is recorded as a span.
+
+    Args:
+        name (str): Name of the span. Defaults to the module and name of the function.
+
+    Returns:
+        function: The decorator.
+    """
+
+    def decorator(function):
+        span_name = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(span_name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Discards every recorded span and counter.
+    """
+    events.clear()
+    counters.clear()
+
+
+@contextlib.contextmanager
+def recording():
+    """
+    Enables instrumentation inside a with statement, starting from an empty record.
+    """
+    reset()
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+def summary():
+    """
+    Aggregates the recorded spans by name.
+
+    Returns:
+        dict: Maps span names to "calls", "total", "self", "mean" and "max" times in seconds, slowest total first.
+    """
+    stages = {}
+    for name, _, duration, self_duration, _ in events:
+        stage = stages.setdefault(name, {"calls": 0, "total": 0, "self": 0, "max": 0})
+        stage["calls"] += 1
+        stage["total"] += duration
+        stage["self"] += self_duration
+        stage["max"] = max(stage["max"], duration)
+
+    for stage in stages.values():
+        for key in ("total", "self", "max"):
+            stage[key] /= 1e9
+        stage["mean"] = stage["total"] / stage["calls"]
+    return dict(sorted(stages.items(), key=lambda item: -item[1]["total"]))
+
+
+def summary_table():
+    """
+    Returns:
+        str: The summary as a table, followed by the counters.
+    """
+    lines = [f"{'Stage':<48} {'Calls':>8} {'Total (ms)':>12} {'Self (ms)':>12} {'Mean (ms)':>12} {'Max (ms)':>12}"]
+    for name, stage in summary().items():
+        lines.append(
+            f"{name:<48} {stage['calls']:>8} {stage['total'] * 1e3:>12.3f} {stage['self'] * 1e3:>12.3f} "
+            f"{stage['mean'] * 1e3:>12.4f} {stage['max'] * 1e3:>12.3f}"
+        )
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name:<48} {value:>8}")
+    return "\n".join(lines)
+
+
+def write_chrome_trace(path):
+    """
+    Writes the recorded spans as a Chrome trace, which chrome://tracing and Perfetto open as a timeline.
+
+    Args:
+        path (str): Path of the JSON file.
+    """
+    pid = os.getpid()
+    trace_events = [
+        {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": start / 1e3,
+            "dur": duration / 1e3,
+            "pid": pid,
+            "tid": thread,
+        }
+        for name, start, duration, _, thread in events
+    ]
+    if counters:
+        end = max((start + duration for _, start, duration, _, _ in events), default=0)
+        trace_events.append(
+            {"name": "counters", "ph": "C", "ts": end / 1e3, "pid": pid, "args": dict(counters)}
+        )
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+@contextlib.contextmanager
+def profile(path=None, sort="cumulative", limit=30):
+    """
+    Runs cProfile inside a with statement.
+
+    Args:
+        path (str): Path to write the statistics to, for snakeviz or pstats. Prints them instead if None.
+        sort (str): Column to sort the printed statistics by.
+        limit (int): Number of printed functions.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path is None:
+            pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
+        else:
+            profiler.dump_stats(path)
@@ -0,0 +1,434 @@
+import argparse
+import heapq
+import itertools
+import time
+
+import numpy as np
+import calculate as calc
+import bridge
+import sweep
+
+# Design variables that must take whole values
+integer_variables = ("top_flange_layers", "diaphragm_num")
+
+# How often each design variable is split, against its share of its range. FOS_upper_bound loosens with the height,
+# which moves every component, far faster than with the top flange or glue widths, which only change their own areas,
+# so boxes are split across the height about ten times as often.
+split_weights = {"top_flange_width": 0.1, "glue_width": 0.1}
+
+
+def design_box(names, fixed, box_lower, box_upper):
+    """
+    Finds the smallest box of get_FOS_terms dimensions containing every design in a box of design variables. A
+    total_height box becomes a web height box wide enough for every number of top flange layers in the box.
+
+    Args:
+        names (list): Design variable names of the columns of box_lower and box_upper.
+        fixed (dict): Values of the design variables that are not searched.
+        box_lower (np.ndarray): Lower corner of each box, one row per box.
+        box_upper (np.ndarray): Upper corner of each box, one row per box.
+
+    Returns:
+        tuple: (lower, upper) dicts of top_flange_width, web_height, top_flange_layers, diaphragm_num and glue_width.
+    """
+    lower = {**fixed, **{name: box_lower[:, i] for i, name in enumerate(names)}}
+    upper = {**fixed, **{name: box_upper[:, i] for i, name in enumerate(names)}}
+    if "total_height" in lower:
+        total_lower, total_upper = lower.pop("total_height"), upper.pop("total_height")
+        lower["web_height"] = total_lower - calc.th - upper["top_flange_layers"] * calc.th
+        upper["web_height"] = total_upper - calc.th - lower["top_flange_layers"] * calc.th
+    return lower, upper
+
+
+def weighted_mean_bounds(weights_lower, weights_upper, values_lower, values_upper):
+    """
+    Bounds a weighted mean when every weight and value lies in an interval. The largest mean gives the largest weights
+    to the values above it and the smallest to those below, so it is the best of the splits of the values sorted by
+    size, and the smallest mean likewise.
+
+    Args:
+        weights_lower (np.ndarray): Smallest weights, with the items along the last axis.
+        weights_upper (np.ndarray): Largest weights.
+        values_lower (np.ndarray): Smallest values.
+        values_upper (np.ndarray): Largest values.
+
+    Returns:
+        tuple: (smallest mean, largest mean)
+    """
+
+    def largest(values, heavy, light):
+        order = np.argsort(-values, axis=-1)
+        values, heavy, light = (np.take_along_axis(array, order, axis=-1) for array in (values, heavy, light))
+        count = values.shape[-1]
+        # Split k gives the k largest values the heavy weights
+        split = np.arange(count + 1)[:, None] > np.arange(count)
+        weights = np.where(split, heavy[..., None, :], light[..., None, :])
+        return ((weights * values[..., None, :]).sum(axis=-1) / weights.sum(axis=-1)).max(axis=-1)
+
+    return (
+        -largest(-values_lower, weights_upper, weights_lower),
+        largest(values_upper, weights_upper, weights_lower),
+    )
+
+
+def volume_lower_bound(lower):
+    """
+    Args:
+        lower (dict): Smallest top_flange_width, web_height, top_flange_layers, diaphragm_num and glue_width.
+
+    Returns:
+        np.ndarray: Smallest volume of each box, at its lower corner since the volume grows with every dimension.
+    """
+    y, w, h = calc.generate_cross_section_arrays(
+        lower["top_flange_width"], lower["web_height"], lower["top_flange_layers"], glue_width=lower["glue_width"]
+    )
+    area = calc.area_arrays(y, w, h)
+    return bridge.get_volume(area, lower["web_height"], lower["diaphragm_num"], lower["glue_width"])
+
+
+def within_volume_box(names, fixed, box_lower, box_upper, is_integer, iterations=20):
+    """
+    Lowers the upper corner of each box to drop designs that are over the volume limit. The volume grows with every
+    design variable, so a design whose variable is at least some value uses at least the volume of the lower corner
+    with that variable raised to the value. The smallest such value over the limit is found by bisection and becomes
+    the upper bound of the variable, rounded down for integer variables.
+
+    Args:
+        names (list): Design variable names of the columns of box_lower and box_upper.
+        fixed (dict): Values of the design variables that are not searched.
+        box_lower (np.ndarray): Lower corner of each box, one row per box.
+        box_upper (np.ndarray): Upper corner of each box, one row per box.
+        is_integer (np.ndarray): Whether each design variable takes whole values.
+        iterations (int): Number of bisection steps.
+
+    Returns:
+        np.ndarray: The new upper corner of each box. Boxes whose lower corner is over the limit are left as they were.
+    """
+
+    def over_limit(corner):
+        return ~bridge.within_volume(volume_lower_bound(design_box(names, fixed, corner, box_upper)[0]))
+
+    tightened = box_upper.copy()
+    for i in range(len(names)):
+        raised = box_lower.copy()
+        raised[:, i] = box_upper[:, i]
+        # Only boxes whose lower corner is within the limit and whose raised corner is over it are changed
+        changing = over_limit(raised) & ~over_limit(box_lower)
+        low, high = box_lower[:, i].copy(), box_upper[:, i].copy()
+        for _ in range(iterations):
+            raised[:, i] = (low + high) / 2
+            over = over_limit(raised)
+            high, low = np.where(over, raised[:, i], high), np.where(over, low, raised[:, i])
+        high = np.where(is_integer[i], np.maximum(np.floor(high), box_lower[:, i]), high)
+        tightened[:, i] = np.where(changing, high, box_upper[:, i])
+    return tightened
+
+
+def FOS_upper_bound(lower, upper, max_shear_force=None, max_bending_moment=None):
+    """
+    Bounds the minimum factor of safety of every design in a box of dimensions from above, and its volume from below.
+
+    Every component of the cross section only grows or moves up as any dimension grows, so its position, width and
+    height are smallest at the lower corner and largest at the upper corner. The centroid is bounded as a weighted mean
+    of the component positions, see weighted_mean_bounds, which bounds each component's distance from it and so the
+    second moment of area. The first moments at the centroid and the glue, and the buckling stresses, are bounded from
+    those, and each failure mode's capacity over demand is bounded by its largest capacity over its smallest demand. The
+    bounds close on the exact values as the box shrinks to a point.
+
+    Args:
+        lower (dict): Smallest top_flange_width, web_height, top_flange_layers, diaphragm_num and glue_width.
+        upper (dict): Largest values of the same dimensions.
+        max_shear_force (float): Maximum shear force applied to the bridge, or None for load case 2.
+        max_bending_moment (float): Maximum bending moment applied to the bridge, or None for load case 2.
+
+    Returns:
+        np.ndarray: Upper bound of the minimum FOS in each box.
+        np.ndarray: Lower bound of the volume in each box.
+    """
+    max_shear_force, max_bending_moment = bridge.applied_loads(max_shear_force, max_bending_moment)
+    th = calc.th
+
+    def components(corner):
+        return calc.generate_cross_section_arrays(
+            corner["top_flange_width"],
+            corner["web_height"],
+            corner["top_flange_layers"],
+            glue_width=corner["glue_width"],
+        )
+
+    y_lower, w_lower, h_lower = components(lower)
+    y_upper, w_upper, h_upper = components(upper)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Positions are measured from a point that rises as a fraction of the web height close to the centroid's
+        # rate, so the centroid and the components rising with it are tied together as the web grows
+        web_change = upper["web_height"] - lower["web_height"]
+        rate = calc.centroidal_axis_arrays(y_upper, w_upper, h_upper) - calc.centroidal_axis_arrays(
+            y_lower, w_lower, h_lower
+        )
+        rate = np.clip(np.where(web_change > 0, rate / web_change, 0), 0, 1)
+        # Components rise with the web height at a fixed rate of 0, 1/2 or 1, and the top flange with its layers, so
+        # each relative position is still monotonic and found at the corners
+        relative_a = y_lower - (rate * lower["web_height"])[..., None]
+        relative_b = y_upper - (rate * upper["web_height"])[..., None]
+        relative_lower, relative_upper = np.minimum(relative_a, relative_b), np.maximum(relative_a, relative_b)
+
+        axis_lower, axis_upper = weighted_mean_bounds(
+            w_lower * h_lower, w_upper * h_upper, relative_lower, relative_upper
+        )
+        # The second moment about the centroid is the smallest about any axis, so it is bounded by the second moment
+        # about the middle of the centroid's interval, where each component's distance is largest at one end of its own
+        middle = ((axis_lower + axis_upper) / 2)[..., None]
+        distance = np.maximum(np.abs(relative_lower - middle), np.abs(relative_upper - middle))
+        second_moment_area = (w_upper * h_upper**3 / 12 + w_upper * h_upper * distance**2).sum(axis=-1)
+        positive = lambda value: np.maximum(value, 0)
+
+        # Smallest heights of the centroid above the bottom, and of the glue and the top above the centroid
+        bottom_to_axis = axis_lower + rate * lower["web_height"]
+        glue_to_axis = th + (1 - rate) * lower["web_height"] - axis_upper
+        top_to_axis = glue_to_axis + lower["top_flange_layers"] * th
+
+        # Material below the centroid: the bottom flange and the webs up to the centroid
+        web_lower = np.minimum(positive(bottom_to_axis - th), lower["web_height"])
+        Q_centroid = calc.bottom_flange_width * th * positive(bottom_to_axis - th / 2) + th * web_lower**2
+        # Material above the glue: the top flange
+        top_flange = lower["top_flange_width"] * lower["top_flange_layers"] * th
+        Q_glue = top_flange * positive(glue_to_axis + lower["top_flange_layers"] * th / 2)
+
+        max_tension = bottom_to_axis * max_bending_moment / second_moment_area * 1e3
+        max_compression = positive(top_to_axis) * max_bending_moment / second_moment_area * 1e3
+        max_shear = max_shear_force * Q_centroid / (second_moment_area * 2 * th)
+        glue_shear = max_shear_force * Q_glue / (second_moment_area * 2 * upper["glue_width"])
+
+        buckling_flange_between_webs = calc.thin_plate_buckling(
+            4, th * upper["top_flange_layers"], calc.bottom_flange_width - th
+        )
+        buckling_flange_tips = calc.thin_plate_buckling(
+            0.425,
+            th * upper["top_flange_layers"],
+            (lower["top_flange_width"] - calc.bottom_flange_width + th) / 2,
+        )
+        buckling_webs = calc.thin_plate_buckling(6, th, positive(glue_to_axis))
+        buckling_shear = calc.thin_plate_buckling_shear(
+            th * 2, lower["web_height"] - th, calc.bridge_length / (upper["diaphragm_num"] + 1)
+        )
+
+        factors = np.stack(
+            np.broadcast_arrays(
+                calc.matboard_tensile_strength / max_tension,
+                calc.matboard_compressive_strength / max_compression,
+                calc.matboard_shear_strength / max_shear,
+                calc.cement_shear_strength / glue_shear,
+                buckling_flange_between_webs / max_compression,
+                buckling_flange_tips / max_compression,
+                buckling_webs / max_compression,
+                buckling_shear / max_shear,
+            ),
+            axis=-1,
+        )
+    # A bound that cannot be formed, such as a centroid that may reach the top, does not limit the FOS
+    factors = np.where(np.isnan(factors) | (factors < 0), np.inf, factors)
+    return np.min(factors, axis=-1), volume_lower_bound(lower)
+
+
+def optimize(
+    bounds,
+    max_shear_force=None,
+    max_bending_moment=None,
+    tolerance=1e-3,
+    gap=1e-3,
+    batch_size=64,
+):
+    """
+    Maximizes the minimum factor of safety subject to the matboard volume limit by branch-and-bound over boxes of the
+    design variables. Each box is shrunk to drop designs over the volume limit, see within_volume_box, bounded with
+    FOS_upper_bound and pruned once its bound cannot beat the best design found by more than the gap, or once even its
+    smallest volume is over the limit. Integer design variables are split at whole values, and the centre of each box
+    that is kept, rounded to whole values, is evaluated as a candidate. The best boxes are split batch_size at a time,
+    so each step is one call to FOS_upper_bound and one to get_FOS_batch.
+
+    Args:
+        bounds (dict): Maps design variable names (see sweep.variables) to (lower, upper) bounds, or a fixed value.
+        max_shear_force (float): Maximum shear force applied to the bridge, or None for load case 2.
+        max_bending_moment (float): Maximum bending moment applied to the bridge, or None for load case 2.
+        tolerance (float): Smallest box width of a continuous variable, relative to its range.
+        gap (float): Relative amount a box's bound must beat the best design by to be searched.
+        batch_size (int): Number of boxes split at each step.
+
+    Returns:
+        dict: "design", "FOS", "evaluations" (designs evaluated), "bounds" (boxes bounded), "evaluations_per_second",
+        "nodes" (boxes split), "upper_bound" (largest bound of any box left when the search stopped, at most the FOS
+        plus the gap) and "history", a list of (evaluations, FOS) each time the best design improved.
+    """
+    spec = {
+        name: tuple(value) if np.ndim(value) else (value, value)
+        for name, value in bounds.items()
+    }
+    axes = sweep.grid_axes({name: [lower] for name, (lower, _) in spec.items()})
+    fixed = {name: values[0].item() for name, values in axes.items() if name not in spec}
+    names = list(spec)
+    lower = np.array([spec[name][0] for name in names], dtype=float)
+    upper = np.array([spec[name][1] for name in names], dtype=float)
+    is_integer = np.array([name in integer_variables for name in names])
+    lower = np.where(is_integer, np.ceil(lower), lower)
+    upper = np.where(is_integer, np.floor(upper), upper)
+    smallest = np.where(is_integer, 0, tolerance * (upper - lower))
+    weights = np.array([split_weights.get(name, 1) for name in names])
+
+    start_time = time.perf_counter()
+    evaluations = 0
+    bounded = 0
+    history = []
+    incumbent = (-np.inf, None)
+
+    def evaluate(points):
+        nonlocal evaluations, incumbent
+        evaluations += len(points)
+        values = {name: points[:, i] for i, name in enumerate(names)}
+        factors, _, within_volume = bridge.get_FOS_batch(
+            max_shear_force=max_shear_force,
+            max_bending_moment=max_bending_moment,
+            **sweep.design_arguments({**fixed, **values}),
+        )
+        scores = np.where(within_volume, np.min(factors, axis=1), -1)
+        best = np.argmax(scores)
+        if scores[best] > incumbent[0]:
+            incumbent = (scores[best], points[best])
+            history.append((evaluations, float(scores[best])))
+
+    def bound(box_lower, box_upper):
+        nonlocal bounded
+        bounded += len(box_lower)
+        box_upper = within_volume_box(names, fixed, box_lower, box_upper, is_integer)
+        fos, volume = FOS_upper_bound(
+            *design_box(names, fixed, box_lower, box_upper), max_shear_force, max_bending_moment
+        )
+        return np.where(bridge.within_volume(volume), fos, -np.inf), box_upper
+
+    def polish(point):
+        # Compass search over the continuous variables from a new best design, polling every direction in one batch
+        step = (upper - lower) / 8 * ~is_integer
+        directions = np.concatenate((np.diag(step), -np.diag(step)))[np.tile(~is_integer, 2)]
+        best = incumbent[0]
+        while len(directions) and np.any(np.abs(directions).max(axis=0) > smallest):
+            evaluate(np.clip(incumbent[1] + directions, lower, upper))
+            if incumbent[0] <= best:
+                directions = directions / 2
+            best = incumbent[0]
+
+    def centres(box_lower, box_upper):
+        middle = (box_lower + box_upper) / 2
+        return np.where(is_integer, np.clip(np.round(middle), box_lower, box_upper), middle)
+
+    # Best-first queue of boxes by their bound
+    order = itertools.count()
+    queue = []
+    box_lower, box_upper = lower[None], upper[None]
+    evaluate(centres(box_lower, box_upper))
+    polish(incumbent[1])
+    box_bounds, box_upper = bound(box_lower, box_upper)
+    for box_bound, low, high in zip(box_bounds, box_lower, box_upper):
+        heapq.heappush(queue, (-box_bound, next(order), low, high))
+
+    nodes = 0
+    while queue and -queue[0][0] > incumbent[0] * (1 + gap):
+        batch = [heapq.heappop(queue) for _ in range(min(batch_size, len(queue)))]
+        batch = [entry for entry in batch if -entry[0] > incumbent[0] * (1 + gap)]
+        if not batch:
+            continue
+        box_lower = np.array([entry[2] for entry in batch])
+        box_upper = np.array([entry[3] for entry in batch])
+
+        # Split each box across its widest variable, relative to its range and weighted by split_weights. Boxes too
+        # small to split are finished.
+        widths = (box_upper - box_lower) / np.maximum(upper - lower, 1e-12)
+        widths = np.where(box_upper - box_lower > smallest, widths * weights, -1)
+        splittable = np.max(widths, axis=1) > 0
+        box_lower, box_upper, widths = box_lower[splittable], box_upper[splittable], widths[splittable]
+        if not len(box_lower):
+            continue
+        nodes += len(box_lower)
+        i = np.argmax(widths, axis=1)
+        rows = np.arange(len(box_lower))
+        middle = (box_lower[rows, i] + box_upper[rows, i]) / 2
+        split = np.where(is_integer[i], np.floor(middle), middle)
+        left_upper = box_upper.copy()
+        left_upper[rows, i] = split
+        right_lower = box_lower.copy()
+        right_lower[rows, i] = np.where(is_integer[i], split + 1, split)
+
+        child_lower = np.concatenate((box_lower, right_lower))
+        child_upper = np.concatenate((left_upper, box_upper))
+        # Only the children that could beat the best design are evaluated and kept
+        child_bounds, child_upper = bound(child_lower, child_upper)
+        promising = child_bounds > incumbent[0] * (1 + gap)
+        child_bounds, child_lower, child_upper = child_bounds[promising], child_lower[promising], child_upper[promising]
+        if not len(child_bounds):
+            continue
+        previous = incumbent[0]
+        evaluate(centres(child_lower, child_upper))
+        if incumbent[0] > previous:
+            polish(incumbent[1])
+        for box_bound, low, high in zip(child_bounds, child_lower, child_upper):
+            if box_bound > incumbent[0] * (1 + gap):
+                heapq.heappush(queue, (-box_bound, next(order), low, high))
+
+    elapsed = time.perf_counter() - start_time
+    best = incumbent[1]
+    return {
+        "design": {**fixed, **{name: best[i].item() for i, name in enumerate(names)}},
+        "FOS": float(incumbent[0]),
+        "evaluations": evaluations,
+        "bounds": bounded,
+        "evaluations_per_second": evaluations / elapsed,
+        "nodes": nodes,
+        "upper_bound": max(-queue[0][0] if queue else -np.inf, float(incumbent[0])),
+        "history": history,
+    }
+
+
+def parse_bounds(text):
+    """
+    Parses bounds from the command line.
+
+    Args:
+        text (str): Either "lower:upper" or a single fixed value.
+
+    Returns:
+        tuple: (lower, upper)
+    """
+    values = [float(value) for value in text.split(":")]
+    return (values[0], values[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Optimize bridge dimensions for the highest factor of safety."
+    )
+    for name in sweep.variables:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=parse_bounds,
+            help="lower:upper or a fixed value",
+        )
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--gap", type=float, default=1e-3, help="Relative gap to the upper bound to stop at")
+    args = parser.parse_args(argv)
+
+    bounds = {
+        name: getattr(args, name)
+        for name in sweep.variables
+        if getattr(args, name) is not None
+    }
+    result = optimize(bounds, tolerance=args.tolerance, gap=args.gap)
+    print(f"Design: {result['design']}")
+    print(f"FOS: {result['FOS']} (no design in the bounds is above {result['upper_bound']})")
+    print(f"Evaluations: {result['evaluations']} ({result['evaluations_per_second']:.0f} per second)")
+    print(f"Bounds: {result['bounds']} over {result['nodes']} splits")
+    print("History:")
+    for evaluations, fos in result["history"]:
+        print(f"{evaluations}: {fos}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import argparse
+
+import numpy as np
+import bridge
+import sweep
+
+# Total weight of the train in load case 2, which turns a factor of safety into a failure load
+train_weight = 446.66  # N
+
+
+class ParetoFront:
+    """
+    Non-dominated designs over (min FOS, volume, max load). Max load is FOS times the train weight, so a design is
+    dominated exactly when another has at least its FOS with at most its volume. The front is kept sorted by volume,
+    which makes FOS strictly increasing along it, so dominance checks are binary searches.
+    """
+
+    def __init__(self, names):
+        """
+        Args:
+            names (list): Names of the design variables stored with each design.
+        """
+        self.names = list(names)
+        self.fos = np.empty(0)
+        self.volume = np.empty(0)
+        self.designs = np.empty((0, len(self.names)))
+
+    def __len__(self):
+        return len(self.fos)
+
+    @property
+    def max_load(self):
+        return self.fos * train_weight
+
+    def dominated(self, fos, volume):
+        """
+        Checks which designs are dominated by the front.
+
+        Args:
+            fos (np.ndarray): Minimum factor of safety of each design.
+            volume (np.ndarray): Volume of each design.
+
+        Returns:
+            np.ndarray: Whether each design is dominated.
+        """
+        if not len(self):
+            return np.zeros(np.shape(fos), dtype=bool)
+
+        # The best FOS with at most the same volume is the last front design at or before it.
+        index = np.searchsorted(self.volume, volume, side="right") - 1
+        return (index >= 0) & (self.fos[np.maximum(index, 0)] >= fos)
+
+    def update(self, fos, volume, designs):
+        """
+        Adds a batch of designs, keeping only the non-dominated ones.
+
+        Args:
+            fos (np.ndarray): Minimum factor of safety of each design.
+            volume (np.ndarray): Volume of each design.
+            designs (np.ndarray): Design variables of each design, one row per design.
+
+        Returns:
+            int: Number of designs from the batch that joined the front.
+        """
+        fos = np.asarray(fos, dtype=float)
+        volume = np.asarray(volume, dtype=float)
+        designs = np.asarray(designs, dtype=float).reshape(len(fos), len(self.names))
+
+        candidates = ~self.dominated(fos, volume)
+        if not np.any(candidates):
+            return 0
+
+        fos = np.concatenate((self.fos, fos[candidates]))
+        volume = np.concatenate((self.volume, volume[candidates]))
+        designs = np.concatenate((self.designs, designs[candidates]))
+        is_new = np.arange(len(fos)) >= len(self.fos)
+
+        # Sort by volume, then FOS high to low, and keep designs that beat every smaller one.
+        order = np.lexsort((-fos, volume))
+        best_before = np.maximum.accumulate(np.concatenate(([-np.inf], fos[order][:-1])))
+        keep = order[fos[order] > best_before]
+
+        self.fos = fos[keep]
+        self.volume = volume[keep]
+        self.designs = designs[keep]
+        return int(np.sum(is_new[keep]))
+
+    def save(self, path):
+        """
+        Writes the front to a compressed .npz file with one array per column.
+
+        Args:
+            path (str): Path of the file.
+        """
+        np.savez_compressed(
+            path,
+            fos=self.fos,
+            volume=self.volume,
+            max_load=self.max_load,
+            names=np.array(self.names),
+            designs=self.designs,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a front written by save.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            ParetoFront: The front.
+        """
+        with np.load(path) as data:
+            front = cls(data["names"].tolist())
+            front.fos = data["fos"]
+            front.volume = data["volume"]
+            front.designs = data["designs"]
+        return front
+
+    def plot(self, save_path="pareto_front.png", show=False):
+        """
+        Plots FOS against percent of matboard used.
+
+        Args:
+            save_path (str): Path of the image.
+            show (bool): Whether to show the plot.
+        """
+        from graphs import plot_expr
+
+        percent = self.volume / bridge.matboard_volume * 100
+        plot_expr(
+            self.fos,
+            percent,
+            interval=(percent[0], percent[-1]),
+            x_axis_label="Percent of Matboard (%)",
+            y_axis_label="Minimum Factor of Safety",
+            save_path=save_path,
+            show=show,
+        )
+
+
+def evaluate_front_chunk(
+    axes,
+    start,
+    stop,
+    max_shear_force=None,
+    max_bending_moment=None,
+):
+    """
+    Evaluates a contiguous chunk of the flattened grid and reduces it to its own non-dominated designs.
+
+    Args:
+        axes (dict): Maps design variable names to arrays of values.
+        start (int): Flat index of the first design in the chunk.
+        stop (int): Flat index after the last design in the chunk.
+        max_shear_force (float): Maximum shear force applied to the bridge, or None for load case 2.
+        max_bending_moment (float): Maximum bending moment applied to the bridge, or None for load case 2.
+
+    Returns:
+        tuple: (FOS, volume, design variables) of the chunk's front.
+    """
+    names = list(axes)
+    indices = np.unravel_index(
+        np.arange(start, stop), tuple(len(axes[name]) for name in names)
+    )
+    values = {name: axes[name][index] for name, index in zip(names, indices)}
+
+    factors, volume = bridge.get_FOS_terms(
+        max_shear_force=max_shear_force,
+        max_bending_moment=max_bending_moment,
+        **sweep.design_arguments(values),
+    )
+    front = ParetoFront(names)
+    front.update(np.min(factors, axis=0), volume, np.stack(list(values.values()), axis=1))
+    return front.fos, front.volume, front.designs
+
+
+def pareto_sweep(spec, progress=None, **kwargs):
+    """
+    Finds the non-dominated designs in a grid, ignoring the matboard volume limit.
+
+    Args:
+        spec (dict): Maps design variable names to a value, a list of values, or a (start, stop[, step]) range.
+        progress (function): Called with (designs evaluated, total designs, front size) after each chunk.
+        **kwargs: Passed to sweep.iter_sweep.
+
+    Returns:
+        ParetoFront: The front.
+    """
+    axes = sweep.grid_axes(spec)
+    total = int(np.prod([len(values) for values in axes.values()]))
+
+    front = ParetoFront(axes)
+    evaluated = 0
+    for count, result in sweep.iter_sweep(spec, chunk_function=evaluate_front_chunk, **kwargs):
+        front.update(*result)
+        evaluated += count
+        if progress:
+            progress(evaluated, total, len(front))
+    return front
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the trade-off between factor of safety and matboard used."
+    )
+    for name in sweep.variables:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=sweep.parse_range,
+            help="start:stop[:step] or a comma separated list",
+        )
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="pareto_front.npz")
+    parser.add_argument("--plot", default=None, help="Path of an image of the front")
+    args = parser.parse_args(argv)
+
+    spec = {
+        name: getattr(args, name)
+        for name in sweep.variables
+        if getattr(args, name) is not None
+    }
+    progress = lambda done, total, size: print(
+        f"\r{done}/{total} ({size} on front)", end="", flush=True
+    )
+    front = pareto_sweep(
+        spec, progress=progress, chunk_size=args.chunk_size, workers=args.workers
+    )
+    print()
+    front.save(args.output)
+    if args.plot:
+        front.plot(args.plot)
+
+    for fos, volume, design in zip(front.fos, front.volume, front.designs):
+        print(
+            f"FOS: {fos:.4f}, Percent of Matboard: {volume / bridge.matboard_volume * 100:.2f}, "
+            f"Maximum Load: {fos * train_weight:.1f}, {dict(zip(front.names, design.tolist()))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import argparse
+
+import numpy as np
+import calculate as calc
+import bridge
+import instrument
+from envelope import load_cases
+
+# Design dimensions that geometric tolerances apply to. Their distributions give the error added to the design value.
+geometry_names = ("top_flange_width", "web_height")
+
+# Failure loads are binned between zero and this multiple of the design's nominal failure load
+histogram_range = 4
+
+percentiles = (1, 5, 10, 50, 90, 95, 99)
+
+
+def default_distributions():
+    """
+    Lists the default spread of every sampled quantity around the current constants in calculate.
+
+    Returns:
+        dict: Maps names in calc.material_names and geometry_names to distributions, see sample.
+    """
+    return {
+        "matboard_tensile_strength": ("lognormal", calc.matboard_tensile_strength, 0.1),
+        "matboard_compressive_strength": ("lognormal", calc.matboard_compressive_strength, 0.1),
+        "matboard_shear_strength": ("lognormal", calc.matboard_shear_strength, 0.1),
+        "cement_shear_strength": ("lognormal", calc.cement_shear_strength, 0.15),
+        "matboard_youngs_modulus": ("lognormal", calc.matboard_youngs_modulus, 0.1),
+        "th": ("normal", calc.th, 0.03),
+        "top_flange_width": ("normal", 0, 1),
+        "web_height": ("normal", 0, 1),
+    }
+
+
+def sample(rng, distribution, size):
+    """
+    Draws samples from a distribution.
+
+    Args:
+        rng (np.random.Generator): Random number generator.
+        distribution (tuple): One of ("normal", mean, standard deviation), ("lognormal", mean, coefficient of
+            variation), ("uniform", low, high) or ("fixed", value).
+        size (int): Number of samples.
+
+    Returns:
+        np.ndarray: The samples.
+    """
+    kind, *parameters = distribution
+    if kind == "normal":
+        return rng.normal(*parameters, size)
+    if kind == "lognormal":
+        mean, variation = parameters
+        sigma = np.sqrt(np.log1p(variation**2))
+        return rng.lognormal(np.log(mean) - sigma**2 / 2, sigma, size)
+    if kind == "uniform":
+        return rng.uniform(*parameters, size)
+    if kind == "fixed":
+        return np.full(size, float(parameters[0]))
+    raise ValueError(f"Unknown distribution: {kind}")
+
+
+@instrument.traced()
+def evaluate_samples(design, distributions, rng, size, **kwargs):
+    """
+    Samples the materials and dimensions of one chunk and evaluates every failure mode.
+
+    Args:
+        design (dict): Arguments for bridge.get_FOS_terms describing the nominal design.
+        distributions (dict): Maps names in calc.material_names and geometry_names to distributions.
+        rng (np.random.Generator): Random number generator.
+        size (int): Number of samples in the chunk.
+        **kwargs: Passed to bridge.get_FOS_terms.
+
+    Returns:
+        np.ndarray: (size x modes) factors of safety.
+    """
+    samples = {name: sample(rng, distribution, size) for name, distribution in distributions.items()}
+    materials = {name: samples[name] for name in calc.material_names if name in samples}
+    design = {name: np.full(size, value, dtype=float) for name, value in design.items()}
+    for name in geometry_names:
+        if name in samples:
+            design[name] += samples[name]
+
+    factors, _ = bridge.get_FOS_terms(**design, materials=materials, **kwargs)
+    return np.stack(np.broadcast_arrays(*factors), axis=-1)
+
+
+def simulate(
+    design,
+    num_samples=1_000_000,
+    chunk_size=100_000,
+    distributions=None,
+    load_case=2,
+    deflection_limit=None,
+    seed=0,
+    bins=400,
+):
+    """
+    Estimates how likely a design is to fail under a load case when its materials and dimensions vary. Samples are
+    evaluated one chunk at a time and reduced to counts and a histogram, so memory does not grow with num_samples.
+
+    Args:
+        design (dict): Arguments for bridge.get_FOS describing the nominal design.
+        num_samples (int): Number of samples.
+        chunk_size (int): Number of samples evaluated at once.
+        distributions (dict): Overrides entries of default_distributions. A distribution of None fixes the quantity
+            at its nominal value.
+        load_case (int): 1 or 2.
+        deflection_limit (float): Largest allowed deflection in mm, or None to skip the check.
+        seed (int): Seed of the random number generator.
+        bins (int): Number of bins in the failure load histogram.
+
+    Returns:
+        dict: "probability_of_failure" and "governing" map each failure mode to the fraction of samples where it fails
+        or governs, "probability_of_system_failure" is the fraction with any failure and "standard_error" is its
+        standard error. "failure_load" holds the mean, std, min, max, percentiles and histogram of the load in N that
+        fails each sample.
+    """
+    distributions = {**default_distributions(), **(distributions or {})}
+    distributions = {name: value for name, value in distributions.items() if value is not None}
+    unknown = set(distributions) - set(calc.material_names) - set(geometry_names)
+    if unknown:
+        raise ValueError(f"Unknown quantities: {sorted(unknown)}")
+
+    max_shear_force, max_bending_moment = bridge.applied_loads(load_case=load_case)
+    options = {
+        "max_shear_force": max_shear_force,
+        "max_bending_moment": max_bending_moment,
+        "deflection_limit": deflection_limit,
+        "unit_deflection": bridge.applied_deflection(deflection_limit, load_case=load_case),
+    }
+    design = {"top_flange_layers": 1, "diaphragm_num": 1, "glue_width": calc.glue_width, **design}
+    train_weight = sum(load[2] for load in load_cases[load_case]["loads"] if load[0] == "point")
+
+    nominal_factors = bridge.get_FOS_batch(**design, **options)[0][0]
+    edges = np.linspace(0, histogram_range * min(nominal_factors) * train_weight, bins + 1)
+    modes = bridge.failure_modes[: len(nominal_factors)]
+
+    rng = np.random.default_rng(seed)
+    failures = np.zeros(len(modes), dtype=np.int64)
+    governing = np.zeros(len(modes), dtype=np.int64)
+    histogram = np.zeros(bins, dtype=np.int64)
+    system_failures = 0
+    total = total_squares = 0.0
+    lowest, highest = np.inf, -np.inf
+
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        factors = evaluate_samples(design, distributions, rng, size, **options)
+
+        failures += np.count_nonzero(factors < 1, axis=0)
+        governing += np.bincount(np.argmin(factors, axis=1), minlength=len(modes))
+        failure_loads = np.min(factors, axis=1) * train_weight
+        system_failures += np.count_nonzero(failure_loads < train_weight)
+
+        # Loads past the last edge are counted in the last bin
+        histogram += np.bincount(
+            np.clip(np.searchsorted(edges, failure_loads, side="right") - 1, 0, bins - 1),
+            minlength=bins,
+        )
+        total += np.sum(failure_loads)
+        total_squares += np.sum(failure_loads**2)
+        lowest = min(lowest, np.min(failure_loads))
+        highest = max(highest, np.max(failure_loads))
+
+    mean = total / num_samples
+    probability = float(system_failures / num_samples)
+
+    # Percentiles interpolate the cumulative histogram, so they are accurate to one bin width.
+    cumulative = np.concatenate(([0], np.cumsum(histogram))) / num_samples
+    return {
+        "samples": num_samples,
+        "probability_of_failure": dict(zip(modes, (failures / num_samples).tolist())),
+        "governing": dict(zip(modes, (governing / num_samples).tolist())),
+        "probability_of_system_failure": probability,
+        "standard_error": float(np.sqrt(probability * (1 - probability) / num_samples)),
+        "failure_load": {
+            "mean": float(mean),
+            "std": float(np.sqrt(max(total_squares / num_samples - mean**2, 0))),
+            "min": float(lowest),
+            "max": float(highest),
+            "nominal": float(min(nominal_factors) * train_weight),
+            "percentiles": {
+                percentile: float(np.interp(percentile / 100, cumulative, edges))
+                for percentile in percentiles
+            },
+            "histogram": (histogram, edges),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Estimate the probability of failure of a design with varying materials and dimensions."
+    )
+    bridge.add_design_arguments(parser)
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--deflection-limit", type=float, default=None, help="Largest allowed deflection in mm"
+    )
+    parser.add_argument(
+        "--vary",
+        action="append",
+        default=[],
+        metavar="NAME=KIND:A[:B]",
+        help="Override a distribution, for example th=normal:1.27:0.05 or th=fixed:1.27",
+    )
+    args = parser.parse_args(argv)
+
+    distributions = {}
+    for text in args.vary:
+        name, distribution = text.split("=")
+        kind, *parameters = distribution.split(":")
+        distributions[name] = (kind, *map(float, parameters))
+
+    design = bridge.design_from_arguments(args)
+    for load_case in args.load_case or (2,):
+        result = simulate(
+            design,
+            num_samples=args.samples,
+            chunk_size=args.chunk_size,
+            distributions=distributions,
+            load_case=load_case,
+            deflection_limit=args.deflection_limit,
+            seed=args.seed,
+        )
+
+        print(f"Load Case {load_case}: {result['samples']} samples")
+        print(f"{'Failure Mode':<32} {'P(failure)':>12} {'Governs':>10}")
+        for mode, probability in result["probability_of_failure"].items():
+            print(f"{mode:<32} {probability:>12.6f} {result['governing'][mode]:>10.4f}")
+        print(
+            f"\nProbability of Failure: {result['probability_of_system_failure']:.6f} "
+            f"(standard error {result['standard_error']:.2g})"
+        )
+
+        failure_load = result["failure_load"]
+        print(
+            f"Failure Load (N): nominal {failure_load['nominal']:.1f}, mean {failure_load['mean']:.1f}, "
+            f"std {failure_load['std']:.1f}, min {failure_load['min']:.1f}, max {failure_load['max']:.1f}"
+        )
+        print(
+            "Percentiles: "
+            + ", ".join(f"{p}%: {value:.1f}" for p, value in failure_load["percentiles"].items())
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import collections
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import bridge
+import calculate as calc
+from envelope import compute_envelope, engines, load_cases
+
+# Used for any of a case's envelope settings that it does not give. One load position is a static load case.
+case_defaults = {
+    "start": 0,
+    "stop": 0,
+    "num_load_positions": 1,
+    "num_length_positions": 1000,
+}
+
+# Columns of a CSV load case file. Rows with the same case are one load case, and must be next to each other.
+csv_columns = ("case", "type", "position", "force")
+
+
+def read_jsonl_cases(f):
+    """
+    Reads load cases from a JSONL file, one per line. A line is either a list of loads, or an object with "loads" and
+    any of "id", "start", "stop", "num_load_positions" and "num_length_positions".
+
+    Args:
+        f (file): The open file.
+
+    Yields:
+        dict: Each load case.
+    """
+    for line in f:
+        if not line.strip():
+            continue
+        case = json.loads(line)
+        yield case if isinstance(case, dict) else {"loads": case}
+
+
+def read_csv_cases(f):
+    """
+    Reads load cases from a CSV file with csv_columns, one load per row. Reactions leave force empty, and
+    distributed loads give their intensity as force.
+
+    Args:
+        f (file): The open file.
+
+    Yields:
+        dict: Each load case.
+    """
+    rows = csv.DictReader(f)
+    for case_id, loads in itertools.groupby(rows, key=lambda row: row["case"]):
+        yield {
+            "id": case_id,
+            "loads": [
+                [row["type"], float(row["position"])]
+                + ([] if row["type"] == "reaction" else [float(row["force"])])
+                for row in loads
+            ],
+        }
+
+
+def read_cases(path):
+    """
+    Streams load cases from a JSONL or CSV file without reading the whole file.
+
+    Args:
+        path (str): Path of the file. Files ending in .csv are read as CSV, anything else as JSONL.
+
+    Yields:
+        tuple: (index of the case in the file, load case)
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        cases = read_csv_cases(f) if path.endswith(".csv") else read_jsonl_cases(f)
+        yield from enumerate(cases)
+
+
+def write_cases(path, cases):
+    """
+    Writes load cases to a JSONL file, for example the built in envelope.load_cases.
+
+    Args:
+        path (str): Path of the file.
+        cases (dict): Maps case ids to load cases.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for case_id, case in cases.items():
+            f.write(json.dumps({"id": case_id, **case}) + "\n")
+
+
+def evaluate_case(index, case, design, engine="batched", include_envelope=False):
+    """
+    Calculates the envelope of a load case and the factors of safety of a design under it.
+
+    Args:
+        index (int): Index of the case in its file.
+        case (dict): Load case, see read_jsonl_cases.
+        design (dict): Arguments for bridge.get_FOS.
+        engine (str): One of envelope.engines.
+        include_envelope (bool): Whether to include the shear force and bending moment at every station.
+
+    Returns:
+        dict: The result record. Cases that cannot be solved, or that put no shear or no moment on the bridge, get an
+        "error" instead of results.
+    """
+    settings = {**case_defaults, **{name: case[name] for name in case_defaults if name in case}}
+    record = {"index": index, "id": case.get("id", index)}
+    try:
+        data = compute_envelope(case["loads"], engine=engine, **settings)
+    except (KeyError, ValueError, IndexError, np.linalg.LinAlgError) as error:
+        record["error"] = f"{type(error).__name__}: {error}"
+        return record
+
+    shear, moment = float(data["shear"]), float(data["moment"])
+    try:
+        factors = bridge.get_FOS(
+            **design, max_shear_force=shear, max_bending_moment=moment, return_min=False
+        )
+    except ArithmeticError as error:
+        # A case with no shear or no moment divides by zero
+        record["error"] = f"{type(error).__name__}: {error}"
+        return record
+    governing = int(np.argmin(factors))
+    record.update(
+        {
+            "shear": shear,
+            "moment": moment,
+            "FOS": float(factors[governing]),
+            "governing": bridge.failure_modes[governing],
+            "factors": dict(zip(bridge.failure_modes, map(float, factors))),
+        }
+    )
+    if include_envelope:
+        for name in ("x", "shear_force_envelope", "bending_moment_envelope"):
+            record[name] = [float(value) for value in data[name]]
+    return record
+
+
+def evaluate_batch(batch, design, engine, include_envelope):
+    return [evaluate_case(index, case, design, engine, include_envelope) for index, case in batch]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def start_worker(design0):
+    # Design 0 changes module constants, which workers started without fork do not inherit
+    if design0:
+        calc.design0()
+
+
+def run_cases(
+    cases,
+    design,
+    engine="batched",
+    workers=1,
+    window=None,
+    batch_size=16,
+    include_envelope=False,
+    design0=False,
+):
+    """
+    Evaluates a stream of load cases, yielding results in input order. At most window batches are in flight, so
+    memory does not depend on how many cases there are.
+
+    Args:
+        cases (iterable): (index, load case) pairs, such as from read_cases.
+        design (dict): Arguments for bridge.get_FOS.
+        engine (str): One of envelope.engines.
+        workers (int): Number of processes. Runs in this process if 1, and on every core if None.
+        window (int): Largest number of batches in flight. Defaults to two per worker.
+        batch_size (int): Number of cases sent to a worker at once.
+        include_envelope (bool): Whether to include the envelope in each record.
+        design0 (bool): Whether design is design 0, whose constants are set with calc.design0 in every worker. The
+            caller sets them in this process.
+
+    Yields:
+        dict: Result record of each case, see evaluate_case.
+    """
+    if workers == 1:
+        for index, case in cases:
+            yield evaluate_case(index, case, design, engine, include_envelope)
+        return
+
+    workers = workers or os.cpu_count()
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=start_worker, initargs=(design0,)) as executor:
+        # Futures are kept in submission order, so records come out in input order.
+        pending = collections.deque()
+        for batch in batched(cases, batch_size):
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(evaluate_batch, batch, design, engine, include_envelope))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def last_committed_index(path):
+    """
+    Finds the last record written by a previous run, removing a partly written last line left by a crash.
+
+    Args:
+        path (str): Path of the JSONL results file.
+
+    Returns:
+        int: Index of the last complete record, or -1 if there is none.
+    """
+    if not os.path.exists(path):
+        return -1
+
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        # Read back from the end until the last complete line is found
+        position = size
+        tail = b""
+        while position > 0 and tail.count(b"\n") < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+
+        end = tail.rfind(b"\n")
+        if end + 1 != len(tail):
+            f.truncate(position + end + 1)
+        lines = tail[: end + 1].splitlines()
+    return json.loads(lines[-1])["index"] if lines else -1
+
+
+def run_file(
+    input_path,
+    output_path,
+    design,
+    resume=True,
+    sync_every=100,
+    progress=None,
+    **kwargs,
+):
+    """
+    Streams load cases from a file through run_cases and appends each record to a JSONL file as soon as it is ready.
+
+    Args:
+        input_path (str): Path of the JSONL or CSV load case file.
+        output_path (str): Path of the JSONL results file.
+        design (dict): Arguments for bridge.get_FOS.
+        resume (bool): Whether to continue after the last record of an existing results file, instead of
+            overwriting it.
+        sync_every (int): Number of records between flushes to disk. A crash loses at most this many records.
+        progress (function): Called with the number of records written after each sync.
+        **kwargs: Passed to run_cases.
+
+    Returns:
+        int: Number of records written by this run.
+    """
+    start = last_committed_index(output_path) + 1 if resume else 0
+    cases = itertools.dropwhile(lambda item: item[0] < start, read_cases(input_path))
+
+    written = 0
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as f:
+        for record in run_cases(cases, design, **kwargs):
+            f.write(json.dumps(record) + "\n")
+            written += 1
+            if written % sync_every == 0:
+                f.flush()
+                os.fsync(f.fileno())
+                if progress:
+                    progress(written)
+        f.flush()
+        os.fsync(f.fileno())
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calculate envelopes and factors of safety for every load case in a JSONL or CSV file."
+    )
+    parser.add_argument("input", help="JSONL or CSV load case file")
+    parser.add_argument("output", nargs="?", default=None, help="JSONL results file")
+    bridge.add_design_arguments(parser)
+    parser.add_argument("--engine", choices=engines, default="batched")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--window", type=int, default=None, help="Largest number of batches in flight")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--sync-every", type=int, default=100)
+    parser.add_argument("--restart", action="store_true", help="Overwrite the results instead of resuming")
+    parser.add_argument("--include-envelope", action="store_true")
+    parser.add_argument(
+        "--export", action="store_true", help="Write the built in load cases to the input file and exit"
+    )
+    args = parser.parse_args(argv)
+
+    if args.export:
+        write_cases(args.input, load_cases)
+        return
+    if args.output is None:
+        parser.error("the output file is required")
+
+    written = run_file(
+        args.input,
+        args.output,
+        bridge.design_from_arguments(args),
+        resume=not args.restart,
+        sync_every=args.sync_every,
+        progress=lambda written: print(f"\r{written} records", end="", flush=True),
+        engine=args.engine,
+        workers=args.workers,
+        window=args.window,
+        batch_size=args.batch_size,
+        include_envelope=args.include_envelope,
+        design0=args.design0,
+    )
+    print(f"\r{written} records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import numpy as np
+import calculate as calc
+import bridge
+
+# Design variables the sensitivities are taken with respect to, in the order of the last axis of the Jacobian.
+# Top flange layers are treated as continuous, and diaphragm spacing is the length of web between diaphragms. Glue width
+# moves the glue tabs of the section and the diaphragms as well as the glue shear width.
+variables = (
+    "top_flange_width",
+    "web_height",
+    "glue_width",
+    "top_flange_layers",
+    "diaphragm_spacing",
+)
+
+
+def _parts(value):
+    """Splits a Dual or constant into its value, gradient and active variables. Constants have no gradient."""
+    if isinstance(value, Dual):
+        return value.value, value.gradient, value.active
+    return np.asarray(value, dtype=float), None, ()
+
+
+def _shape(value):
+    """Finds the shape of a Dual or constant. np.shape itself dispatches back to Dual."""
+    if isinstance(value, Dual):
+        return value.shape
+    return np.shape(value)
+
+
+def _expand(gradient, active, union, shape):
+    """Places the rows of a gradient over some active variables into a gradient over more of them."""
+    if active == union:
+        return np.broadcast_to(gradient, (len(union),) + shape)
+    expanded = np.zeros((len(union),) + shape)
+    expanded[[union.index(variable) for variable in active]] = gradient
+    return expanded
+
+
+def _chain(value, *terms):
+    """
+    Applies the chain rule, summing gradient * partial derivative over (gradient, active variables, partial) terms.
+
+    Returns:
+        Dual: The value with its gradient.
+    """
+    terms = [term for term in terms if term[0] is not None]
+    union = tuple(sorted(set().union(*(active for _, active, _ in terms))))
+    gradient = None
+    fresh = False
+    for term_gradient, active, partial in terms:
+        if not (np.ndim(partial) == 0 and partial == 1):
+            term_gradient = term_gradient * partial
+        if active != union:
+            term_gradient = _expand(term_gradient, active, union, term_gradient.shape[1:])
+        if gradient is None:
+            gradient = term_gradient
+            fresh = term_gradient is not terms[0][0]
+        elif fresh and gradient.shape == np.broadcast_shapes(gradient.shape, term_gradient.shape):
+            # Only arrays made here are added to in place, never the gradient of an input
+            gradient += term_gradient
+        else:
+            gradient = gradient + term_gradient
+            fresh = True
+    return Dual(value, gradient, union)
+
+
+class Dual:
+    """
+    Forward-mode dual number over arrays. Carries the derivatives with respect to the design variables along an extra
+    first axis of the gradient, so one pass through get_FOS_terms gives the whole Jacobian of a batch of designs.
+    Only the variables a value depends on are stored, since most of the section components depend on one or two.
+    Implements the NumPy protocols for the arithmetic and array functions that the FOS calculation uses.
+    """
+
+    __slots__ = ("value", "gradient", "active")
+
+    def __init__(self, value, gradient=None, active=()):
+        """
+        Args:
+            value (np.ndarray): Value of each element.
+            gradient (np.ndarray): Derivatives of each element with respect to each active variable, with shape
+                (len(active),) + value.shape. Missing trailing axes are broadcast.
+            active (tuple): Indices into variables of the variables the value depends on, in ascending order.
+        """
+        self.value = np.asarray(value, dtype=float)
+        self.active = tuple(active)
+        if gradient is None:
+            gradient = np.zeros((len(self.active),))
+        gradient = np.asarray(gradient, dtype=float)
+        gradient = gradient.reshape(gradient.shape + (1,) * (self.value.ndim + 1 - gradient.ndim))
+        self.gradient = np.broadcast_to(gradient, gradient.shape[:1] + self.value.shape)
+
+    @property
+    def shape(self):
+        return self.value.shape
+
+    @property
+    def ndim(self):
+        return self.value.ndim
+
+    def __repr__(self):
+        return f"Dual({self.value!r}, {self.gradient!r}, {self.active!r})"
+
+    def full_gradient(self):
+        """
+        Returns:
+            np.ndarray: Derivatives with respect to every name in variables, with shape (len(variables),) + shape.
+        """
+        return _expand(self.gradient, self.active, tuple(range(len(variables))), self.shape)
+
+    def __getitem__(self, index):
+        # Index the value axes only, keeping the variables axis first
+        index = index if isinstance(index, tuple) else (index,)
+        return Dual(self.value[index], self.gradient[(slice(None),) + index], self.active)
+
+    def sum(self, axis=None):
+        if axis is None:
+            gradient = self.gradient.reshape(len(self.active), -1).sum(axis=1)
+            return Dual(self.value.sum(), gradient, self.active)
+        axis %= self.ndim
+        return Dual(self.value.sum(axis=axis), self.gradient.sum(axis=axis + 1), self.active)
+
+    def max(self, axis=-1):
+        axis %= self.ndim
+        index = np.expand_dims(np.argmax(self.value, axis=axis), axis)
+        gradient_index = np.broadcast_to(index, (len(self.active),) + index.shape)
+        return Dual(
+            np.take_along_axis(self.value, index, axis=axis).squeeze(axis),
+            np.take_along_axis(self.gradient, gradient_index, axis=axis + 1).squeeze(axis + 1),
+            self.active,
+        )
+
+    __add__ = lambda self, other: np.add(self, other)
+    __radd__ = lambda self, other: np.add(other, self)
+    __sub__ = lambda self, other: np.subtract(self, other)
+    __rsub__ = lambda self, other: np.subtract(other, self)
+    __mul__ = lambda self, other: np.multiply(self, other)
+    __rmul__ = lambda self, other: np.multiply(other, self)
+    __truediv__ = lambda self, other: np.true_divide(self, other)
+    __rtruediv__ = lambda self, other: np.true_divide(other, self)
+    __pow__ = lambda self, other: np.power(self, other)
+    __neg__ = lambda self: np.negative(self)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != "__call__" or kwargs:
+            return NotImplemented
+        parts = [_parts(value) for value in inputs]
+        if ufunc is np.negative:
+            ((a, da, active),) = parts
+            return Dual(-a, -da, active)
+
+        (a, da, a_active), (b, db, b_active) = parts
+        if ufunc is np.add:
+            return _chain(a + b, (da, a_active, 1), (db, b_active, 1))
+        if ufunc is np.subtract:
+            return _chain(a - b, (da, a_active, 1), (db, b_active, -1))
+        if ufunc is np.multiply:
+            return _chain(a * b, (da, a_active, b), (db, b_active, a))
+        if ufunc is np.true_divide:
+            value = a / b
+            return _chain(value, (da, a_active, 1 / b), (db, b_active, -value / b))
+        if ufunc is np.power and db is None:
+            return _chain(a**b, (da, a_active, b * a ** (b - 1)))
+        return NotImplemented
+
+    def __array_function__(self, function, types, args, kwargs):
+        if function is np.full_like:
+            # Constants need no gradient
+            like, fill_value = args
+            return np.full(_shape(like), fill_value, dtype=float)
+        if function is np.broadcast_arrays:
+            shape = np.broadcast_shapes(*(_shape(value) for value in args))
+            return tuple(
+                Dual(np.broadcast_to(value.value, shape), value.gradient, value.active)
+                if isinstance(value, Dual)
+                else np.broadcast_to(value, shape)
+                for value in args
+            )
+        if function is np.stack:
+            (values,) = args
+            parts = [_parts(value) for value in values]
+            shape = parts[0][0].shape
+            axis = kwargs.get("axis", 0) % (len(shape) + 1)
+            union = tuple(sorted(set().union(*(active for _, _, active in parts))))
+            return Dual(
+                np.stack([value for value, _, _ in parts], axis=axis),
+                np.stack(
+                    [
+                        np.zeros((len(union),) + shape)
+                        if gradient is None
+                        else _expand(gradient, active, union, shape)
+                        for _, gradient, active in parts
+                    ],
+                    axis=axis + 1,
+                ),
+                union,
+            )
+        if function is np.clip:
+            (a, da, a_active), (low, dlow, low_active), (high, dhigh, high_active) = (
+                _parts(value) for value in args
+            )
+            union = tuple(sorted(set(a_active) | set(low_active) | set(high_active)))
+            shape = a.shape
+            select = lambda gradient, active: (
+                0 if gradient is None else _expand(gradient, active, union, shape)
+            )
+            return Dual(
+                np.clip(a, low, high),
+                np.where(
+                    a < low,
+                    select(dlow, low_active),
+                    np.where(a > high, select(dhigh, high_active), select(da, a_active)),
+                ),
+                union,
+            )
+        return NotImplemented
+
+
+def sensitivities(
+    top_flange_width,
+    web_height,
+    top_flange_layers=1,
+    diaphragm_num=1,
+    glue_width=None,
+    max_shear_force=None,
+    max_bending_moment=None,
+    deflection_limit=None,
+    unit_deflection=None,
+    materials=None,
+):
+    """
+    Calculates the factors of safety of many designs and their derivatives with respect to every design variable in
+    one pass, by running get_FOS_terms on dual numbers. Every design argument may be a scalar or an array.
+
+    Diaphragm spacing is a = bridge_length / (diaphragm_num + 1), so its derivative is seeded through
+    d(diaphragm_num) / da = -bridge_length / a^2.
+
+    Returns:
+        np.ndarray: (N x 8) factors of safety, in the same order as get_FOS with return_min=False, or (N x 9) with a
+        deflection limit.
+        np.ndarray: (N x modes x 5) derivatives of each factor of safety with respect to each name in variables.
+        np.ndarray: Volume of each design.
+        np.ndarray: (N x 5) derivatives of the volume.
+    """
+    if glue_width is None:
+        glue_width = calc.glue_width
+    arguments = np.broadcast_arrays(
+        *(
+            np.atleast_1d(np.asarray(value, dtype=float))
+            for value in (
+                top_flange_width,
+                web_height,
+                glue_width,
+                top_flange_layers,
+                diaphragm_num,
+            )
+        )
+    )
+    values = [argument.ravel() for argument in arguments]
+
+    # The diaphragm number only changes through the spacing, so its seed is the chain rule factor.
+    spacing = calc.bridge_length / (values[4] + 1)
+    seeds = [np.ones(1)] * 4 + [-calc.bridge_length / spacing[None] ** 2]
+    top_flange_width, web_height, glue_width, top_flange_layers, diaphragm_num = (
+        Dual(value, seed, (i,)) for i, (value, seed) in enumerate(zip(values, seeds))
+    )
+
+    factors, volume = bridge.get_FOS_terms(
+        top_flange_width,
+        web_height,
+        top_flange_layers,
+        diaphragm_num,
+        max_shear_force,
+        max_bending_moment,
+        glue_width,
+        deflection_limit,
+        unit_deflection,
+        materials,
+    )
+    shape = (len(values[0]),)
+    factors = [
+        factor if isinstance(factor, Dual) else Dual(factor) for factor in factors
+    ]
+    return (
+        np.stack([np.broadcast_to(factor.value, shape) for factor in factors], axis=-1),
+        np.stack(
+            [np.broadcast_to(factor.full_gradient(), (len(variables),) + shape) for factor in factors],
+            axis=-1,
+        ).transpose(1, 2, 0),
+        volume.value,
+        volume.full_gradient().T,
+    )
@@ -0,0 +1,557 @@
+import argparse
+import asyncio
+import collections
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import bridge
+import sweep
+
+# Fields a request may give, besides web_height or total_height. Missing design fields use sweep.design_defaults, and
+# missing loads use the request's load case.
+request_fields = (
+    "top_flange_width",
+    "web_height",
+    "total_height",
+    "top_flange_layers",
+    "diaphragm_num",
+    "glue_width",
+    "max_shear_force",
+    "max_bending_moment",
+    "deflection_limit",
+    "load_case",
+)
+
+# Number of recent requests the latency percentiles are taken over
+latency_window = 10_000
+
+percentiles = (50, 95, 99)
+
+statuses = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def parse_request(values):
+    """
+    Checks a get_FOS style request and fills in its defaults.
+
+    Args:
+        values (dict): The request body. Needs top_flange_width and one of web_height or total_height. A null field
+            takes its default like a missing one.
+
+    Returns:
+        dict: Design arguments for bridge.get_FOS_batch, with load_case and deflection_limit.
+    """
+    if not isinstance(values, dict):
+        raise ValueError("A request must be a JSON object.")
+    unknown = set(values) - set(request_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {sorted(unknown)}")
+    # A null field is the same as a missing one, so it takes its default
+    values = {name: value for name, value in values.items() if value is not None}
+    if "top_flange_width" not in values:
+        raise ValueError("top_flange_width must be specified.")
+    if ("web_height" in values) == ("total_height" in values):
+        raise ValueError("Specify exactly one of web_height or total_height.")
+    load_case = values.get("load_case", 2)
+    if isinstance(load_case, bool) or load_case not in (1, 2):
+        raise ValueError("load_case must be 1 or 2.")
+
+    request = {"load_case": 2, "deflection_limit": None, **sweep.design_defaults()}
+    for name, value in values.items():
+        if name != "load_case":
+            # float(True) is 1, so a boolean would pass as a number
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{name} must be a number.")
+            value = float(value)
+            # JSON allows NaN and Infinity, which would give NaN factors of safety
+            if not np.isfinite(value) or value <= 0:
+                raise ValueError(f"{name} must be a positive finite number.")
+        request[name] = value
+    request = sweep.design_arguments(request)
+    # A total height below the flanges leaves no web
+    if request["web_height"] <= 0:
+        raise ValueError("total_height must be more than the thickness of the flanges.")
+    return request
+
+
+class LoadCases:
+    """
+    Keeps the applied loads of both load cases in memory, so requests never read an envelope.
+    """
+
+    def __init__(self):
+        self.loads = {load_case: bridge.applied_loads(load_case=load_case) for load_case in (1, 2)}
+        self.deflections = {}
+
+    def unit_deflection(self, load_case):
+        # The deflection module is only imported once a request has a deflection limit
+        if load_case not in self.deflections:
+            self.deflections[load_case] = bridge.applied_deflection(0, load_case=load_case)
+        return self.deflections[load_case]
+
+
+def evaluate_requests(requests, load_cases):
+    """
+    Evaluates a batch of requests with one call to bridge.get_FOS_batch per kind of request, those with a deflection
+    limit and those without.
+
+    Args:
+        requests (list): Requests from parse_request.
+        load_cases (LoadCases): Applied loads of each load case.
+
+    Returns:
+        list: "FOS" (-1 if the design uses too much matboard, like get_FOS), "governing" and "factors" of each request.
+    """
+    results = [None] * len(requests)
+    groups = collections.defaultdict(list)
+    for i, request in enumerate(requests):
+        groups[request["deflection_limit"] is not None].append(i)
+
+    for has_deflection, indices in groups.items():
+        column = lambda name: np.array([requests[i][name] for i in indices], dtype=float)
+        defaults = [load_cases.loads[requests[i]["load_case"]] for i in indices]
+        max_shear_force = np.array(
+            [requests[i].get("max_shear_force", loads[0]) for i, loads in zip(indices, defaults)], dtype=float
+        )
+        max_bending_moment = np.array(
+            [requests[i].get("max_bending_moment", loads[1]) for i, loads in zip(indices, defaults)], dtype=float
+        )
+        options = {}
+        if has_deflection:
+            options["deflection_limit"] = column("deflection_limit")
+            options["unit_deflection"] = np.array(
+                [load_cases.unit_deflection(requests[i]["load_case"]) for i in indices], dtype=float
+            )
+
+        factors, governing, within_volume = bridge.get_FOS_batch(
+            top_flange_width=column("top_flange_width"),
+            web_height=column("web_height"),
+            top_flange_layers=column("top_flange_layers"),
+            diaphragm_num=column("diaphragm_num"),
+            glue_width=column("glue_width"),
+            max_shear_force=max_shear_force,
+            max_bending_moment=max_bending_moment,
+            **options,
+        )
+        fos = np.where(within_volume, np.min(factors, axis=1), -1)
+        modes = bridge.failure_modes[: factors.shape[1]]
+        for row, i in enumerate(indices):
+            results[i] = {
+                "FOS": float(fos[row]),
+                "governing": modes[governing[row]],
+                "factors": dict(zip(modes, factors[row].tolist())),
+            }
+    return results
+
+
+class Stats:
+    """
+    Counts requests and batches, and keeps the latencies of recent requests.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.batch_sizes = collections.Counter()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Uptime in s, request, batch and error counts, throughput in requests/s, mean batch size, batch size
+            counts and latency percentiles in ms.
+        """
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1e3
+        return {
+            "uptime": uptime,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "throughput": self.requests / uptime if uptime else 0,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "latency": {
+                f"p{percentile}": float(np.percentile(latencies, percentile)) if len(latencies) else None
+                for percentile in percentiles
+            },
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batches. A batch is evaluated once it has max_batch_size requests, or
+    max_delay seconds after its first request arrived. Batches are evaluated one at a time on a worker thread, so
+    requests that arrive during an evaluation make up the next batch.
+    """
+
+    def __init__(self, evaluate, max_batch_size=256, max_delay=0.002, stats=None):
+        """
+        Args:
+            evaluate (function): Called with a list of requests in a worker thread, returning a list of results.
+            max_batch_size (int): Largest number of requests in a batch.
+            max_delay (float): Longest time in s the first request of a batch waits for others.
+            stats (Stats): Where to record requests and batches.
+        """
+        self.evaluate = evaluate
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.stats = stats or Stats()
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+        # Requests taken from the queue whose results are not set yet
+        self.batch = []
+        self.stopped = False
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """
+        Stops evaluating batches. Requests that are queued or being evaluated fail with a RuntimeError.
+        """
+        self.stopped = True
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.executor.shutdown()
+
+        pending = self.batch + [self.queue.get_nowait() for _ in range(self.queue.qsize())]
+        self.batch = []
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("The service stopped before the request was evaluated."))
+
+    async def submit(self, request):
+        """
+        Queues a request and waits for its result.
+
+        Args:
+            request: A request for evaluate.
+
+        Returns:
+            The result of the request.
+        """
+        if self.stopped:
+            raise RuntimeError("The service is stopped.")
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        try:
+            return await future
+        finally:
+            self.stats.latencies.append(time.perf_counter() - start)
+
+    async def next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = self.batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.next_batch()
+            requests = [request for request, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.evaluate, requests)
+            except Exception as error:
+                self.stats.errors += len(batch)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            self.batch = []
+            self.stats.requests += len(batch)
+            self.stats.batches += 1
+            self.stats.batch_sizes[len(batch)] += 1
+
+
+async def read_request(reader):
+    """
+    Reads one HTTP/1.1 request.
+
+    Returns:
+        tuple: (method, path, headers, body), or None when the connection is closed.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path, headers, body
+
+
+def write_response(writer, status, body):
+    payload = json.dumps(body).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {statuses[status]}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+        + payload
+    )
+
+
+class Service:
+    """
+    HTTP service that answers get_FOS style requests through a MicroBatcher.
+
+    Endpoints:
+        POST /fos: A request object, see parse_request, or a list of them. Returns the result or list of results of
+            evaluate_requests.
+        GET /stats: Stats.snapshot and the batching settings.
+        GET /health: {"status": "ok"}.
+    """
+
+    def __init__(self, max_batch_size=256, max_delay=0.002):
+        self.load_cases = LoadCases()
+        self.stats = Stats()
+        self.batcher = MicroBatcher(
+            lambda requests: evaluate_requests(requests, self.load_cases), max_batch_size, max_delay, self.stats
+        )
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """
+        Starts listening on a TCP port, or on a Unix socket if unix_path is given.
+
+        Returns:
+            asyncio.Server: The server. Its sockets give the port when port is 0.
+        """
+        self.batcher.start()
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def respond(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, {
+                **self.stats.snapshot(),
+                "max_batch_size": self.batcher.max_batch_size,
+                "max_delay": self.batcher.max_delay,
+            }
+        if path != "/fos":
+            return 404, {"error": f"Unknown path: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST."}
+
+        try:
+            values = json.loads(body)
+            requests = [parse_request(value) for value in values] if isinstance(values, list) else parse_request(values)
+        except (ValueError, TypeError) as error:
+            return 400, {"error": str(error)}
+        try:
+            if isinstance(requests, list):
+                return 200, list(await asyncio.gather(*map(self.batcher.submit, requests)))
+            return 200, await self.batcher.submit(requests)
+        except Exception as error:
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as error:
+                    # The end of a malformed request cannot be found, so the connection is closed after answering
+                    write_response(writer, 400, {"error": f"Malformed request: {error}"})
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, response = await self.respond(method, path, body)
+                write_response(writer, status, response)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class Client:
+    """
+    Minimal keep-alive HTTP client for the service.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, unix_path=None):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.unix_path:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def call(self, method, path, body=None):
+        """
+        Sends a request and waits for the response.
+
+        Args:
+            method (str): "GET" or "POST".
+            path (str): Endpoint, such as "/fos".
+            body: Value sent as JSON.
+
+        Returns:
+            tuple: (status code, decoded JSON response)
+        """
+        if self.writer is None:
+            await self.connect()
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+            + payload
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        response = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        return int(status_line.split()[1]), json.loads(response)
+
+
+async def load_test(num_requests=10_000, concurrency=64, seed=0, **kwargs):
+    """
+    Starts the service on a free localhost port and sends it random designs from many concurrent clients.
+
+    Args:
+        num_requests (int): Total number of requests.
+        concurrency (int): Number of clients, each sending one request at a time.
+        seed (int): Seed of the random designs.
+        **kwargs: Passed to Service.
+
+    Returns:
+        dict: The service's statistics, with the wall time and client-side throughput.
+    """
+    service = Service(**kwargs)
+    server = await service.start(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    rng = np.random.default_rng(seed)
+    designs = [
+        {
+            "top_flange_width": float(width),
+            "total_height": float(height),
+            "top_flange_layers": int(layers),
+            "diaphragm_num": int(diaphragms),
+            "load_case": int(load_case),
+        }
+        for width, height, layers, diaphragms, load_case in zip(
+            rng.uniform(100, 150, num_requests),
+            rng.uniform(80, 140, num_requests),
+            rng.integers(1, 4, num_requests),
+            rng.integers(1, 10, num_requests),
+            rng.integers(1, 3, num_requests),
+        )
+    ]
+
+    async def client(requests):
+        client = Client(port=port)
+        for request in requests:
+            status, _ = await client.call("POST", "/fos", request)
+            if status != 200:
+                raise RuntimeError(f"Request failed with status {status}")
+        await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(designs[i::concurrency]) for i in range(concurrency)))
+    wall = time.perf_counter() - start
+
+    stats = service.stats.snapshot()
+    await service.stop()
+    return {**stats, "wall": wall, "client_throughput": num_requests / wall}
+
+
+def print_stats(stats):
+    print(
+        f"{stats['requests']} requests in {stats['batches']} batches "
+        f"(mean batch size {stats['mean_batch_size']:.1f}, {stats['errors']} errors)"
+    )
+    if "wall" in stats:
+        print(f"Throughput: {stats['client_throughput']:.0f} requests/s over {stats['wall']:.2f} s")
+    print("Latency (ms): " + ", ".join(f"{name} {value:.3f}" for name, value in stats["latency"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve get_FOS requests over HTTP, batching concurrent requests together."
+    )
+    parser.add_argument("command", choices=("serve", "load-test"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Path of a Unix socket to listen on instead of a port")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-delay", type=float, default=2, help="Longest wait for a batch to fill in ms")
+    parser.add_argument("--requests", type=int, default=10_000, help="Number of requests sent by load-test")
+    parser.add_argument("--concurrency", type=int, default=64, help="Number of clients used by load-test")
+    args = parser.parse_args(argv)
+    options = {"max_batch_size": args.max_batch_size, "max_delay": args.max_delay / 1e3}
+
+    if args.command == "load-test":
+        print_stats(asyncio.run(load_test(args.requests, args.concurrency, **options)))
+        return
+
+    async def serve():
+        service = Service(**options)
+        server = await service.start(args.host, args.port, args.unix)
+        print(f"Listening on {args.unix or f'http://{args.host}:{args.port}'}")
+        try:
+            await server.serve_forever()
+        finally:
+            print_stats(service.stats.snapshot())
+            await service.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+
+import numpy as np
+import calculate as calc
+import bridge
+import sweep
+from envelope import load_case_envelope
+
+# Failure modes of get_FOS that scale with the local shear force. The others scale with the local bending moment.
+shear_modes = ("shear", "glue_shear", "buckling_shear_webs")
+modes = bridge.failure_modes[:8]
+is_shear = np.isin(modes, shear_modes)
+
+
+def diaphragm_positions(diaphragm_num):
+    """
+    Places diaphragms evenly along the bridge, as get_FOS assumes.
+
+    Args:
+        diaphragm_num (int): Number of diaphragms between the ends.
+
+    Returns:
+        np.ndarray: Positions of every diaphragm in mm, including both ends.
+    """
+    return np.linspace(0, calc.bridge_length, int(diaphragm_num) + 2)
+
+
+def section_segments(segments, design=None):
+    """
+    Fills in and checks a list of section segments.
+
+    Args:
+        segments (list): Dicts with "start" and "end" in mm and any of the get_FOS design arguments, or total_height.
+            They must be in order and cover the bridge without gaps.
+        design (dict): Design arguments used where a segment does not give them. Defaults to the final design.
+
+    Returns:
+        tuple: (np.ndarray of segment starts in mm, list of dicts of get_FOS design arguments)
+    """
+    design = dict(bridge.final_design if design is None else design)
+    starts = np.array([segment["start"] for segment in segments], dtype=float)
+    ends = np.array([segment["end"] for segment in segments], dtype=float)
+    if (
+        not len(segments)
+        or starts[0] > 0
+        or ends[-1] < calc.bridge_length
+        or np.any(starts[1:] != ends[:-1])
+        or np.any(ends <= starts)
+    ):
+        raise ValueError("Segments must be in order and cover the bridge without gaps.")
+
+    sections = []
+    for segment in segments:
+        values = {**design, **{name: value for name, value in segment.items() if name not in ("start", "end")}}
+        if "web_height" in segment:
+            values.pop("total_height", None)
+        elif "total_height" in segment:
+            values.pop("web_height", None)
+        values.setdefault("top_flange_layers", 1)
+        values.setdefault("glue_width", calc.glue_width)
+        values.pop("diaphragm_num", None)
+        sections.append(sweep.design_arguments(values))
+    return starts, sections
+
+
+def spanwise_FOS(segments, design=None, diaphragms=None, envelope=None, load_case=2):
+    """
+    Calculates every failure mode at every envelope station against the local shear force and bending moment, with
+    the cross section and diaphragm spacing that apply at that station. Capacities are found once per unique pair of
+    segment and diaphragm spacing, by evaluating get_FOS_terms with a unit shear force and bending moment, and then
+    divided by the envelope at each station.
+
+    Args:
+        segments (list): Section segments, see section_segments.
+        design (dict): Design arguments used where a segment does not give them. Defaults to the final design.
+        diaphragms (list): Positions of the diaphragms in mm, including the ends. Defaults to evenly spaced
+            diaphragms from the design's diaphragm_num.
+        envelope (dict): Envelope in the format returned by envelope.load_envelope. Defaults to the load case's.
+        load_case (int): 1 or 2, used when envelope is not given.
+
+    Returns:
+        dict: "x" in m, "FOS" with one row per station and one column per mode in modes, "segment" and "spacing" of
+        each station, and "min_FOS" and "position" of the lowest factor of safety of each mode.
+    """
+    starts, sections = section_segments(segments, design)
+    if diaphragms is None:
+        diaphragm_num = (design or bridge.final_design).get("diaphragm_num", 1)
+        diaphragms = diaphragm_positions(diaphragm_num)
+    diaphragms = np.unique(np.asarray(diaphragms, dtype=float))
+    if envelope is None:
+        envelope = load_case_envelope(load_case)
+
+    x_vals = np.asarray(envelope["x"], dtype=float)
+    lengths = x_vals * 1e3
+    shear_forces = np.abs(np.asarray(envelope["shear_force_envelope"], dtype=float))
+    bending_moments = np.abs(np.asarray(envelope["bending_moment_envelope"], dtype=float))
+
+    segment = np.clip(np.searchsorted(starts, lengths, side="right") - 1, 0, len(sections) - 1)
+    gap = np.clip(np.searchsorted(diaphragms, lengths, side="right") - 1, 0, len(diaphragms) - 2)
+    spacing = np.diff(diaphragms)[gap]
+
+    # Capacities of each unique (segment, spacing) pair, broadcast back over the stations
+    pairs, station_pair = np.unique(np.stack((segment, spacing), axis=1), axis=0, return_inverse=True)
+    pair_segment = pairs[:, 0].astype(int)
+    values = {
+        name: np.array([sections[i][name] for i in pair_segment], dtype=float)
+        for name in ("top_flange_width", "web_height", "top_flange_layers", "glue_width")
+    }
+    capacities, _ = bridge.get_FOS_terms(
+        **values,
+        diaphragm_num=calc.bridge_length / pairs[:, 1] - 1,
+        max_shear_force=1,
+        max_bending_moment=1,
+    )
+    capacities = np.stack(capacities, axis=-1)[station_pair.ravel()]
+
+    with np.errstate(divide="ignore"):
+        factors = capacities / np.where(is_shear, shear_forces[:, None], bending_moments[:, None])
+
+    lowest = np.argmin(factors, axis=0)
+    return {
+        "x": x_vals,
+        "FOS": factors,
+        "segment": segment,
+        "spacing": spacing,
+        "min_FOS": dict(zip(modes, factors[lowest, np.arange(len(modes))].tolist())),
+        "position": dict(zip(modes, x_vals[lowest].tolist())),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the factor of safety of every failure mode along the span."
+    )
+    parser.add_argument(
+        "segments",
+        nargs="?",
+        default=None,
+        help='JSON file with a list of segments like {"start": 0, "end": 400, "top_flange_layers": 1}. '
+        "Defaults to the final design along the whole bridge.",
+    )
+    parser.add_argument("--load-case", type=int, choices=(1, 2), default=2)
+    parser.add_argument(
+        "--diaphragms", default=None, help="Comma separated diaphragm positions in mm, including the ends"
+    )
+    parser.add_argument("--output", default=None, help="Path of a CSV file of FOS(x) for every mode")
+    args = parser.parse_args(argv)
+
+    segments = [{"start": 0, "end": calc.bridge_length}]
+    if args.segments:
+        with open(args.segments, encoding="utf-8") as f:
+            segments = json.load(f)
+    diaphragms = None
+    if args.diaphragms:
+        diaphragms = [float(value) for value in args.diaphragms.split(",")]
+
+    result = spanwise_FOS(segments, diaphragms=diaphragms, load_case=args.load_case)
+    print(f"Load Case {args.load_case}: {len(result['x'])} stations, {len(segments)} segments")
+    for mode in modes:
+        print(f"{mode:<32} FOS {result['min_FOS'][mode]:10.4f} at {result['position'][mode]:.3f} m")
+
+    if args.output:
+        np.savetxt(
+            args.output,
+            np.column_stack((result["x"], result["FOS"])),
+            delimiter=",",
+            header=",".join(("x",) + modes),
+            comments="",
+        )
+
+
+if __name__ == "__main__":
+    main()
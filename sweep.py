@@ -0,0 +1,284 @@
+import argparse
+import heapq
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import calculate as calc
+import bridge
+import instrument
+
+# Design variables a sweep can range over. total_height replaces web_height with the height of the whole bridge,
+# as in the original optimization loop.
+variables = (
+    "top_flange_width",
+    "web_height",
+    "total_height",
+    "top_flange_layers",
+    "diaphragm_num",
+    "glue_width",
+)
+
+defaults = {
+    "top_flange_layers": 1,
+    "diaphragm_num": 1,
+}
+
+
+def design_defaults():
+    """
+    Returns:
+        dict: Default value of every design variable that has one. The glue width is read when called, since
+        calc.design0 changes it.
+    """
+    return {**defaults, "glue_width": calc.glue_width}
+
+
+def parse_range(text):
+    """
+    Parses a range of values from the command line.
+
+    Args:
+        text (str): Either "start:stop[:step]" like Python's range, or a comma separated list of values.
+
+    Returns:
+        np.ndarray: The values.
+    """
+    if ":" in text:
+        bounds = [float(value) for value in text.split(":")]
+        return np.arange(*bounds)
+    return np.array([float(value) for value in text.split(",")])
+
+
+def grid_axes(spec):
+    """
+    Converts a grid specification into one array of values per design variable.
+
+    Args:
+        spec (dict): Maps design variable names to a value, a list of values, or a (start, stop[, step]) range.
+
+    Returns:
+        dict: Maps design variable names to arrays of values.
+    """
+    unknown = set(spec) - set(variables)
+    if unknown:
+        raise ValueError(f"Unknown design variables: {sorted(unknown)}")
+    if ("web_height" in spec) == ("total_height" in spec):
+        raise ValueError("Specify exactly one of web_height or total_height.")
+    if "top_flange_width" not in spec:
+        raise ValueError("top_flange_width must be specified.")
+
+    axes = {}
+    spec = {**design_defaults(), **spec}
+    for name in variables:
+        values = spec.get(name)
+        if values is None:
+            continue
+        if isinstance(values, range):
+            values = list(values)
+        elif isinstance(values, tuple):
+            values = np.arange(*values)
+        axes[name] = np.atleast_1d(np.asarray(values, dtype=float))
+    return axes
+
+
+def design_arguments(values):
+    """
+    Converts design variable values into arguments for bridge.get_FOS_batch.
+
+    Args:
+        values (dict): Maps design variable names to values.
+
+    Returns:
+        dict: The same values, with total_height replaced by web_height.
+    """
+    values = dict(values)
+    if "total_height" in values:
+        values["web_height"] = (
+            values.pop("total_height") - calc.th - values["top_flange_layers"] * calc.th
+        )
+    return values
+
+
+@instrument.traced()
+def evaluate_chunk(
+    axes,
+    start,
+    stop,
+    top_k=10,
+    max_shear_force=None,
+    max_bending_moment=None,
+    deflection_limit=None,
+):
+    """
+    Evaluates a contiguous chunk of the flattened grid.
+
+    Args:
+        axes (dict): Maps design variable names to arrays of values.
+        start (int): Flat index of the first design in the chunk.
+        stop (int): Flat index after the last design in the chunk.
+        top_k (int): Number of best designs to return.
+        max_shear_force (float): Maximum shear force applied to the bridge, or None for load case 2.
+        max_bending_moment (float): Maximum bending moment applied to the bridge, or None for load case 2.
+        deflection_limit (float): Largest allowed deflection in mm under load case 2, or None to skip the check.
+
+    Returns:
+        list: (FOS, flat index, governing failure mode) of the best designs in the chunk.
+    """
+    names = list(axes)
+    indices = np.unravel_index(
+        np.arange(start, stop), tuple(len(axes[name]) for name in names)
+    )
+    values = {name: axes[name][index] for name, index in zip(names, indices)}
+
+    factors, governing, within_volume = bridge.get_FOS_batch(
+        max_shear_force=max_shear_force,
+        max_bending_moment=max_bending_moment,
+        deflection_limit=deflection_limit,
+        **design_arguments(values),
+    )
+    fos = np.where(within_volume, np.min(factors, axis=1), -1)
+    instrument.count("sweep.designs", stop - start)
+
+    best = np.argsort(-fos, kind="stable")[:top_k]
+    return [(fos[i], start + i, governing[i]) for i in best]
+
+
+def describe(axes, index):
+    """
+    Finds the design variable values of a flat grid index.
+
+    Args:
+        axes (dict): Maps design variable names to arrays of values.
+        index (int): Flat index into the grid.
+
+    Returns:
+        dict: Maps design variable names to values.
+    """
+    names = list(axes)
+    position = np.unravel_index(index, tuple(len(axes[name]) for name in names))
+    return {name: axes[name][i].item() for name, i in zip(names, position)}
+
+
+def iter_sweep(spec, chunk_size=100_000, workers=None, chunk_function=None, **options):
+    """
+    Evaluates every design in a grid on a process pool, yielding the result of each chunk as it completes. At most two
+    chunks per worker are in flight, so memory stays bounded by the chunk size.
+
+    Args:
+        spec (dict): Maps design variable names to a value, a list of values, or a (start, stop[, step]) range.
+        chunk_size (int): Number of designs evaluated by each task.
+        workers (int): Number of processes. Runs in this process if 1, and on every core if None.
+        chunk_function (function): Called as chunk_function(axes, start, stop, **options) in a worker. Defaults to
+            evaluate_chunk.
+        **options: Passed to chunk_function, such as top_k, max_shear_force and max_bending_moment.
+
+    Yields:
+        tuple: (number of designs in the chunk, result of chunk_function)
+    """
+    chunk_function = chunk_function or evaluate_chunk
+    axes = grid_axes(spec)
+    total = int(np.prod([len(values) for values in axes.values()]))
+    chunks = ((start, min(start + chunk_size, total)) for start in range(0, total, chunk_size))
+
+    if workers == 1:
+        for start, stop in chunks:
+            yield stop - start, chunk_function(axes, start, stop, **options)
+        return
+
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for start, stop in chunks:
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            future = executor.submit(chunk_function, axes, start, stop, **options)
+            pending[future] = stop - start
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+def sweep(spec, top_k=10, progress=None, **kwargs):
+    """
+    Finds the designs with the highest factor of safety in a grid.
+
+    Args:
+        spec (dict): Maps design variable names to a value, a list of values, or a (start, stop[, step]) range.
+        top_k (int): Number of best designs to keep.
+        progress (function): Called with (designs evaluated, total designs) after each chunk.
+        **kwargs: Passed to iter_sweep.
+
+    Returns:
+        list: The best designs, highest FOS first, as dicts of design variables, "FOS" and "governing".
+    """
+    axes = grid_axes(spec)
+    total = int(np.prod([len(values) for values in axes.values()]))
+
+    # Min-heap of the running top-k, ties going to the lowest grid index.
+    best = []
+    evaluated = 0
+    for count, results in iter_sweep(spec, top_k=top_k, **kwargs):
+        for fos, index, governing in results:
+            entry = (fos, -index, governing)
+            if len(best) < top_k:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+        evaluated += count
+        if progress:
+            progress(evaluated, total)
+
+    return [
+        {
+            **describe(axes, -index),
+            "FOS": float(fos),
+            "governing": bridge.failure_modes[governing],
+        }
+        for fos, index, governing in sorted(best, reverse=True)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sweep bridge dimensions for the highest factor of safety."
+    )
+    for name in variables:
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=parse_range,
+            help="start:stop[:step] or a comma separated list",
+        )
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--deflection-limit", type=float, default=None, help="Largest allowed deflection in mm"
+    )
+    args = parser.parse_args(argv)
+
+    spec = {
+        name: getattr(args, name)
+        for name in variables
+        if getattr(args, name) is not None
+    }
+    progress = lambda done, total: print(f"\r{done}/{total}", end="", flush=True)
+    results = sweep(
+        spec,
+        top_k=args.top_k,
+        progress=progress,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        deflection_limit=args.deflection_limit,
+    )
+    print()
+    for result in results:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def envelope_cache_directory(tmp_path_factory):
+    # Envelopes the tests calculate are cached in a temporary directory rather than the user's cache
+    import envelope
+
+    directory = envelope.default_cache.directory
+    envelope.default_cache.directory = str(tmp_path_factory.mktemp("envelope_cache"))
+    yield
+    envelope.default_cache.directory = directory
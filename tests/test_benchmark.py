@@ -0,0 +1,25 @@
+import benchmark
+
+
+def test_missing_baseline_fails(tmp_path):
+    assert benchmark.main(["--baseline", str(tmp_path / "missing.json"), "--filter", "no workload"]) == 1
+
+
+def test_saved_baseline_passes(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    arguments = ["--baseline", path, "--filter", "get_FOS[single]", "--repeat", "1"]
+    assert benchmark.main(arguments + ["--save"]) == 0
+    assert benchmark.main(arguments + ["--threshold", "10"]) == 0
+
+
+def test_compare_reports_regressions():
+    baseline = {"workload": {"best": 1.0, "peak_memory": 100}}
+    assert benchmark.compare({"workload": {"best": 1.1, "peak_memory": 100}}, baseline) == []
+    assert benchmark.compare({"workload": {"best": 2.0, "peak_memory": 300}}, baseline) == [
+        "workload: +100% time",
+        "workload: +200% peak memory",
+    ]
+
+
+def test_agreement():
+    assert benchmark.check_agreement() == []
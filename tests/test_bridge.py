@@ -0,0 +1,125 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import bridge
+import calculate as calc
+import instrument
+import sweep
+
+loads = {"max_shear_force": 300.0, "max_bending_moment": 80.0}
+
+
+def random_designs(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "top_flange_width": rng.uniform(90, 150, size),
+        "web_height": rng.uniform(20, 140, size),
+        "top_flange_layers": rng.integers(1, 5, size),
+        "diaphragm_num": rng.integers(1, 6, size),
+        "glue_width": rng.uniform(5, 15, size),
+    }
+
+
+def test_section_sums_agree_with_cross_section():
+    for top_flange_width, web_height, top_flange_layers in [(100, 75, 1), (125, 96.19, 2), (150, 30, 4)]:
+        components = calc.generate_cross_section(top_flange_width, web_height, top_flange_layers)
+        cross_section = calc.CrossSection.from_components(components)
+        area, axis, second_moment_area, top = calc.section_sums(components)
+        assert area == pytest.approx(cross_section.area, rel=1e-12)
+        assert axis == pytest.approx(cross_section.centroidal_axis, rel=1e-12)
+        assert second_moment_area == pytest.approx(cross_section.second_moment_area, rel=1e-12)
+        assert top == cross_section.top
+        # The list functions return plain floats, so printed lists of them read like the original output
+        assert type(calc.centroidal_axis(components)) is float
+        assert type(calc.second_moment_area(components, axis)) is float
+
+        cuts = (axis, calc.th + web_height)
+        np.testing.assert_allclose(
+            calc.first_moment_sums(components, axis, cuts), cross_section.first_moment_area(cuts, axis), rtol=1e-12
+        )
+
+
+def test_shear_flow_profile_agrees_with_get_FOS():
+    top_flange_width, web_height, top_flange_layers, glue_width = 120, 80, 2, 10
+    cross_section = calc.CrossSection.from_dimensions(
+        top_flange_width, web_height, top_flange_layers, split_layers=True, glue_width=glue_width
+    )
+    profile = cross_section.shear_flow_profile(loads["max_shear_force"])
+    np.testing.assert_allclose(profile["Q"], cross_section.first_moment_area(profile["y"]), rtol=1e-9, atol=1e-9)
+
+    # The webs are the narrowest part at the centroid, where Q peaks, so the critical plane is there
+    section = bridge.section_terms(top_flange_width, web_height, top_flange_layers, glue_width)
+    _, _, max_shear, glue_shear = bridge.stress_terms(section, **loads, glue_width=glue_width)
+    assert profile["critical_y"] == pytest.approx(cross_section.centroidal_axis)
+    assert profile["max_shear_stress"] == pytest.approx(max_shear)
+
+    # Joints: bottom flange to webs, webs and glue tabs to the top flange, and between the two flange layers
+    joints = profile["glue_joints"]
+    assert [joint["y"] for joint in joints] == pytest.approx([calc.th, calc.th + web_height, 2 * calc.th + web_height])
+    assert [joint["b"] for joint in joints] == pytest.approx([2 * calc.th, 2 * glue_width, top_flange_width])
+    assert joints[1]["shear_stress"] == pytest.approx(glue_shear)
+
+
+def test_get_FOS_agrees_with_get_FOS_batch():
+    designs = random_designs(50)
+    factors, _, within_volume = bridge.get_FOS_batch(**designs, **loads)
+    for i in range(50):
+        design = {name: values[i].item() for name, values in designs.items()}
+        np.testing.assert_allclose(bridge.get_FOS(**design, **loads, return_min=False), factors[i], rtol=1e-9)
+        expected = factors[i].min() if within_volume[i] else -1
+        assert bridge.get_FOS(**design, **loads) == pytest.approx(expected, rel=1e-9)
+
+
+def test_main_reports_timings_when_the_command_fails(monkeypatch, tmp_path, capsys):
+    def fail(args):
+        with instrument.span("failing stage"):
+            raise RuntimeError("failed")
+
+    monkeypatch.setattr(bridge, "run_fos", fail)
+    trace = tmp_path / "trace.json"
+    with pytest.raises(RuntimeError):
+        bridge.main(["--timings", "--trace", str(trace), "fos"])
+
+    assert not instrument.enabled
+    assert "failing stage" in capsys.readouterr().out
+    assert trace.exists()
+
+
+def test_glue_width_defaults_follow_design0(monkeypatch):
+    monkeypatch.setattr(calc, "glue_width", calc.glue_width)
+    monkeypatch.setattr(calc, "bottom_flange_width", calc.bottom_flange_width)
+    calc.design0()
+    design = {"top_flange_width": 100, "web_height": 75, "top_flange_layers": 1, "diaphragm_num": 2}
+    explicit = {**design, "glue_width": calc.glue_width}
+
+    assert bridge.get_FOS(**design, **loads) == bridge.get_FOS(**explicit, **loads)
+    np.testing.assert_array_equal(
+        bridge.get_FOS_batch(**design, **loads)[0], bridge.get_FOS_batch(**explicit, **loads)[0]
+    )
+    assert sweep.design_defaults()["glue_width"] == calc.glue_width
+
+
+def test_importing_bridge_does_no_work(tmp_path):
+    # A fresh interpreter, since the tests have already imported everything
+    code = "import sys, bridge; print(sorted(m for m in ('sympy', 'matplotlib', 'graphs') if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, "ENVELOPE_CACHE_DIR": str(tmp_path / "cache")},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+    # No envelope was calculated or cached
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_fos_command_reports_both_load_cases(capsys):
+    bridge.main(["fos"])
+    output = capsys.readouterr().out
+    assert "Load Case 1:" in output and "Load Case 2:" in output
+    assert bridge.max_shear_force == bridge.load_case_envelope(2)["shear"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import calculate as calc
+
+
+def test_extrema_of_a_sympy_expression_match_substitution():
+    x = calc.symbol()
+    expr = x**3 - 3 * x
+    critical_values = [2, -2, 1, -1, 0, 1]
+    values = [float(expr.subs(x, value)) for value in critical_values]
+
+    max_position, max_value, min_position, min_value = calc.extrema(critical_values, expr)
+    assert max_value == max(values) and min_value == min(values)
+    # Ties go to the smallest critical value
+    assert (max_position, min_position) == (-1, -2)
+    assert calc.max_expression(critical_values, expr) == (-1, 2)
+
+
+def test_extrema_of_a_function_row_by_row():
+    critical_values = np.array([[0.0, 1.0, 2.0], [3.0, 4.0, 5.0]])
+    max_position, max_value, min_position, min_value = calc.extrema(critical_values, lambda x: -((x - 4) ** 2))
+    np.testing.assert_array_equal(max_position, [2, 4])
+    np.testing.assert_array_equal(max_value, [-4, 0])
+    np.testing.assert_array_equal(min_position, [0, 3])
+    np.testing.assert_array_equal(min_value, [-16, -1])
+
+
+def test_max_expression_when_every_value_is_negative():
+    assert calc.max_expression([1, 2, 3], lambda x: -x) == (1, -1)
+    # A constant expression is the same at every critical value
+    assert calc.max_expression([1, 2, 3], calc.symbol() * 0 - 5) == (1, -5)
+    with pytest.raises(ValueError):
+        calc.extrema([], lambda x: x)
+
+
+def test_two_span_reactions_match_textbook_values():
+    # Supports at 0, 1 and 2 m. Reactions act against the loads, so they are negative.
+    supports = np.array([0.0, 1.0, 2.0])
+    no_points, no_segments = np.zeros((1, 0)), np.zeros((1, 0))
+
+    # 10 N/m over both spans
+    reactions = calc.solve_reactions(
+        supports, no_points, no_points, np.array([[0.0]]), np.array([[2.0]]), np.array([10.0])
+    )
+    np.testing.assert_allclose(-reactions, [[3 / 8 * 10, 10 / 8 * 10, 3 / 8 * 10]])
+
+    # 1 N in the middle of each span, as two load positions solved together
+    reactions = calc.solve_reactions(
+        supports, np.array([[0.5], [1.5]]), np.array([[1.0], [1.0]]), no_segments, no_segments, np.zeros(0)
+    )
+    np.testing.assert_allclose(-reactions, [[13 / 32, 11 / 16, -3 / 32], [-3 / 32, 11 / 16, 13 / 32]], atol=1e-12)
+
+    with pytest.raises(ValueError):
+        calc.solve_reactions(np.array([0.0, 0.0]), no_points, no_points, no_segments, no_segments, np.zeros(0))
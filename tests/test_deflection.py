@@ -0,0 +1,30 @@
+import pytest
+import deflection
+
+span = 1200  # mm
+force = 10  # N
+
+
+def midspan_deflection(position):
+    # Deflection at the middle of a simply supported span with EI = 1, under a point load past the middle at position m
+    b = span - position * 1e3
+    x = span / 2
+    return force * b * x * (span**2 - b**2 - x**2) / (6 * span)
+
+
+def envelope(position, num_length_positions=1001):
+    loads = [["reaction", 0], ["point", 0, force], ["reaction", span / 1e3]]
+    return deflection.deflection_envelope(loads, position, position, 1, num_length_positions)
+
+
+def test_midspan_point_load_matches_PL3_over_48EI():
+    result = envelope(span / 2e3)
+    assert result["max_midspan_deflection"] == pytest.approx(force * span**3 / 48, rel=1e-12)
+    assert result["max_deflection"] == pytest.approx(force * span**3 / 48, rel=1e-12)
+
+
+def test_loads_between_stations_converge():
+    # 0.61 m is not on a station of 1001 lengths over 1.2 m
+    expected = midspan_deflection(0.61)
+    assert envelope(0.61)["max_midspan_deflection"] == pytest.approx(expected, rel=1e-3)
+    assert envelope(0.61, 10001)["max_midspan_deflection"] == pytest.approx(expected, rel=1e-5)
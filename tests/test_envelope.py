@@ -0,0 +1,226 @@
+import copy
+import os
+
+import numpy as np
+import pytest
+import calculate as calc
+import envelope as envelope_module
+from envelope import EnvelopeCache, compute_envelope, load_cases, load_envelope, reference_files, save_envelope
+
+# Load cases every per-position engine supports, including distributed loads that start and stop between supports.
+# 250 stations keep the stations off the load positions, where each engine rounds the jump differently.
+load_case_variants = {
+    "train": load_cases[2],
+    "distributed": {
+        "loads": [["reaction", 0], ["distributed", 0.2, 30], ["distributed", 0.7, 0], ["reaction", 1.2]],
+        "start": -0.1,
+        "stop": 0.1,
+        "num_load_positions": 5,
+        "num_length_positions": 250,
+    },
+    "point_and_distributed": {
+        "loads": [
+            ["reaction", 0],
+            ["point", 0.3, 20],
+            ["distributed", 0.4, 30],
+            ["distributed", 0.8, 0],
+            ["reaction", 1.2],
+        ],
+        "start": -0.1,
+        "stop": 0.1,
+        "num_load_positions": 5,
+        "num_length_positions": 250,
+    },
+}
+
+
+def envelope(case, engine):
+    return compute_envelope(
+        copy.deepcopy(case["loads"]),
+        case["start"],
+        case["stop"],
+        case["num_load_positions"],
+        case["num_length_positions"],
+        engine,
+    )
+
+
+@pytest.mark.parametrize("name", load_case_variants)
+@pytest.mark.parametrize("engine", ["numpy", "sympy"])
+def test_engines_agree_with_batched(name, engine):
+    case = load_case_variants[name]
+    if engine == "sympy" and name == "train":
+        case = {**case, "num_load_positions": 5, "num_length_positions": 250}
+    expected = envelope(case, "batched")
+    result = envelope(case, engine)
+
+    for key in ("shear_force_envelope", "bending_moment_envelope"):
+        np.testing.assert_allclose(
+            np.asarray(result[key], dtype=float), np.asarray(expected[key], dtype=float), rtol=1e-9, atol=1e-9
+        )
+    for key in ("shear", "moment"):
+        assert float(result[key]) == pytest.approx(float(expected[key]), rel=1e-9)
+
+
+def test_distributed_load_hand_calculation():
+    # 15 N spread over 0.2 to 0.7 m of a 1.2 m span
+    case = {**load_case_variants["distributed"], "start": 0, "stop": 0, "num_load_positions": 1}
+    for engine in ("batched", "numpy"):
+        result = envelope(case, engine)
+        assert float(result["shear"]) == pytest.approx(9.375)
+        assert float(result["moment"]) == pytest.approx(9.375 * 0.5125 - 30 * 0.3125**2 / 2)
+
+
+def test_influence_lines_agree_with_batched():
+    case = load_case_variants["train"]
+    result = envelope(case, "influence")
+    x_vals = np.asarray(result["x"], dtype=float)
+    stations = np.arange(len(x_vals))
+
+    def batched_at(positions):
+        # The batched engine's shear force and bending moment at each station for its own load position
+        matrices = calc.load_matrices(copy.deepcopy(case["loads"]), np.clip(positions, case["start"], case["stop"]))
+        shear_forces, bending_moments = calc.evaluate_loads(*matrices, x_vals)
+        return shear_forces[stations, stations], bending_moments[stations, stations]
+
+    # At the load positions the influence lines find, the batched engine gives the same envelopes. Shear force jumps
+    # where a load sits on the station, so it is taken just either side of the position.
+    moment_positions = np.asarray(result["bending_moment_position"], dtype=float)
+    np.testing.assert_allclose(
+        np.maximum(batched_at(moment_positions)[1], 0),
+        np.asarray(result["bending_moment_envelope"], dtype=float),
+        rtol=1e-9,
+        atol=1e-9,
+    )
+    shear_positions = np.asarray(result["shear_force_position"], dtype=float)
+    sides = np.array([batched_at(shear_positions + side)[0] for side in (-1e-9, 1e-9)])
+    np.testing.assert_allclose(
+        sides[np.argmax(np.abs(sides), axis=0), stations],
+        np.asarray(result["shear_force_envelope"], dtype=float),
+        atol=1e-6,
+    )
+
+    # Sampled load positions approach the exact largest values from below
+    for num_load_positions, tolerance in ((50, 1e-2), (3441, 1e-3)):
+        expected = envelope({**case, "num_load_positions": num_load_positions}, "batched")
+        for key in ("shear", "moment"):
+            assert float(expected[key]) <= float(result[key]) * (1 + 1e-12)
+            assert float(expected[key]) == pytest.approx(float(result[key]), rel=tolerance)
+
+
+def test_generate_envelop_defaults_to_batched():
+    case = load_case_variants["point_and_distributed"]
+    arguments = (case["start"], case["stop"], case["num_load_positions"])
+    default = calc.generate_envelop(*arguments, copy.deepcopy(case["loads"]), case["num_length_positions"])[3]
+    batched = calc.generate_envelop_batched(*arguments, copy.deepcopy(case["loads"]), case["num_length_positions"])[3]
+    assert default["shear"] == batched["shear"]
+    assert default["moment"] == batched["moment"]
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, mmap):
+    data = envelope(load_case_variants["point_and_distributed"], "batched")
+    path = str(tmp_path / "case.envelope")
+    save_envelope(path, data, load_case=3, engine="batched")
+    loaded = load_envelope(path, mmap=mmap)
+
+    for key in ("x", "shear_force_envelope", "bending_moment_envelope"):
+        np.testing.assert_array_equal(loaded[key], np.asarray(data[key], dtype=float))
+    assert loaded["shear"] == float(data["shear"])
+    assert loaded["moment"] == float(data["moment"])
+    assert loaded["metadata"] == {"load_case": 3, "engine": "batched"}
+
+
+@pytest.mark.parametrize("load_case", load_cases)
+def test_reference_envelopes_agree_with_batched(load_case, monkeypatch, tmp_path):
+    # Reference files are found from any working directory
+    monkeypatch.chdir(tmp_path)
+    reference = load_envelope(reference_files[load_case])
+    result = envelope(load_cases[load_case], "batched")
+    np.testing.assert_allclose(
+        np.asarray(result["bending_moment_envelope"], dtype=float), reference["bending_moment_envelope"], atol=1e-9
+    )
+    assert float(result["moment"]) == pytest.approx(reference["moment"], rel=1e-9)
+
+
+def adaptive(case, **kwargs):
+    return calc.generate_envelop_adaptive(
+        case["start"], case["stop"], case["num_load_positions"], copy.deepcopy(case["loads"]),
+        case["num_length_positions"], **kwargs
+    )[3]
+
+
+def test_adaptive_envelope_is_within_its_relative_tolerance():
+    case = load_cases[2]
+    data = adaptive(case, envelope_tolerance=1e-2)
+    assert float(data["envelope_error_bound"]) <= 1e-2
+    dense = envelope({**case, "num_load_positions": 2000}, "batched")
+    for key, largest in (("shear_force_envelope", "shear"), ("bending_moment_envelope", "moment")):
+        error = np.abs(np.abs(np.asarray(data[key], dtype=float)) - np.abs(np.asarray(dense[key], dtype=float)))
+        assert np.max(error) <= 1e-2 * float(dense[largest])
+
+
+def test_adaptive_warns_when_it_does_not_converge():
+    with pytest.warns(RuntimeWarning, match="max_evaluations=100"):
+        data = adaptive(load_cases[2], envelope_tolerance=1e-4, max_evaluations=100)
+    assert int(data["evaluations"]) == 100
+
+
+def cached(cache, case, **options):
+    return cache.get(
+        copy.deepcopy(case["loads"]),
+        case["start"],
+        case["stop"],
+        case["num_load_positions"],
+        case["num_length_positions"],
+        **options,
+    )
+
+
+def test_cache_round_trip(tmp_path):
+    case = load_case_variants["point_and_distributed"]
+    first = cached(EnvelopeCache(str(tmp_path)), case)
+    # A new cache on the same directory reads the file instead of calculating
+    cache = EnvelopeCache(str(tmp_path))
+    second = cached(cache, case)
+    assert cache.stats()["disk_hits"] == 1
+    assert cached(cache, case) is second
+    assert cache.stats()["hits"] == 1
+    for key in ("x", "shear_force_envelope", "bending_moment_envelope"):
+        np.testing.assert_array_equal(second[key], first[key])
+    assert second["moment"] == first["moment"]
+
+
+def test_cache_evicts_the_least_recently_used_files(tmp_path):
+    cache = EnvelopeCache(str(tmp_path), max_entries=1)
+    case = load_case_variants["point_and_distributed"]
+    cached(cache, case)
+    size = sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+    cache.max_bytes = int(size * 1.5)
+
+    cached(cache, {**case, "num_length_positions": 251})
+    assert len(os.listdir(tmp_path)) == 1
+    # The first envelope was evicted from disk and memory, so it is calculated again
+    cached(cache, case)
+    assert cache.stats()["misses"] == 3
+
+
+def test_adaptive_options_are_part_of_the_key(tmp_path):
+    cache = EnvelopeCache(str(tmp_path))
+    case = load_cases[2]
+    cached(cache, case, engine="adaptive")
+    cached(cache, case, engine="adaptive", tolerance=1e-3)
+    assert cache.stats()["misses"] == 1
+    loose = cached(cache, case, engine="adaptive", envelope_tolerance=1e-1)
+    assert cache.stats()["misses"] == 2
+    assert loose["metadata"]["key"] != cached(cache, case, engine="adaptive")["metadata"]["key"]
+    with pytest.raises(ValueError):
+        cached(cache, case, engine="batched", tolerance=1e-3)
+
+
+def test_default_cache_directory_is_outside_the_tree(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENVELOPE_CACHE_DIR", str(tmp_path / "override"))
+    assert envelope_module.default_cache_directory() == str(tmp_path / "override")
+    monkeypatch.delenv("ENVELOPE_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert envelope_module.default_cache_directory().startswith(str(tmp_path / "xdg"))
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+import graphs
+
+
+def square_plots(count):
+    x = np.linspace(0, 1, 20)
+    return [
+        dict(expr=x**2, symbol=x, save_path=os.path.join("img", f"plot_{i}.png"), x_axis_label="x")
+        for i in range(count)
+    ]
+
+
+def test_unchanged_plots_are_skipped(tmp_path):
+    plots = square_plots(2)
+    assert graphs.render_plots(plots, workers=1, output_directory=str(tmp_path)) == (2, 0)
+    assert graphs.render_plots(plots, workers=1, output_directory=str(tmp_path)) == (0, 2)
+    plots[1]["expr"] = plots[1]["symbol"] ** 3
+    assert graphs.render_plots(plots, workers=1, output_directory=str(tmp_path)) == (1, 1)
+    # Only the images are written among the images
+    assert sorted(os.listdir(tmp_path / "img")) == ["plot_0.png", "plot_1.png"]
+    assert (tmp_path / graphs.manifest_name).exists()
+
+
+def test_images_and_manifest_do_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    output = str(tmp_path / "output")
+    plots = square_plots(1)
+    for directory, expected in (("first", (1, 0)), ("second", (0, 1))):
+        (tmp_path / directory).mkdir()
+        monkeypatch.chdir(tmp_path / directory)
+        assert graphs.render_plots(plots, workers=1, output_directory=output) == expected
+        assert os.listdir(tmp_path / directory) == []
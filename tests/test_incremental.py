@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import bridge
+import incremental
+
+loads = {"max_shear_force": 300.0, "max_bending_moment": 80.0}
+design = {"top_flange_width": 100, "web_height": 73.73, "top_flange_layers": 1, "diaphragm_num": 2}
+
+
+def random_designs(size, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "top_flange_width": rng.uniform(90, 150, size),
+        "web_height": rng.uniform(20, 140, size),
+        "top_flange_layers": rng.integers(1, 5, size),
+        "diaphragm_num": rng.integers(1, 6, size),
+        "glue_width": rng.uniform(5, 15, size),
+    }
+
+
+@pytest.mark.parametrize("deflection_limit", [None, 30])
+def test_factors_agree_with_get_FOS(deflection_limit):
+    graph = incremental.FOSGraph(**design, **loads, deflection_limit=deflection_limit)
+    expected = bridge.get_FOS(**design, **loads, deflection_limit=deflection_limit, return_min=False)
+    assert len(graph.factors()) == len(expected)
+    np.testing.assert_allclose(graph.factors(), expected, rtol=1e-12)
+    assert graph.FOS() == pytest.approx(bridge.get_FOS(**design, **loads, deflection_limit=deflection_limit))
+
+
+@pytest.mark.parametrize("deflection_limit", [None, 30])
+def test_factors_agree_with_get_FOS_batch(deflection_limit):
+    designs = random_designs(200)
+    graph = incremental.FOSGraph(**designs, **loads, deflection_limit=deflection_limit)
+    factors, _, within_volume = bridge.get_FOS_batch(**designs, **loads, deflection_limit=deflection_limit)
+    np.testing.assert_allclose(np.stack(np.broadcast_arrays(*graph.factors()), axis=-1), factors, rtol=1e-12)
+    np.testing.assert_array_equal(bridge.within_volume(graph["volume"]), within_volume)
+
+
+def test_changes_only_recalculate_downstream_nodes():
+    graph = incremental.FOSGraph(**design, **loads)
+    graph.FOS()
+    assert all(count == 1 for count in graph.evaluations.values())
+
+    changed = {name: value * 2 for name, value in loads.items()}
+    assert graph.FOS(**changed) == pytest.approx(bridge.get_FOS(**design, **changed))
+    recalculated = {name for name, count in graph.evaluations.items() if count == 2}
+    assert recalculated == {"stresses", "strength_factors", "plate_buckling_factors", "shear_buckling_factor"}
+    # what_if leaves the graph as it was
+    assert graph.FOS() == pytest.approx(bridge.get_FOS(**design, **loads))
+    assert max(graph.evaluations.values()) == 2
+
+
+def test_a_diaphragm_change_does_not_recalculate_the_section_or_stresses():
+    graph = incremental.FOSGraph(**design, **loads)
+    graph.FOS()
+    for diaphragm_num in (3, 4):
+        fos = graph.FOS(diaphragm_num=diaphragm_num)
+        assert fos == pytest.approx(bridge.get_FOS(**{**design, "diaphragm_num": diaphragm_num}, **loads))
+    graph.update(diaphragm_num=4)
+    assert graph.FOS() == pytest.approx(bridge.get_FOS(**{**design, "diaphragm_num": 4}, **loads))
+
+    evaluations = graph.evaluations
+    for name in ("section", "stresses", "plate_buckling", "strength_factors", "plate_buckling_factors"):
+        assert evaluations[name] == 1
+    # The update reuses the nodes the second what_if calculated
+    for name in ("shear_buckling", "shear_buckling_factor", "volume"):
+        assert evaluations[name] == 3
+
+
+def test_coordinate_descent_improves_the_design():
+    graph = incremental.FOSGraph(**design, **loads)
+    start = graph.FOS()
+    best, trials = incremental.coordinate_descent(graph, max_rounds=5)
+    assert trials > 0
+    assert best > start
+    final = {name: graph.values[name] for name in design}
+    assert best == pytest.approx(bridge.get_FOS(**final, **loads))
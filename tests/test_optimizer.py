@@ -0,0 +1,64 @@
+import numpy as np
+import bridge
+import optimizer
+import sweep
+
+names = ["top_flange_width", "total_height", "top_flange_layers", "diaphragm_num", "glue_width"]
+
+
+def test_upper_bound_holds_for_every_design_in_a_box():
+    rng = np.random.default_rng(0)
+    lower, upper = np.array([100, 20, 1, 1, 5.0]), np.array([150, 140, 5, 5, 15.0])
+    for trial in range(40):
+        a = lower + rng.random(5) * (upper - lower)
+        b = a + rng.random(5) * (upper - lower) * (0.02 if trial % 2 else 1)
+        box_lower, box_upper = np.minimum(a, b), np.minimum(np.maximum(a, b), upper)
+        box_lower[2:4], box_upper[2:4] = np.floor(box_lower[2:4]), np.ceil(box_upper[2:4])
+        fos_bound, volume_bound = optimizer.FOS_upper_bound(
+            *optimizer.design_box(names, {}, box_lower[None], box_upper[None])
+        )
+
+        points = box_lower + rng.random((500, 5)) * (box_upper - box_lower)
+        points[:, 2:4] = np.round(points[:, 2:4])
+        points = np.vstack((points, box_lower, box_upper))
+        design = sweep.design_arguments({name: points[:, i] for i, name in enumerate(names)})
+        factors, _, _ = bridge.get_FOS_batch(**design)
+        _, volume = bridge.get_FOS_terms(**design, max_shear_force=None, max_bending_moment=None)
+        assert factors.min(axis=1).max() <= fos_bound[0] * (1 + 1e-12)
+        assert volume.min() >= volume_bound[0] * (1 - 1e-12)
+
+
+def test_optimize_beats_the_grid_with_fewer_evaluations():
+    # The grid of the original search, 4500 designs
+    spec = {
+        "total_height": list(range(20, 121, 20)),
+        "top_flange_layers": list(range(1, 6)),
+        "top_flange_width": list(range(100, 150)),
+        "diaphragm_num": list(range(1, 4)),
+    }
+    best = sweep.sweep(spec, top_k=1, workers=1)[0]
+    result = optimizer.optimize({name: (min(values), max(values)) for name, values in spec.items()}, gap=1e-2)
+
+    assert result["FOS"] >= best["FOS"]
+    assert result["upper_bound"] <= result["FOS"] * (1 + 1e-2)
+    # About 580 designs evaluated and boxes bounded, against 4500 for the grid
+    assert result["evaluations"] + result["bounds"] <= 6 * 5 * 50 * 3 / 7
+
+
+def test_within_volume_box_keeps_every_design_within_the_limit():
+    rng = np.random.default_rng(1)
+    lower, upper = np.array([100, 20, 1, 1, 5.0]), np.array([150, 140, 5, 5, 15.0])
+    a = lower + rng.random((40, 5)) * (upper - lower)
+    b = lower + rng.random((40, 5)) * (upper - lower)
+    box_lower, box_upper = np.minimum(a, b), np.maximum(a, b)
+    box_lower[:, 2:4], box_upper[:, 2:4] = np.floor(box_lower[:, 2:4]), np.ceil(box_upper[:, 2:4])
+    is_integer = np.isin(names, optimizer.integer_variables)
+    tightened = optimizer.within_volume_box(names, {}, box_lower, box_upper, is_integer)
+    assert np.all(tightened <= box_upper) and np.any(tightened < box_upper)
+
+    for low, high, new_high in zip(box_lower, box_upper, tightened):
+        points = low + rng.random((500, 5)) * (high - low)
+        points[:, 2:4] = np.round(points[:, 2:4])
+        design = sweep.design_arguments({name: points[:, i] for i, name in enumerate(names)})
+        _, _, within_volume = bridge.get_FOS_batch(**design)
+        assert np.all(points[within_volume] <= new_high)
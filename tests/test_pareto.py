@@ -0,0 +1,42 @@
+import numpy as np
+from pareto import ParetoFront, train_weight
+
+
+def brute_force_front(fos, volume):
+    # A design is kept unless another has at least its FOS with at most its volume, and is better in one of them
+    return {
+        i
+        for i in range(len(fos))
+        if not np.any((fos >= fos[i]) & (volume <= volume[i]) & ((fos > fos[i]) | (volume < volume[i])))
+    }
+
+
+def test_batched_updates_keep_exactly_the_non_dominated_designs(tmp_path):
+    rng = np.random.default_rng(0)
+    fos, volume = rng.random(400), rng.random(400)
+    front = ParetoFront(["index"])
+    joined = sum(front.update(fos[i : i + 50], volume[i : i + 50], np.arange(i, i + 50)) for i in range(0, 400, 50))
+
+    assert {int(index) for index in front.designs[:, 0]} == brute_force_front(fos, volume)
+    assert joined >= len(front)
+    assert np.all(np.diff(front.volume) > 0) and np.all(np.diff(front.fos) > 0)
+    np.testing.assert_allclose(front.max_load, front.fos * train_weight)
+
+    path = str(tmp_path / "front.npz")
+    front.save(path)
+    loaded = ParetoFront.load(path)
+    assert loaded.names == ["index"]
+    np.testing.assert_array_equal(loaded.designs, front.designs)
+
+
+def test_dominated():
+    front = ParetoFront(["index"])
+    assert not front.dominated(np.array([1.0]), np.array([1.0])).any()
+    assert front.update([1.0, 2.0], [10.0, 20.0], [[0], [1]]) == 2
+
+    fos = np.array([0.5, 1.0, 1.5, 1.5, 2.5, 3.0])
+    volume = np.array([10.0, 10.0, 15.0, 25.0, 20.0, 5.0])
+    np.testing.assert_array_equal(front.dominated(fos, volume), [True, True, False, True, False, False])
+    # A design equal to one on the front adds nothing
+    assert front.update([2.0], [20.0], [[2]]) == 0
+    assert len(front) == 2
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import bridge
+import calculate as calc
+import reliability
+
+design = {"top_flange_width": 118, "web_height": 115, "top_flange_layers": 2, "diaphragm_num": 1}
+loads = {"max_shear_force": 300.0, "max_bending_moment": 80.0}
+
+
+def test_sampled_thickness_moves_the_dependent_geometry(monkeypatch):
+    factors = reliability.evaluate_samples(
+        {**design, "glue_width": calc.glue_width}, {"th": ("fixed", 1.5)}, np.random.default_rng(0), 3, **loads
+    )
+
+    # The same design built with th set to the sampled value
+    monkeypatch.setattr(calc, "th", 1.5)
+    monkeypatch.setattr(calc, "bottom_flange_width", 1.5 + 65)
+    expected = bridge.get_FOS_batch(**design, **loads)[0][0]
+    np.testing.assert_allclose(factors, np.tile(expected, (3, 1)), rtol=1e-12)
+
+
+def test_simulate_returns_plain_floats():
+    result = reliability.simulate(design, num_samples=2000, chunk_size=500)
+    assert type(result["probability_of_system_failure"]) is float
+    assert type(result["standard_error"]) is float
+    assert 0 <= result["probability_of_system_failure"] <= 1
+    assert sum(result["governing"].values()) == pytest.approx(1)
@@ -0,0 +1,72 @@
+import json
+import multiprocessing
+
+import pytest
+import calculate as calc
+import runner
+
+design = {"top_flange_width": 100, "web_height": 73.73, "top_flange_layers": 1, "diaphragm_num": 2, "glue_width": 6.27}
+
+
+def write_cases(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            loads = [["reaction", 0], ["point", 0.3 + i * 0.01, 50 + i], ["reaction", 1.2]]
+            f.write(json.dumps({"id": f"case-{i}", "loads": loads, "num_length_positions": 100}) + "\n")
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_after_a_partly_written_record(tmp_path):
+    cases, output = str(tmp_path / "cases.jsonl"), str(tmp_path / "results.jsonl")
+    write_cases(cases, 10)
+    assert runner.run_file(cases, output, design, resume=False) == 10
+    expected = read_records(output)
+
+    # A crash after 4 complete records and part of the fifth
+    with open(output, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(output, "w", encoding="utf-8") as f:
+        f.writelines(lines[:4])
+        f.write(lines[4][:10])
+
+    assert runner.run_file(cases, output, design) == 6
+    assert read_records(output) == expected
+    assert runner.run_file(cases, output, design) == 0
+
+
+@pytest.fixture
+def spawned_workers():
+    method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    yield
+    multiprocessing.set_start_method(method, force=True)
+
+
+def test_workers_use_design0_constants(tmp_path, monkeypatch, spawned_workers):
+    monkeypatch.setattr(calc, "glue_width", calc.glue_width)
+    monkeypatch.setattr(calc, "bottom_flange_width", calc.bottom_flange_width)
+    calc.design0()
+    path = str(tmp_path / "cases.jsonl")
+    write_cases(path, 4)
+    cases = list(runner.read_cases(path))
+
+    # Spawned workers import calculate afresh, so only the initializer gives them design 0's bottom flange
+    expected = list(runner.run_cases(cases, design))
+    assert list(runner.run_cases(cases, design, workers=2, batch_size=1, design0=True)) == expected
+
+
+def test_a_case_without_shear_or_moment_is_an_error_record(tmp_path):
+    cases, output = str(tmp_path / "cases.jsonl"), str(tmp_path / "results.jsonl")
+    with open(cases, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"loads": [["reaction", 0], ["point", 0, 10], ["reaction", 1.2]]}) + "\n")
+        f.write(json.dumps({"loads": [["reaction", 0], ["point", 0.6, 10], ["reaction", 1.2]]}) + "\n")
+
+    assert runner.run_file(cases, output, design) == 2
+    first, second = read_records(output)
+    assert first["error"].startswith("ZeroDivisionError")
+    assert "FOS" not in first
+    assert second["FOS"] > 0
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+from sensitivity import sensitivities, variables
+
+design = {"top_flange_width": 125.0, "web_height": 95.0, "top_flange_layers": 2.0, "glue_width": 12.0}
+
+
+@pytest.mark.parametrize("variable", ["top_flange_width", "web_height", "glue_width", "top_flange_layers"])
+def test_jacobian_matches_finite_differences(variable):
+    step = 1e-6
+    factors, jacobian, volume, volume_gradient = sensitivities(**design, diaphragm_num=3)
+    stepped = {**design, variable: design[variable] + step}
+    factors_step, _, volume_step, _ = sensitivities(**stepped, diaphragm_num=3)
+
+    column = variables.index(variable)
+    np.testing.assert_allclose(jacobian[0, :, column], (factors_step - factors)[0] / step, rtol=1e-4, atol=1e-8)
+    assert volume_gradient[0, column] == pytest.approx((volume_step - volume)[0] / step, rel=1e-4)
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+import pytest
+import service
+
+design = {"top_flange_width": 118, "total_height": 120, "top_flange_layers": 2, "diaphragm_num": 1}
+
+
+def run_service(test):
+    async def main():
+        server = service.Service()
+        port = (await server.start(port=0)).sockets[0].getsockname()[1]
+        try:
+            return await test(port)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+async def send_raw(port, data):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"GARBAGE\r\n\r\n",
+        b"POST /fos HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+        b"POST /fos HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+    ],
+)
+def test_malformed_requests_are_answered_with_400(data):
+    response = run_service(lambda port: send_raw(port, data))
+    assert response.startswith(b"HTTP/1.1 400 Bad Request")
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"max_shear_force": float("nan")},
+        {"max_bending_moment": float("inf")},
+        {"max_bending_moment": -5},
+        {"top_flange_width": 0},
+        {"load_case": 3},
+        {"load_case": True},
+        {"top_flange_layers": True},
+        {"diaphragm_num": "2"},
+        {"total_height": 2},
+        {"web_height": 100},
+        {"unknown": 1},
+    ],
+)
+def test_invalid_fields_are_answered_with_400(fields):
+    async def test(port):
+        client = service.Client(port=port)
+        try:
+            return await client.call("POST", "/fos", {**design, **fields})
+        finally:
+            await client.close()
+
+    status, response = run_service(test)
+    assert status == 400
+    assert "error" in response
+
+
+def test_null_loads_take_the_load_case_defaults():
+    async def test(port):
+        client = service.Client(port=port)
+        try:
+            default = await client.call("POST", "/fos", design)
+            null = await client.call("POST", "/fos", {**design, "max_shear_force": None, "max_bending_moment": None})
+            return default, null
+        finally:
+            await client.close()
+
+    (default_status, default), (null_status, null) = run_service(test)
+    assert default_status == null_status == 200
+    assert null == default
+
+
+def test_stop_fails_queued_and_running_requests():
+    started, release = threading.Event(), threading.Event()
+
+    def evaluate(requests):
+        started.set()
+        release.wait(5)
+        return requests
+
+    async def main():
+        batcher = service.MicroBatcher(evaluate, max_batch_size=1, max_delay=0)
+        batcher.start()
+        running = asyncio.ensure_future(batcher.submit(1))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        stopping = asyncio.ensure_future(batcher.stop())
+        await asyncio.sleep(0)
+        release.set()
+        await stopping
+        results = await asyncio.gather(running, queued, return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(3)
+        return results
+
+    results = asyncio.run(asyncio.wait_for(main(), 10))
+    assert all(isinstance(result, RuntimeError) for result in results)
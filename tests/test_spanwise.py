@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+import bridge
+import calculate as calc
+import spanwise
+import sweep
+
+x_vals = np.linspace(0, calc.bridge_length / 1000, 101)
+# A made-up envelope whose largest shear force and bending moment are at different stations
+envelope = {
+    "x": x_vals,
+    "shear_force_envelope": 250 * np.cos(np.pi * x_vals / x_vals[-1]),
+    "bending_moment_envelope": 70 * np.sin(np.pi * x_vals / x_vals[-1]),
+}
+
+
+def test_uniform_section_agrees_with_get_FOS():
+    design = bridge.final_design
+    result = spanwise.spanwise_FOS([{"start": 0, "end": calc.bridge_length}], design, envelope=envelope)
+    expected = bridge.get_FOS(
+        **sweep.design_arguments(design),
+        max_shear_force=np.max(np.abs(envelope["shear_force_envelope"])),
+        max_bending_moment=np.max(envelope["bending_moment_envelope"]),
+        return_min=False,
+    )
+    np.testing.assert_allclose([result["min_FOS"][mode] for mode in spanwise.modes], expected, rtol=1e-12)
+    assert result["position"]["tension"] == pytest.approx(0.6)
+    assert result["position"]["shear"] in (0, x_vals[-1])
+
+
+def test_a_segment_only_changes_its_own_stations():
+    design = bridge.final_design
+    uniform = spanwise.spanwise_FOS([{"start": 0, "end": calc.bridge_length}], design, envelope=envelope)
+    segments = [
+        {"start": 0, "end": 400},
+        {"start": 400, "end": 800, "top_flange_layers": 3},
+        {"start": 800, "end": calc.bridge_length},
+    ]
+    result = spanwise.spanwise_FOS(segments, design, envelope=envelope)
+
+    inside = result["segment"] == 1
+    assert np.all((x_vals[inside] >= 0.4) & (x_vals[inside] < 0.8))
+    np.testing.assert_array_equal(result["FOS"][~inside], uniform["FOS"][~inside])
+    # A thicker top flange moves the centroid up, so the section is stronger in compression
+    compression = spanwise.modes.index("compression")
+    assert np.all(result["FOS"][inside, compression] > uniform["FOS"][inside, compression])
+
+    with pytest.raises(ValueError):
+        spanwise.spanwise_FOS(segments[:2], design, envelope=envelope)
@@ -0,0 +1,17 @@
+import sweep
+
+spec = {
+    "total_height": list(range(20, 121, 20)),
+    "top_flange_layers": list(range(1, 6)),
+    "top_flange_width": list(range(100, 150)),
+    "diaphragm_num": list(range(1, 4)),
+}
+
+
+def test_workers_find_the_same_best_designs():
+    progress = []
+    expected = sweep.sweep(spec, top_k=5, workers=1, chunk_size=500, progress=lambda *counts: progress.append(counts))
+    assert progress[-1] == (4500, 4500)
+    # Chunks finish out of order on a pool, and ties still go to the lowest grid index
+    assert sweep.sweep(spec, top_k=5, workers=2, chunk_size=500) == expected
+    assert expected[0] == sweep.sweep(spec, top_k=1, workers=1)[0]